@@ -0,0 +1,152 @@
+"""Benchmark transform_transactions on a synthetic MIS export.
+
+Compares the vectorized transform with the previous row-by-row
+implementation (kept here as a reference) and checks that both produce
+the same values.
+
+Usage:
+    python -m benchmarks.transform_transactions --rows 1000000
+"""
+
+import time
+
+import click
+import numpy as np
+import pandas as pd
+
+from etl.config import classify_service
+from etl.dtypes import MIS_TRANSACTION_DTYPES
+from etl.transformers.transactions import (
+    resolve_branch_id,
+    resolve_payment_type_id,
+    transform_transactions,
+)
+
+BRANCH_LOOKUP = {
+    "taganskaya": 1, "baumanskaya": 2, "dinamo": 3,
+    "zilart": 4, "rublevka": 5, "khamovniki": 6,
+}
+PAYMENT_TYPE_LOOKUP = {
+    "Карта": 1, "Наличные б/ч": 2, "ИП Артеменко": 3,
+    "Бонусы (карта АЕ)": 4, "Прочие": 5,
+}
+
+
+def make_transactions(n: int, seed: int = 42) -> pd.DataFrame:
+    """Synthetic frame shaped like extract_transactions output."""
+    rng = np.random.default_rng(seed)
+    clinics = ["(Таганская)", "(Бауманская)", "(Динамо)", "(Зиларт)",
+               "(Рублевка)", "(Хамовники)", "Неизвестная", None]
+    services = (
+        [f"Лечение кариеса {i}" for i in range(800)]
+        + [f"Установка импланта {i}" for i in range(400)]
+        + [f"Профессиональная гигиена {i}" for i in range(200)]
+        + [f"КТ челюсти {i}" for i in range(100)]
+        + [None]
+    )
+    visit_dates = [
+        f"2025-{m:02d}-{d:02d}, 2025-{m:02d}-{min(d + 7, 28):02d}"
+        for m in range(1, 13) for d in range(1, 29)
+    ] + [None]
+
+    df = pd.DataFrame({
+        "transaction_date": pd.Timestamp("2025-01-01")
+        + pd.to_timedelta(rng.integers(0, 365, n), unit="D"),
+        "clinic": rng.choice(clinics, n),
+        "patient_hash": pd.array(rng.integers(0, n // 10 + 1, n), dtype="Int64"),
+        "patient_age": pd.array(rng.integers(1, 90, n), dtype="Int64"),
+        "age_group": rng.choice(["Взрослый", "Ребенок", " Ребенок ", None], n),
+        "payment_type": rng.choice(list(PAYMENT_TYPE_LOOKUP) + ["Другое", None], n),
+        "operation_type": rng.choice(["Оплата", "Возврат оплаты"], n, p=[0.97, 0.03]),
+        "invoice_clinic": rng.choice(clinics, n),
+        "invoice_amount": rng.integers(1_000, 200_000, n).astype(float),
+        "invoice_debt": np.zeros(n),
+        "service_items": rng.choice(services, n),
+        "visit_dates": rng.choice(visit_dates, n),
+        "doctor_name": rng.choice([f" Врач {i} " for i in range(120)] + [None], n),
+        "visit_status": rng.choice(["Первичный", "Повторный", None], n),
+        "transaction_amount": rng.integers(500, 100_000, n).astype(float),
+    })
+    casts = {c: t for c, t in MIS_TRANSACTION_DTYPES.items() if c in df.columns}
+    return df.astype(casts)
+
+
+def transform_transactions_rowwise(
+    df: pd.DataFrame, branch_lookup: dict, payment_type_lookup: dict
+) -> pd.DataFrame:
+    """Previous row-by-row implementation, kept as the benchmark baseline."""
+    result = pd.DataFrame(index=df.index)
+    result["transaction_date"] = df["transaction_date"]
+    result["branch_id"] = df["clinic"].astype(object).apply(
+        lambda x: resolve_branch_id(x, branch_lookup)
+    )
+    result["patient_hash"] = df["patient_hash"]
+    result["patient_age"] = df["patient_age"]
+    result["is_child"] = df["age_group"].astype(object).apply(
+        lambda x: str(x).strip() == "Ребенок" if pd.notna(x) else None
+    )
+    result["payment_type_id"] = df["payment_type"].astype(object).apply(
+        lambda x: resolve_payment_type_id(x, payment_type_lookup)
+    )
+    result["operation_type"] = df["operation_type"]
+    result["invoice_branch_id"] = df["invoice_clinic"].astype(object).apply(
+        lambda x: resolve_branch_id(x, branch_lookup)
+    )
+    result["invoice_amount"] = df["invoice_amount"]
+    result["invoice_debt"] = df["invoice_debt"]
+    result["service_name"] = df["service_items"].astype(object).apply(
+        lambda x: str(x).strip()[:200] if pd.notna(x) else None
+    )
+    result["service_category"] = result["service_name"].astype(object).apply(classify_service)
+    result["visit_date"] = pd.to_datetime(
+        df["visit_dates"].astype(object).apply(
+            lambda x: str(x).split(",")[0].strip() if pd.notna(x) else None
+        ),
+        errors="coerce",
+    )
+    result["doctor_name"] = df["doctor_name"].astype(object).apply(
+        lambda x: str(x).strip() if pd.notna(x) else None
+    )
+    result["is_primary_visit"] = df["visit_status"].astype(object).apply(
+        lambda x: str(x).strip() == "Первичный" if pd.notna(x) else None
+    )
+    result["transaction_amount"] = df["transaction_amount"]
+    return result
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    out = func(*args)
+    return out, time.perf_counter() - start
+
+
+@click.command()
+@click.option("--rows", type=int, default=1_000_000, help="Synthetic frame size")
+@click.option("--skip-baseline", is_flag=True, help="Only time the vectorized transform")
+def main(rows, skip_baseline):
+    """Time row-wise vs vectorized transform_transactions."""
+    df = make_transactions(rows)
+    click.echo(f"Synthetic frame: {rows:,} rows")
+
+    new, t_new = _timed(
+        transform_transactions, df, BRANCH_LOOKUP, PAYMENT_TYPE_LOOKUP, set()
+    )
+    click.echo(f"  vectorized: {t_new:8.2f}s  {rows / t_new:12,.0f} rows/sec")
+
+    if skip_baseline:
+        return
+
+    old, t_old = _timed(transform_transactions_rowwise, df, BRANCH_LOOKUP, PAYMENT_TYPE_LOOKUP)
+    click.echo(f"  row-wise:   {t_old:8.2f}s  {rows / t_old:12,.0f} rows/sec")
+    click.echo(f"  speedup:    {t_old / t_new:8.1f}x")
+
+    for col in old.columns:
+        a = old[col].astype(object).where(old[col].notna(), None)
+        b = new[col].astype(object).where(new[col].notna(), None)
+        if not a.equals(b):
+            raise click.ClickException(f"Column {col} differs between implementations")
+    click.echo("  outputs match")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,8 @@ import pandas as pd
 import numpy as np
 from datetime import date
 
+from sketches import build as build_sketch
+
 np.random.seed(42)
 
 # ── Константы ──────────────────────────────────────────────────────────
@@ -130,6 +132,19 @@ CF_EXPENSE_ITEMS = [
     ("Финансовая деятельность", "Погашение займов", "outflow"),
 ]
 
+# Пулы пациентов для скетчей: свои пациенты филиала + общие, которые
+# ходят в несколько филиалов. Отдельный генератор, чтобы не сдвигать
+# остальные демо-данные.
+_patients_rng = np.random.default_rng(7)
+SHARED_PATIENTS = _patients_rng.integers(-2**63, 2**63 - 1, 1_500, dtype=np.int64)
+BRANCH_PATIENTS = {
+    bid: np.concatenate([
+        _patients_rng.integers(-2**63, 2**63 - 1, 6_000, dtype=np.int64),
+        SHARED_PATIENTS,
+    ])
+    for bid in BRANCHES
+}
+
 
 # ── Генераторы ─────────────────────────────────────────────────────────
 
@@ -137,6 +152,12 @@ def _seasonal_factor(month: int) -> float:
     return SEASONALITY.get(month, 1.0)
 
 
+def _patient_sketch(branch_id: int, n: int) -> bytes:
+    """HLL-скетч n случайных пациентов филиала (как patients_hll в витринах)."""
+    pool = BRANCH_PATIENTS[branch_id]
+    return build_sketch(_patients_rng.choice(pool, min(n, len(pool)), replace=False))
+
+
 def _growth_factor(dt: pd.Timestamp) -> float:
     """Рост ~12% годовых: месячный множитель от начала периода."""
     months_from_start = (dt.year - 2024) * 12 + dt.month - 1
@@ -199,6 +220,7 @@ def generate_monthly_pnl() -> pd.DataFrame:
                 "marketing": round(marketing),
                 "it_costs": round(it_costs),
                 "ebitda": round(ebitda),
+                "patients_hll": _patient_sketch(bid, unique_patients),
             })
 
     df = pd.DataFrame(rows)
@@ -245,6 +267,7 @@ def generate_doctor_kpi() -> pd.DataFrame:
                 "primary_visits": primary_visits,
                 "avg_ticket": round(avg_ticket),
                 "revenue_per_workday": round(revenue_per_workday),
+                "patients_hll": _patient_sketch(branch_id, unique_patients),
             })
 
     df = pd.DataFrame(rows)
@@ -262,6 +285,7 @@ def generate_branch_comparison() -> pd.DataFrame:
         "unique_patients": "sum",
         "primary_visits": "sum",
         "avg_ticket": "mean",
+        "patients_hll": "first",
     }).reset_index()
     bc.rename(columns={"gross_revenue": "revenue", "revenue_accrual": "net_revenue"}, inplace=True)
 
@@ -13,6 +13,7 @@ from formatters import (
     BRANCH_COLORS, SEVERITY_COLORS, SEVERITY_ICONS,
     default_layout,
 )
+from sketches import distinct_count, distinct_by
 
 st.header("Обзор")
 
@@ -50,8 +51,10 @@ ebitda_cur = cur["ebitda"].sum()
 ebitda_prv = prv["ebitda"].sum()
 ticket_cur = cur["avg_ticket"].mean()
 ticket_prv = prv["avg_ticket"].mean()
-patients_cur = cur["unique_patients"].sum()
-patients_prv = prv["unique_patients"].sum()
+# Пациенты за месяц по всем филиалам: скетчи объединяются, чтобы пациент
+# нескольких филиалов считался один раз
+patients_cur = distinct_count(cur["patients_hll"])
+patients_prv = distinct_count(prv["patients_hll"])
 
 c1, c2, c3, c4 = st.columns(4)
 with c1:
@@ -134,11 +137,10 @@ branch_summary = pnl.groupby("branch_name").agg({
     "revenue_accrual": "sum",
     "ebitda": "sum",
     "avg_ticket": "mean",
-    "unique_patients": "sum",
     "primary_visits": "sum",
     "materials": "sum",
     "total_payroll_direct": "sum",
-}).reset_index()
+}).join(distinct_by(pnl, "branch_name")).reset_index()
 
 branch_summary["ebitda_margin"] = branch_summary["ebitda"] / branch_summary["revenue_accrual"]
 branch_summary["cost_ratio"] = (
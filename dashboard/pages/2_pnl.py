@@ -11,6 +11,7 @@ from mock_data import get_data, BRANCHES
 from formatters import (
     fmt_rub, fmt_pct, BRANCH_COLORS, default_layout,
 )
+from sketches import distinct_count
 
 st.header("P&L — Прибыли и убытки")
 
@@ -205,13 +206,16 @@ pnl_full = pnl_full[pnl_full["branch_name"].isin(branches_sel)]
 y2024 = pnl_full[pnl_full["year_month"].dt.year == 2024].agg({
     "revenue_accrual": "sum", "ebitda": "sum",
     "materials": "sum", "total_payroll_direct": "sum",
-    "unique_patients": "sum", "avg_ticket": "mean",
+    "avg_ticket": "mean",
 })
 y2025 = pnl_full[pnl_full["year_month"].dt.year == 2025].agg({
     "revenue_accrual": "sum", "ebitda": "sum",
     "materials": "sum", "total_payroll_direct": "sum",
-    "unique_patients": "sum", "avg_ticket": "mean",
+    "avg_ticket": "mean",
 })
+# Уникальные пациенты за год — по объединённым скетчам, а не сумма месяцев
+y2024["unique_patients"] = distinct_count(pnl_full.loc[pnl_full["year_month"].dt.year == 2024, "patients_hll"])
+y2025["unique_patients"] = distinct_count(pnl_full.loc[pnl_full["year_month"].dt.year == 2025, "patients_hll"])
 
 yoy_rows = []
 for metric, label in [
@@ -10,6 +10,7 @@ import sys, os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from mock_data import get_data, BRANCHES, SPECIALIZATIONS
 from formatters import fmt_rub, fmt_num, BRANCH_COLORS, default_layout
+from sketches import distinct_by
 
 st.header("KPI врачей")
 
@@ -56,14 +57,14 @@ docs = docs[mask]
 
 st.subheader("Сводная таблица врачей")
 
-doc_agg = docs.groupby(["doctor_name", "specialization", "branch_name"]).agg({
+doc_keys = ["doctor_name", "specialization", "branch_name"]
+doc_agg = docs.groupby(doc_keys).agg({
     "revenue": "sum",
     "visit_count": "sum",
-    "unique_patients": "sum",
     "primary_visits": "sum",
     "avg_ticket": "mean",
     "revenue_per_workday": "mean",
-}).reset_index().sort_values("revenue", ascending=False)
+}).join(distinct_by(docs, doc_keys)).reset_index().sort_values("revenue", ascending=False)
 
 display_df = pd.DataFrame({
     "Врач": doc_agg["doctor_name"],
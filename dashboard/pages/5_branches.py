@@ -10,6 +10,7 @@ import sys, os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from mock_data import get_data, BRANCHES
 from formatters import fmt_rub, fmt_num, fmt_pct, BRANCH_COLORS, default_layout
+from sketches import distinct_by
 
 st.header("Сравнение филиалов")
 
@@ -45,10 +46,9 @@ with col1:
     branch_agg = pnl.groupby("branch_name").agg({
         "revenue_accrual": "sum",
         "ebitda": "sum",
-        "unique_patients": "sum",
         "avg_ticket": "mean",
         "primary_visits": "sum",
-    }).reset_index()
+    }).join(distinct_by(pnl, "branch_name")).reset_index()
 
     metrics = ["revenue_accrual", "ebitda", "unique_patients", "avg_ticket", "primary_visits"]
     labels = ["Выручка", "EBITDA", "Пациенты", "Средний чек", "Первичные"]
@@ -0,0 +1,83 @@
+"""HyperLogLog-скетчи уникальных пациентов из витрин.
+
+Формат совпадает с sql/04_marts.sql: ключ пациента (patient_hash, 64 бита)
+делится на номер регистра (старшие PRECISION бит) и ранг — позицию первой
+единицы в оставшихся битах. Скетч среза — разреженный BYTEA: по 3 байта
+на непустой регистр (uint16 big-endian + uint8).
+
+Скетчи любого набора месяцев и филиалов объединяются поэлементным
+максимумом, поэтому пациент, приходивший в нескольких месяцах или
+филиалах, считается один раз. Стандартная ошибка оценки ~1.6%.
+"""
+
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+PRECISION = 12
+REGISTERS = 1 << PRECISION
+RANK_BITS = 64 - PRECISION
+
+_ENTRY = np.dtype([("register", ">u2"), ("rank", "u1")])
+_ALPHA = 0.7213 / (1 + 1.079 / REGISTERS)
+
+
+def build(keys) -> bytes:
+    """Скетч набора ключей пациентов (int64), как его строит refresh витрин."""
+    keys = np.asarray(keys, dtype=np.int64).view(np.uint64)
+    register = (keys >> np.uint64(RANK_BITS)).astype(np.int64)
+    rest = (keys & np.uint64((1 << RANK_BITS) - 1)).astype(np.float64)
+    # frexp даёт число значащих бит (rest < 2**52 представим точно)
+    rank = RANK_BITS + 1 - np.frexp(rest)[1]
+
+    dense = np.zeros(REGISTERS, dtype=np.uint8)
+    np.maximum.at(dense, register, rank.astype(np.uint8))
+    return encode(dense)
+
+
+def encode(dense: np.ndarray) -> bytes:
+    """Плотный массив регистров -> разреженный BYTEA."""
+    nonzero = np.flatnonzero(dense)
+    entries = np.empty(len(nonzero), dtype=_ENTRY)
+    entries["register"] = nonzero
+    entries["rank"] = dense[nonzero]
+    return entries.tobytes()
+
+
+def decode(sketch: Optional[bytes]) -> np.ndarray:
+    """Разреженный BYTEA -> плотный массив из REGISTERS регистров."""
+    dense = np.zeros(REGISTERS, dtype=np.uint8)
+    if sketch is None or (not isinstance(sketch, (bytes, bytearray, memoryview)) and pd.isna(sketch)):
+        return dense
+    entries = np.frombuffer(bytes(sketch), dtype=_ENTRY)
+    dense[entries["register"]] = entries["rank"]
+    return dense
+
+
+def merge(sketches: Iterable) -> np.ndarray:
+    """Объединение скетчей: поэлементный максимум регистров."""
+    dense = np.zeros(REGISTERS, dtype=np.uint8)
+    for sketch in sketches:
+        np.maximum(dense, decode(sketch), out=dense)
+    return dense
+
+
+def estimate(dense: np.ndarray) -> float:
+    """Оценка числа уникальных ключей по плотным регистрам."""
+    raw = _ALPHA * REGISTERS ** 2 / np.ldexp(1.0, -dense.astype(np.int64)).sum()
+    zeros = int((dense == 0).sum())
+    if raw <= 2.5 * REGISTERS and zeros:
+        # Малые множества: linear counting точнее
+        return REGISTERS * np.log(REGISTERS / zeros)
+    return raw
+
+
+def distinct_count(sketches: Iterable) -> int:
+    """Число уникальных пациентов по набору скетчей."""
+    return int(round(estimate(merge(sketches))))
+
+
+def distinct_by(df: pd.DataFrame, by, column: str = "patients_hll") -> pd.Series:
+    """Уникальные пациенты по группам: groupby(by) с объединением скетчей."""
+    return df.groupby(by)[column].agg(distinct_count).rename("unique_patients")
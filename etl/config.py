@@ -1,6 +1,8 @@
 """Configuration for ETL pipeline."""
 
 import os
+import re
+from functools import lru_cache
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -12,6 +14,17 @@ PROJECT_ROOT = Path(__file__).parent.parent
 # Data directory
 DATA_DIR = Path(os.getenv("DATA_DIR", PROJECT_ROOT / "data"))
 
+# Parsed Excel extracts cache (Parquet, keyed by file content hash)
+EXTRACT_CACHE_DIR = Path(os.getenv("EXTRACT_CACHE_DIR", DATA_DIR / ".cache" / "extracts"))
+EXTRACT_CACHE_MAX_MB = int(os.getenv("EXTRACT_CACHE_MAX_MB", "1024"))
+
+# Salt prepended to patient names before hashing (empty = legacy unsalted hashes)
+PATIENT_HASH_SALT = os.getenv("PATIENT_HASH_SALT", "")
+
+# Persistent patient name -> key cache. It holds real names, so it is only
+# written when pointed at a protected directory outside the repository
+PATIENT_HASH_CACHE_DIR = os.getenv("PATIENT_HASH_CACHE_DIR")
+
 # ClinicIQ REST API (OAuth 2.0)
 CLINICIQ_API = {
     "base_url": os.getenv("CLINICIQ_BASE_URL", "https://i.cliniciq.ru"),
@@ -120,12 +133,102 @@ SERVICE_CATEGORIES = {
 }
 
 
+def _compile_service_rules(
+    rules: dict,
+) -> tuple[re.Pattern, dict, dict[str, re.Pattern], list[str]]:
+    """
+    Compile service rules into one alternation regex over lowercased patterns.
+
+    Upper-case rules are abbreviations ("КТ") and match whole words only, so
+    they do not fire inside words such as "практика"; other rules match as
+    substrings. Returns the regex, pattern -> priority (position in
+    ``rules``), pattern -> its own regex and the categories in rule order.
+    """
+    priority, regexes = {}, {}
+    for i, pattern in enumerate(rules):
+        key = pattern.lower()
+        if key in priority:
+            continue
+        priority[key] = i
+        regexes[key] = rf"\b{re.escape(key)}\b" if pattern.isupper() else re.escape(key)
+    regex = re.compile("|".join(regexes.values()))
+    return regex, priority, {k: re.compile(r) for k, r in regexes.items()}, list(rules.values())
+
+
+_service_regex, _service_priority, _service_rule_regexes, _service_categories = (
+    _compile_service_rules(SERVICE_CATEGORIES)
+)
+
+
+@lru_cache(maxsize=65536)
 def classify_service(service_name: str) -> str:
-    """Classify service into a category based on name patterns."""
-    if not service_name:
+    """Classify service into a category based on name patterns.
+
+    The first rule in SERVICE_CATEGORIES order that matches the name wins.
+    One regex scan finds a matching rule; only rules with a higher priority
+    than that match need to be re-checked.
+    """
+    if not isinstance(service_name, str) or not service_name:
         return "Прочее"
     name_lower = service_name.lower()
-    for pattern, category in SERVICE_CATEGORIES.items():
-        if pattern.lower() in name_lower:
-            return category
-    return "Прочее"
+    match = _service_regex.search(name_lower)
+    if match is None:
+        return "Прочее"
+    best = _service_priority[match.group(0)]
+    for pattern, idx in _service_priority.items():
+        if idx >= best:
+            break
+        if _service_rule_regexes[pattern].search(name_lower):
+            return _service_categories[idx]
+    return _service_categories[best]
+
+
+def reload_service_rules(rules: dict | None = None) -> None:
+    """Recompile the classifier after the rule table changes and drop cached results."""
+    global _service_regex, _service_priority, _service_rule_regexes, _service_categories
+    rules = SERVICE_CATEGORIES if rules is None else rules
+    _service_regex, _service_priority, _service_rule_regexes, _service_categories = (
+        _compile_service_rules(rules)
+    )
+    classify_service.cache_clear()
+
+
+# CF line item -> dim_expense_type.name rules. Patterns are regexes over the
+# lowercased line item; the first matching rule wins.
+EXPENSE_TYPE_RULES = {
+    r"приход.*операц": "Приход по операционной деятельности",
+    r"выручк.*наличн": "Выручка наличными",
+    r"выручк.*безнал": "Выручка безналичными",
+    r"выручк": "Выручка на расчетный счет (в т.ч. Карты)",
+    r"кредитн.*карт": "Кредитные карты ИП",
+    r"бонус": "Бонусы (карта АЕ)",
+    r"(зарплат|заработн|\bзп\b).*доктор|фот.*врач": "Заработная плата докторов (в т.ч. взносы)",
+    r"(зарплат|заработн|\bзп\b).*ассист": "Заработная плата ассистентов (в т.ч. взносы)",
+    r"материал": "Расходные материалы",
+    r"лаборатор": "Лаборатория",
+    r"аренд.*офис": "Аренда офиса",
+    r"аренд": "Аренда помещений клиник и парковки",
+    r"маркетинг|реклам": "Маркетинг",
+    r"\bit\b|клиник ?ай ?кью": "IT",
+    r"клининг|уборк": "Клининг",
+    r"охран": "Охрана",
+    r"канцтовар|хозтовар": "Канцтовары/хозтовары клиник",
+    r"связь|интернет": "Связь и интернет",
+    r"коммунальн": "Коммунальные услуги",
+    r"налог": "Налоги",
+    r"процент.*кредит": "Проценты по кредитам",
+}
+
+_expense_rules = [(re.compile(p), name) for p, name in EXPENSE_TYPE_RULES.items()]
+
+
+@lru_cache(maxsize=4096)
+def classify_expense_type(line_item: str) -> str | None:
+    """Map a CF line item to a dim_expense_type name, or None if no rule matches."""
+    if not isinstance(line_item, str) or not line_item.strip():
+        return None
+    item_lower = line_item.strip().lower()
+    for regex, name in _expense_rules:
+        if regex.search(item_lower):
+            return name
+    return None
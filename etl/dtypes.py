@@ -0,0 +1,219 @@
+"""Explicit dtype schemas for ETL DataFrames.
+
+Low-cardinality text columns (clinic, payment type, doctor, service, ...)
+are stored as pandas categoricals instead of object columns full of
+duplicate Python strings; flags and ids use nullable boolean/Int64 dtypes.
+"""
+
+import logging
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Output of extract_transactions / iter_transactions
+MIS_TRANSACTION_DTYPES = {
+    "transaction_date": "datetime64[ns]",
+    "clinic": "category",
+    "patient_name": "category",
+    "patient_hash": "Int64",
+    "patient_age": "Int64",
+    "age_group": "category",
+    "payment_type": "category",
+    "operation_type": "category",
+    "invoice_clinic": "category",
+    "invoice_amount": "float64",
+    "invoice_debt": "float64",
+    "invoice_status": "category",
+    "service_items": "category",
+    "visit_dates": "category",
+    "doctor_name": "category",
+    "visit_status": "category",
+    "transaction_amount": "float64",
+}
+
+# Output of transform_transactions
+FACT_TRANSACTION_DTYPES = {
+    "transaction_date": "datetime64[ns]",
+    "branch_id": "Int64",
+    "patient_hash": "Int64",
+    "patient_age": "Int64",
+    "is_child": "boolean",
+    "payment_type_id": "Int64",
+    "operation_type": "category",
+    "invoice_branch_id": "Int64",
+    "invoice_amount": "float64",
+    "invoice_debt": "float64",
+    "service_name": "category",
+    "service_category": "category",
+    "visit_date": "datetime64[ns]",
+    "doctor_name": "category",
+    "is_primary_visit": "boolean",
+    "transaction_amount": "float64",
+}
+
+
+# ClinicIQ API rows (etl/extractors/api_extractor.py ENDPOINTS), typed as in
+# docs/API_SPEC_CLINICIQ.md. Every page is cast to these, so raw.api_* tables
+# get the same column types whichever page creates them, even if a column
+# is all null there; dates and datetimes stay text as received.
+API_BRANCH_DTYPES = {
+    "branch_id_api": "Int64",
+    "name": "string",
+    "code": "string",
+    "address": "string",
+    "phone": "string",
+    "chairs_count": "Int64",
+    "doctors_count": "Int64",
+    "is_active": "boolean",
+    "opened_date": "string",
+    "working_hours": "string",
+    "updated_at": "string",
+}
+
+API_DOCTOR_DTYPES = {
+    "doctor_id_api": "Int64",
+    "full_name": "string",
+    "short_name": "string",
+    "specialization": "string",
+    "additional_specializations": "string",
+    "primary_branch_id": "Int64",
+    "primary_branch_name": "string",
+    "branch_ids": "string",
+    "is_active": "boolean",
+    "hire_date": "string",
+    "updated_at": "string",
+}
+
+API_SERVICE_DTYPES = {
+    "service_id_api": "Int64",
+    "code": "string",
+    "name": "string",
+    "category": "string",
+    "subcategory": "string",
+    "base_price": "float64",
+    "duration_minutes": "Int64",
+    "is_active": "boolean",
+    "updated_at": "string",
+}
+
+API_TRANSACTION_DTYPES = {
+    "transaction_id_api": "Int64",
+    "transaction_date": "string",
+    "transaction_datetime": "string",
+    "branch_id_api": "Int64",
+    "branch_name": "string",
+    "branch_code": "string",
+    "patient_id": "string",
+    "patient_age": "Int64",
+    "patient_age_group": "string",
+    "is_child": "boolean",
+    "payment_type_code": "string",
+    "payment_type_name": "string",
+    "operation_type": "string",
+    "invoice_id": "string",
+    "invoice_total_amount": "float64",
+    "invoice_debt": "float64",
+    "invoice_status": "string",
+    "invoice_discount_amount": "float64",
+    "invoice_discount_percent": "float64",
+    "service_id_api": "Int64",
+    "service_code": "string",
+    "service_name": "string",
+    "service_category": "string",
+    "service_quantity": "Int64",
+    "service_price": "float64",
+    "service_discount": "float64",
+    "service_total": "float64",
+    "services_count": "Int64",
+    "doctor_id_api": "Int64",
+    "doctor_name": "string",
+    "doctor_specialization": "string",
+    "visit_date": "string",
+    "visit_type": "string",
+    "visit_reason": "string",
+    "is_primary_visit": "boolean",
+    "amount": "float64",
+    "created_at": "string",
+    "updated_at": "string",
+}
+
+API_APPOINTMENT_DTYPES = {
+    "appointment_id_api": "Int64",
+    "date": "string",
+    "time_start": "string",
+    "time_end": "string",
+    "duration_minutes": "Int64",
+    "branch_id_api": "Int64",
+    "branch_name": "string",
+    "doctor_id_api": "Int64",
+    "doctor_name": "string",
+    "doctor_specialization": "string",
+    "patient_id": "string",
+    "patient_age": "Int64",
+    "patient_age_group": "string",
+    "visit_type": "string",
+    "reason": "string",
+    "status": "string",
+    "source": "string",
+    "created_at": "string",
+    "updated_at": "string",
+}
+
+API_INVOICE_DTYPES = {
+    "invoice_id_api": "string",
+    "created_date": "string",
+    "branch_id_api": "Int64",
+    "branch_name": "string",
+    "patient_id": "string",
+    "patient_age_group": "string",
+    "doctor_id_api": "Int64",
+    "doctor_name": "string",
+    "items_count": "Int64",
+    "subtotal": "float64",
+    "discount_total": "float64",
+    "total_amount": "float64",
+    "paid_amount": "float64",
+    "debt": "float64",
+    "status": "string",
+    "payments_count": "Int64",
+    "created_at": "string",
+    "updated_at": "string",
+}
+
+API_PATIENT_STATS_DTYPES = {
+    "period": "string",
+    "branch_id_api": "Int64",
+    "branch_name": "string",
+    "total_patients": "Int64",
+    "new_patients": "Int64",
+    "returning_patients": "Int64",
+    "retention_rate": "float64",
+    "avg_age": "float64",
+    "age_0_17": "Int64",
+    "age_18_30": "Int64",
+    "age_31_45": "Int64",
+    "age_46_60": "Int64",
+    "age_60_plus": "Int64",
+    "avg_visits_per_patient": "float64",
+    "avg_revenue_per_patient": "float64",
+    "avg_ltv": "float64",
+}
+
+
+def frame_memory_mb(df: pd.DataFrame) -> float:
+    """Deep memory usage of a DataFrame in MB."""
+    return df.memory_usage(deep=True).sum() / 1024 / 1024
+
+
+def apply_dtypes(df: pd.DataFrame, schema: dict, name: str = "frame") -> pd.DataFrame:
+    """Cast columns present in ``df`` to the schema dtypes and log memory saved."""
+    before = frame_memory_mb(df)
+    casts = {col: dtype for col, dtype in schema.items() if col in df.columns}
+    df = df.astype(casts)
+    after = frame_memory_mb(df)
+    logger.info(
+        f"Memory {name}: {before:.1f} MB -> {after:.1f} MB "
+        f"({before / after if after else 0:.1f}x)"
+    )
+    return df
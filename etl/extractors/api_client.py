@@ -3,18 +3,26 @@
 Handles:
 - OAuth 2.0 Client Credentials token lifecycle
 - Automatic cursor-based pagination
-- Rate limiting (respects X-RateLimit-* headers)
+- Rate limiting: token bucket shared by all clients, fed by X-RateLimit-* headers
 - Retries with exponential backoff
 - Incremental sync state persistence
+
+ClinicIQClient is synchronous (requests). AsyncClinicIQClient (httpx) has
+the same OAuth, rate-limit and error semantics and lets several endpoints
+or date windows be fetched concurrently.
 """
 
+import asyncio
 import json
 import logging
+import os
+import threading
 import time
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Generator, Optional
+from typing import Any, AsyncGenerator, Generator, Optional
 
+import httpx
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
@@ -37,8 +45,144 @@ class APIError(Exception):
         super().__init__(f"HTTP {status_code}: {message}")
 
 
-class ClinicIQClient:
-    """HTTP client for ClinicIQ REST API with OAuth 2.0 Client Credentials."""
+# 5xx statuses retried with exponential backoff (both clients)
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# Calls of the server's budget left unused, as a margin for clock skew
+RATE_LIMIT_RESERVE = 2
+
+
+class TokenBucket:
+    """Token-bucket rate limiter, thread- and task-safe.
+
+    The bucket starts full (``per_minute`` tokens) and refills at
+    ``per_minute / 60`` tokens per second, so short syncs burst without
+    waiting. Once the server reports X-RateLimit-Remaining / -Reset, the
+    bucket holds at most that remaining budget (less the requests still in
+    flight, which the server may not have counted yet) and refills to
+    capacity when the server's window resets. Waits are accumulated in
+    ``throttled_seconds`` (summed over requests, so concurrent waits add up).
+
+    Every acquire() must be followed by release() once the response (or
+    error) is back.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self._configured = self.capacity
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._reset_at: Optional[float] = None  # epoch seconds of the window reset
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self.throttled_seconds = 0.0
+        self.throttled_requests = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self._reset_at is None:
+            elapsed = now - self._updated
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.capacity / 60)
+        elif time.time() >= self._reset_at:
+            self._tokens = max(self._tokens, self.capacity - RATE_LIMIT_RESERVE)
+            self._reset_at = None
+        self._updated = now
+
+    def _take(self) -> float:
+        """Take a token; return 0, or the seconds to wait before trying again."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self._in_flight += 1
+                return 0.0
+            if self._reset_at is not None:
+                return max(self._reset_at - time.time(), 0.0) + 0.05
+            return (1 - self._tokens) * 60 / self.capacity
+
+    def _throttled(self, wait: float, first: bool) -> None:
+        with self._lock:
+            self.throttled_seconds += wait
+            self.throttled_requests += first
+        log = logger.warning if wait >= 1 else logger.debug
+        log("Rate limit budget exhausted, sleeping %.1fs", wait)
+
+    def acquire(self) -> None:
+        """Block the calling thread until a request may be sent."""
+        first = True
+        while wait := self._take():
+            self._throttled(wait, first)
+            first = False
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        """Wait (without blocking the event loop) until a request may be sent."""
+        first = True
+        while wait := self._take():
+            self._throttled(wait, first)
+            first = False
+            await asyncio.sleep(wait)
+
+    def release(self) -> None:
+        """Mark a request taken by acquire() as finished."""
+        with self._lock:
+            self._in_flight -= 1
+
+    def update(self, headers) -> None:
+        """Align the bucket with X-RateLimit-Limit / -Remaining / -Reset headers."""
+        try:
+            limit = float(headers["X-RateLimit-Limit"]) if "X-RateLimit-Limit" in headers else None
+            remaining = int(headers["X-RateLimit-Remaining"]) if "X-RateLimit-Remaining" in headers else None
+            reset = float(headers["X-RateLimit-Reset"]) if "X-RateLimit-Reset" in headers else None
+        except ValueError:
+            return
+        if reset is not None and reset < 1e9:
+            reset += time.time()  # seconds until reset rather than a timestamp
+
+        with self._lock:
+            self._refill()
+            if limit:
+                self.capacity = min(self._configured, limit)
+            if remaining is None:
+                return
+            budget = remaining - RATE_LIMIT_RESERVE - self._in_flight
+            if reset is not None and (self._reset_at is None or reset > self._reset_at + 1):
+                # New server window: its budget replaces the local estimate
+                self._tokens = budget
+            else:
+                self._tokens = min(self._tokens, budget)
+            if reset is not None:
+                self._reset_at = reset
+
+    def pause(self, seconds: float) -> None:
+        """Empty the bucket for ``seconds`` (429 Retry-After), for every client."""
+        with self._lock:
+            self._tokens = min(self._tokens, 0)
+            self._reset_at = max(self._reset_at or 0, time.time() + seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "throttled_requests": self.throttled_requests,
+                "throttled_seconds": self.throttled_seconds,
+            }
+
+
+_rate_limiters: dict[str, TokenBucket] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def rate_limiter(base_url: Optional[str] = None) -> TokenBucket:
+    """The TokenBucket shared by every client of ``base_url``."""
+    base_url = (base_url or CLINICIQ_API["base_url"]).rstrip("/")
+    with _rate_limiters_lock:
+        if base_url not in _rate_limiters:
+            _rate_limiters[base_url] = TokenBucket(CLINICIQ_API["rate_limit_per_minute"])
+        return _rate_limiters[base_url]
+
+
+class _ClinicIQBase:
+    """Configuration and transport-independent logic shared by both clients."""
 
     def __init__(
         self,
@@ -67,11 +211,81 @@ class ClinicIQClient:
         self._access_token: Optional[str] = None
         self._token_expires_at: float = 0
 
-        # Rate limiting state
-        self._rate_remaining: Optional[int] = None
-        self._rate_reset: Optional[float] = None
-        self._min_interval = 60.0 / cfg["rate_limit_per_minute"]
+        self._limiter = rate_limiter(self.base_url)
+
+    def _token_request(self) -> dict:
+        """Keyword arguments of the OAuth 2.0 token POST."""
+        return {
+            "data": {
+                "grant_type": "client_credentials",
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "scope": self.scope,
+            },
+            "headers": {"Content-Type": "application/x-www-form-urlencoded"},
+            "timeout": self.timeout,
+        }
+
+    def _token_valid(self, now: float) -> bool:
+        return bool(self._access_token) and now < self._token_expires_at - 60
+
+    def _store_token(self, resp, now: float) -> None:
+        """Validate a token response (requests or httpx) and remember the token."""
+        if resp.status_code != 200:
+            raise AuthError(
+                f"OAuth token request failed: HTTP {resp.status_code} — {resp.text}"
+            )
+        data = resp.json()
+        self._access_token = data["access_token"]
+        expires_in = data.get("expires_in", 3600)
+        self._token_expires_at = now + expires_in
+        logger.info("Access token obtained (expires in %ds)", expires_in)
+
+    def _update_rate_limits(self, headers) -> None:
+        """Feed X-RateLimit-* response headers to the shared limiter."""
+        self._limiter.update(headers)
+
+    def _retry_after(self, resp) -> None:
+        """Pause the shared limiter for a 429 response's Retry-After."""
+        retry_after = int(resp.headers.get("Retry-After", 60))
+        logger.warning("Rate limited (429), retrying after %ds", retry_after)
+        self._limiter.pause(retry_after)
+
+    @staticmethod
+    def _raise_for_status(resp) -> None:
+        """Raise APIError for 4xx/5xx responses (requests or httpx)."""
+        if resp.status_code >= 400:
+            try:
+                err = resp.json().get("error", {})
+            except Exception:
+                err = {"message": resp.text}
+            raise APIError(
+                resp.status_code,
+                err.get("message", resp.text),
+                err.get("details"),
+            )
+
+    @staticmethod
+    def _page_info(data: dict, page_num: int, total_records: int) -> tuple[list, dict]:
+        """Records and pagination block of one page, logged."""
+        records = data.get("data", [])
+        pagination = data.get("pagination", {})
+        if records:
+            logger.info(
+                "  Page %d: fetched %d records (%d / %s total)",
+                page_num,
+                len(records),
+                total_records + len(records),
+                pagination.get("total_count", "?"),
+            )
+        return records, pagination
+
+
+class ClinicIQClient(_ClinicIQBase):
+    """HTTP client for ClinicIQ REST API with OAuth 2.0 Client Credentials."""
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
         self._session = self._build_session()
 
     def _build_session(self) -> requests.Session:
@@ -80,7 +294,7 @@ class ClinicIQClient:
         retry = Retry(
             total=CLINICIQ_API["max_retries"],
             backoff_factor=1.0,
-            status_forcelist=[500, 502, 503, 504],
+            status_forcelist=list(RETRY_STATUSES),
             allowed_methods=["GET"],
             raise_on_status=False,
         )
@@ -94,74 +308,36 @@ class ClinicIQClient:
     def _ensure_token(self) -> None:
         """Obtain or refresh access token if needed."""
         now = time.time()
-        if self._access_token and now < self._token_expires_at - 60:
+        if self._token_valid(now):
             return  # token still valid (with 60s buffer)
 
         logger.info("Requesting new OAuth 2.0 access token...")
-        resp = self._session.post(
-            self.token_url,
-            data={
-                "grant_type": "client_credentials",
-                "client_id": self.client_id,
-                "client_secret": self.client_secret,
-                "scope": self.scope,
-            },
-            headers={"Content-Type": "application/x-www-form-urlencoded"},
-            timeout=self.timeout,
-        )
-
-        if resp.status_code != 200:
-            raise AuthError(
-                f"OAuth token request failed: HTTP {resp.status_code} — {resp.text}"
-            )
-
-        data = resp.json()
-        self._access_token = data["access_token"]
-        self._token_expires_at = now + data.get("expires_in", 3600)
-        logger.info(
-            "Access token obtained (expires in %ds)", data.get("expires_in", 3600)
-        )
-
-    # ── Rate Limiting ──────────────────────────────────────────
-
-    def _respect_rate_limit(self) -> None:
-        """Sleep if we're about to hit the rate limit."""
-        if self._rate_remaining is not None and self._rate_remaining <= 2:
-            if self._rate_reset:
-                wait = max(0, self._rate_reset - time.time()) + 1
-                logger.warning("Rate limit nearly exhausted, sleeping %.1fs", wait)
-                time.sleep(wait)
-                return
-
-        time.sleep(self._min_interval)
-
-    def _update_rate_limits(self, headers: dict) -> None:
-        """Parse X-RateLimit-* response headers."""
-        if "X-RateLimit-Remaining" in headers:
-            self._rate_remaining = int(headers["X-RateLimit-Remaining"])
-        if "X-RateLimit-Reset" in headers:
-            try:
-                self._rate_reset = float(headers["X-RateLimit-Reset"])
-            except ValueError:
-                pass
+        resp = self._session.post(self.token_url, **self._token_request())
+        self._store_token(resp, now)
 
     # ── Core Request ───────────────────────────────────────────
 
+    def _send_limited(self, method: str, url: str, params, headers) -> requests.Response:
+        """One request through the shared rate limiter."""
+        self._limiter.acquire()
+        try:
+            return self._session.request(
+                method, url, params=params, headers=headers, timeout=self.timeout
+            )
+        finally:
+            self._limiter.release()
+
     def _request(
         self, method: str, path: str, params: Optional[dict] = None
     ) -> requests.Response:
         """Execute authenticated API request with rate-limit awareness."""
         self._ensure_token()
-        self._respect_rate_limit()
 
         url = f"{self.base_url}{self.api_prefix}{path}"
         headers = {"Authorization": f"Bearer {self._access_token}"}
 
         logger.debug("API %s %s params=%s", method, url, params)
-        resp = self._session.request(
-            method, url, params=params, headers=headers, timeout=self.timeout
-        )
-
+        resp = self._send_limited(method, url, params, headers)
         self._update_rate_limits(resp.headers)
 
         if resp.status_code == 401:
@@ -169,27 +345,14 @@ class ClinicIQClient:
             self._access_token = None
             self._ensure_token()
             headers["Authorization"] = f"Bearer {self._access_token}"
-            resp = self._session.request(
-                method, url, params=params, headers=headers, timeout=self.timeout
-            )
+            resp = self._send_limited(method, url, params, headers)
+            self._update_rate_limits(resp.headers)
 
         if resp.status_code == 429:
-            retry_after = int(resp.headers.get("Retry-After", 60))
-            logger.warning("Rate limited (429), retrying after %ds", retry_after)
-            time.sleep(retry_after)
+            self._retry_after(resp)
             return self._request(method, path, params)
 
-        if resp.status_code >= 400:
-            try:
-                err = resp.json().get("error", {})
-            except Exception:
-                err = {"message": resp.text}
-            raise APIError(
-                resp.status_code,
-                err.get("message", resp.text),
-                err.get("details"),
-            )
-
+        self._raise_for_status(resp)
         return resp
 
     def get(self, path: str, params: Optional[dict] = None) -> dict:
@@ -230,21 +393,11 @@ class ClinicIQClient:
             data = self.get(path, params)
             page_num += 1
 
-            records = data.get("data", [])
+            records, pagination = self._page_info(data, page_num, total_records)
             if not records:
                 break
 
             total_records += len(records)
-            pagination = data.get("pagination", {})
-            total_count = pagination.get("total_count", "?")
-
-            logger.info(
-                "  Page %d: fetched %d records (%d / %s total)",
-                page_num,
-                len(records),
-                total_records,
-                total_count,
-            )
             yield records
 
             if not pagination.get("has_more", False):
@@ -303,8 +456,187 @@ class ClinicIQClient:
         }
 
 
+class AsyncClinicIQClient(_ClinicIQBase):
+    """Asyncio variant of ClinicIQClient (httpx).
+
+    Requests from concurrent tasks share one connection pool, one OAuth
+    token and the rate limiter of the sync clients, and overlap instead of
+    each waiting for the previous response. At most ``max_concurrency``
+    requests are in flight at a time.
+
+    Use as ``async with AsyncClinicIQClient() as client: ...``.
+    """
+
+    def __init__(self, *args, max_concurrency: int = 4, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_concurrency = max_concurrency
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=max_concurrency),
+        )
+        self._in_flight = asyncio.Semaphore(max_concurrency)
+        self._token_lock = asyncio.Lock()
+
+    async def __aenter__(self) -> "AsyncClinicIQClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    # ── OAuth 2.0 ──────────────────────────────────────────────
+
+    async def _ensure_token(self) -> None:
+        """Obtain or refresh access token if needed (once for all tasks)."""
+        async with self._token_lock:
+            now = time.time()
+            if self._token_valid(now):
+                return
+
+            logger.info("Requesting new OAuth 2.0 access token...")
+            resp = await self._client.post(self.token_url, **self._token_request())
+            self._store_token(resp, now)
+
+    # ── Core Request ───────────────────────────────────────────
+
+    async def _send(self, method: str, url: str, params, headers) -> httpx.Response:
+        """Send with the sync client's retry policy: 5xx and network errors."""
+        retries = CLINICIQ_API["max_retries"]
+        for attempt in range(retries + 1):
+            try:
+                resp = await self._client.request(
+                    method, url, params=params, headers=headers
+                )
+            except httpx.TransportError:
+                if attempt == retries:
+                    raise
+            else:
+                if resp.status_code not in RETRY_STATUSES or attempt == retries:
+                    return resp
+            await asyncio.sleep(2 ** attempt)
+
+    async def _send_limited(self, method: str, url: str, params, headers) -> httpx.Response:
+        """_send within the concurrency cap and the shared rate limiter."""
+        async with self._in_flight:
+            await self._limiter.acquire_async()
+            try:
+                return await self._send(method, url, params, headers)
+            finally:
+                self._limiter.release()
+
+    async def _request(
+        self, method: str, path: str, params: Optional[dict] = None
+    ) -> httpx.Response:
+        """Execute authenticated API request with rate-limit awareness."""
+        await self._ensure_token()
+
+        url = f"{self.base_url}{self.api_prefix}{path}"
+        headers = {"Authorization": f"Bearer {self._access_token}"}
+
+        logger.debug("API %s %s params=%s", method, url, params)
+        resp = await self._send_limited(method, url, params, headers)
+        self._update_rate_limits(resp.headers)
+
+        if resp.status_code == 401:
+            logger.warning("Token expired mid-session, re-authenticating...")
+            async with self._token_lock:
+                if self._access_token == headers["Authorization"][len("Bearer "):]:
+                    self._access_token = None
+            await self._ensure_token()
+            headers["Authorization"] = f"Bearer {self._access_token}"
+            resp = await self._send_limited(method, url, params, headers)
+            self._update_rate_limits(resp.headers)
+
+        if resp.status_code == 429:
+            self._retry_after(resp)
+            return await self._request(method, path, params)
+
+        self._raise_for_status(resp)
+        return resp
+
+    async def get(self, path: str, params: Optional[dict] = None) -> dict:
+        """GET request, return parsed JSON."""
+        resp = await self._request("GET", path, params)
+        return resp.json()
+
+    # ── Paginated Fetching ─────────────────────────────────────
+
+    async def iter_cursor_pages(
+        self,
+        path: str,
+        params: Optional[dict] = None,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncGenerator[tuple[list[dict], Optional[str]], None]:
+        """Async generator of (records, next cursor) pages, starting at ``cursor``.
+
+        The next cursor is None on the last page; pass a saved one back as
+        ``cursor`` to resume an interrupted crawl.
+        """
+        params = dict(params or {})
+        params["limit"] = limit or self.page_size
+        page_num = 0
+        total_records = 0
+
+        while True:
+            if cursor:
+                params["cursor"] = cursor
+            elif "cursor" in params:
+                del params["cursor"]
+
+            data = await self.get(path, params)
+            page_num += 1
+
+            records, pagination = self._page_info(data, page_num, total_records)
+            if not records:
+                break
+
+            total_records += len(records)
+            cursor = pagination.get("cursor") if pagination.get("has_more", False) else None
+            yield records, cursor or None
+
+            if not cursor:
+                break
+
+        logger.info(
+            "Finished %s: %d records in %d pages", path, total_records, page_num
+        )
+
+    async def get_all_pages(
+        self,
+        path: str,
+        params: Optional[dict] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncGenerator[list[dict], None]:
+        """Async generator of pages, following cursor pagination.
+
+        Pages of one endpoint are sequential (each needs the previous
+        cursor); run several generators concurrently to overlap endpoints
+        or date windows.
+        """
+        async for records, _ in self.iter_cursor_pages(path, params, limit=limit):
+            yield records
+
+    async def fetch_all(
+        self,
+        path: str,
+        params: Optional[dict] = None,
+        limit: Optional[int] = None,
+    ) -> list[dict]:
+        """Fetch all pages and return flat list of records."""
+        result = []
+        async for page in self.get_all_pages(path, params, limit):
+            result.extend(page)
+        return result
+
+
 # ── Sync State Management ─────────────────────────────────────
 
+# Endpoints may finish in worker threads; serializes read-modify-write
+_sync_state_lock = threading.Lock()
+
 
 def load_sync_state() -> dict:
     """Load last sync timestamps from disk."""
@@ -316,10 +648,12 @@ def load_sync_state() -> dict:
 
 
 def save_sync_state(state: dict) -> None:
-    """Persist sync state to disk."""
+    """Persist sync state to disk (atomic replace, readers never see a partial file)."""
     path = Path(SYNC_STATE_FILE)
-    with open(path, "w") as f:
+    tmp = path.with_name(path.name + f".{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "w") as f:
         json.dump(state, f, indent=2, default=str)
+    os.replace(tmp, path)
     logger.debug("Sync state saved to %s", path)
 
 
@@ -330,9 +664,10 @@ def get_last_sync(endpoint: str) -> Optional[str]:
 
 
 def update_last_sync(endpoint: str, timestamp: Optional[str] = None) -> None:
-    """Update last sync timestamp for an endpoint."""
-    state = load_sync_state()
+    """Update last sync timestamp for an endpoint (thread-safe)."""
     if timestamp is None:
         timestamp = datetime.now(timezone.utc).isoformat()
-    state[endpoint] = timestamp
-    save_sync_state(state)
+    with _sync_state_lock:
+        state = load_sync_state()
+        state[endpoint] = timestamp
+        save_sync_state(state)
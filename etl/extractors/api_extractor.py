@@ -2,14 +2,33 @@
 
 Each function calls the API client, flattens nested JSON structures,
 and returns a pandas DataFrame ready for loading into DWH.
+
+extract_all_async fetches several endpoints concurrently through
+AsyncClinicIQClient, using the same params and row flattening (ENDPOINTS).
+Date-ranged endpoints can also be split into month/branch shards
+(plan_shards) that are fetched in parallel and merged. stream_all_async
+hands each endpoint's pages to a sink as they arrive instead of building
+whole-endpoint frames.
 """
 
+import asyncio
+import json
 import logging
-from typing import Optional
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Callable, Optional
 
 import pandas as pd
 
+from etl.dtypes import (
+    API_APPOINTMENT_DTYPES,
+    API_BRANCH_DTYPES,
+    API_DOCTOR_DTYPES,
+    API_INVOICE_DTYPES,
+    API_PATIENT_STATS_DTYPES,
+    API_SERVICE_DTYPES,
+    API_TRANSACTION_DTYPES,
+)
 from etl.extractors.api_client import (
+    AsyncClinicIQClient,
     ClinicIQClient,
     get_last_sync,
     update_last_sync,
@@ -33,34 +52,23 @@ def _get_client() -> ClinicIQClient:
 
 def extract_branches() -> pd.DataFrame:
     """Fetch branch directory from API."""
-    client = _get_client()
-    logger.info("Extracting branches from API...")
+    return _extract("branches")
 
-    records = client.fetch_all("/branches")
-    if not records:
-        logger.warning("No branches returned from API")
-        return pd.DataFrame()
 
-    rows = []
-    for r in records:
-        rows.append({
-            "branch_id_api": r.get("branch_id"),
-            "name": r.get("name"),
-            "code": r.get("code"),
-            "address": r.get("address"),
-            "phone": r.get("phone"),
-            "chairs_count": r.get("chairs_count"),
-            "doctors_count": r.get("doctors_count"),
-            "is_active": r.get("is_active"),
-            "opened_date": r.get("opened_date"),
-            "working_hours": str(r.get("working_hours", {})),
-            "updated_at": r.get("updated_at"),
-        })
-
-    df = pd.DataFrame(rows)
-    logger.info("Extracted %d branches", len(df))
-    update_last_sync("branches")
-    return df
+def _branch_row(r: dict) -> dict:
+    return {
+        "branch_id_api": r.get("branch_id"),
+        "name": r.get("name"),
+        "code": r.get("code"),
+        "address": r.get("address"),
+        "phone": r.get("phone"),
+        "chairs_count": r.get("chairs_count"),
+        "doctors_count": r.get("doctors_count"),
+        "is_active": r.get("is_active"),
+        "opened_date": r.get("opened_date"),
+        "working_hours": str(r.get("working_hours", {})),
+        "updated_at": r.get("updated_at"),
+    }
 
 
 # ── Doctors ────────────────────────────────────────────────────
@@ -68,45 +76,27 @@ def extract_branches() -> pd.DataFrame:
 
 def extract_doctors(incremental: bool = True) -> pd.DataFrame:
     """Fetch doctor directory from API."""
-    client = _get_client()
-    logger.info("Extracting doctors from API...")
+    return _extract("doctors", incremental=incremental)
 
-    params = {}
-    if incremental:
-        last_sync = get_last_sync("doctors")
-        if last_sync:
-            params["modified_since"] = last_sync
-            logger.info("Incremental sync since %s", last_sync)
 
-    records = client.fetch_all("/doctors", params)
-    if not records:
-        logger.warning("No doctors returned from API")
-        return pd.DataFrame()
-
-    rows = []
-    for r in records:
-        primary_branch = r.get("primary_branch") or {}
-        branches = r.get("branches", [])
-        rows.append({
-            "doctor_id_api": r.get("doctor_id"),
-            "full_name": r.get("full_name"),
-            "short_name": r.get("short_name"),
-            "specialization": r.get("specialization"),
-            "additional_specializations": ", ".join(
-                r.get("additional_specializations", [])
-            ),
-            "primary_branch_id": primary_branch.get("id"),
-            "primary_branch_name": primary_branch.get("name"),
-            "branch_ids": ", ".join(str(b.get("id", "")) for b in branches),
-            "is_active": r.get("is_active"),
-            "hire_date": r.get("hire_date"),
-            "updated_at": r.get("updated_at"),
-        })
-
-    df = pd.DataFrame(rows)
-    logger.info("Extracted %d doctors", len(df))
-    update_last_sync("doctors")
-    return df
+def _doctor_row(r: dict) -> dict:
+    primary_branch = r.get("primary_branch") or {}
+    branches = r.get("branches", [])
+    return {
+        "doctor_id_api": r.get("doctor_id"),
+        "full_name": r.get("full_name"),
+        "short_name": r.get("short_name"),
+        "specialization": r.get("specialization"),
+        "additional_specializations": ", ".join(
+            r.get("additional_specializations", [])
+        ),
+        "primary_branch_id": primary_branch.get("id"),
+        "primary_branch_name": primary_branch.get("name"),
+        "branch_ids": ", ".join(str(b.get("id", "")) for b in branches),
+        "is_active": r.get("is_active"),
+        "hire_date": r.get("hire_date"),
+        "updated_at": r.get("updated_at"),
+    }
 
 
 # ── Services ───────────────────────────────────────────────────
@@ -114,39 +104,21 @@ def extract_doctors(incremental: bool = True) -> pd.DataFrame:
 
 def extract_services(incremental: bool = True) -> pd.DataFrame:
     """Fetch service catalog from API."""
-    client = _get_client()
-    logger.info("Extracting services from API...")
+    return _extract("services", incremental=incremental)
 
-    params = {}
-    if incremental:
-        last_sync = get_last_sync("services")
-        if last_sync:
-            params["modified_since"] = last_sync
-            logger.info("Incremental sync since %s", last_sync)
-
-    records = client.fetch_all("/services", params)
-    if not records:
-        logger.warning("No services returned from API")
-        return pd.DataFrame()
 
-    rows = []
-    for r in records:
-        rows.append({
-            "service_id_api": r.get("service_id"),
-            "code": r.get("code"),
-            "name": r.get("name"),
-            "category": r.get("category"),
-            "subcategory": r.get("subcategory"),
-            "base_price": r.get("base_price"),
-            "duration_minutes": r.get("duration_minutes"),
-            "is_active": r.get("is_active"),
-            "updated_at": r.get("updated_at"),
-        })
-
-    df = pd.DataFrame(rows)
-    logger.info("Extracted %d services", len(df))
-    update_last_sync("services")
-    return df
+def _service_row(r: dict) -> dict:
+    return {
+        "service_id_api": r.get("service_id"),
+        "code": r.get("code"),
+        "name": r.get("name"),
+        "category": r.get("category"),
+        "subcategory": r.get("subcategory"),
+        "base_price": r.get("base_price"),
+        "duration_minutes": r.get("duration_minutes"),
+        "is_active": r.get("is_active"),
+        "updated_at": r.get("updated_at"),
+    }
 
 
 # ── Transactions ───────────────────────────────────────────────
@@ -211,6 +183,7 @@ def extract_transactions(
     date_to: str,
     branch_id: Optional[int] = None,
     incremental: bool = False,
+    shard: Optional[str] = None,
 ) -> pd.DataFrame:
     """Fetch transactions from API.
 
@@ -219,32 +192,13 @@ def extract_transactions(
         date_to: End date (YYYY-MM-DD)
         branch_id: Optional branch filter
         incremental: If True, use modified_since from last sync
+        shard: Split the range into "month", "branch" or "month,branch"
+            shards fetched in parallel (see plan_shards)
 
     Returns:
         Flattened DataFrame of transactions
     """
-    client = _get_client()
-    logger.info("Extracting transactions %s to %s...", date_from, date_to)
-
-    params: dict = {"date_from": date_from, "date_to": date_to}
-    if branch_id:
-        params["branch_id"] = branch_id
-    if incremental:
-        last_sync = get_last_sync("transactions")
-        if last_sync:
-            params["modified_since"] = last_sync
-            logger.info("Incremental sync since %s", last_sync)
-
-    records = client.fetch_all("/transactions", params)
-    if not records:
-        logger.warning("No transactions returned from API")
-        return pd.DataFrame()
-
-    rows = [_flatten_transaction(r) for r in records]
-    df = pd.DataFrame(rows)
-    logger.info("Extracted %d transactions", len(df))
-    update_last_sync("transactions")
-    return df
+    return _extract("transactions", date_from, date_to, branch_id, incremental, shard=shard)
 
 
 # ── Appointments ───────────────────────────────────────────────
@@ -255,56 +209,37 @@ def extract_appointments(
     date_to: str,
     branch_id: Optional[int] = None,
     incremental: bool = False,
+    shard: Optional[str] = None,
 ) -> pd.DataFrame:
-    """Fetch appointments/visits from API."""
-    client = _get_client()
-    logger.info("Extracting appointments %s to %s...", date_from, date_to)
+    """Fetch appointments/visits from API (``shard``: see extract_transactions)."""
+    return _extract("appointments", date_from, date_to, branch_id, incremental, shard=shard)
 
-    params: dict = {"date_from": date_from, "date_to": date_to}
-    if branch_id:
-        params["branch_id"] = branch_id
-    if incremental:
-        last_sync = get_last_sync("appointments")
-        if last_sync:
-            params["modified_since"] = last_sync
-            logger.info("Incremental sync since %s", last_sync)
-
-    records = client.fetch_all("/appointments", params)
-    if not records:
-        logger.warning("No appointments returned from API")
-        return pd.DataFrame()
 
-    rows = []
-    for r in records:
-        branch = r.get("branch") or {}
-        doctor = r.get("doctor") or {}
-        patient = r.get("patient") or {}
-        rows.append({
-            "appointment_id_api": r.get("appointment_id"),
-            "date": r.get("date"),
-            "time_start": r.get("time_start"),
-            "time_end": r.get("time_end"),
-            "duration_minutes": r.get("duration_minutes"),
-            "branch_id_api": branch.get("id"),
-            "branch_name": branch.get("name"),
-            "doctor_id_api": doctor.get("id"),
-            "doctor_name": doctor.get("name"),
-            "doctor_specialization": doctor.get("specialization"),
-            "patient_id": patient.get("id"),
-            "patient_age": patient.get("age"),
-            "patient_age_group": patient.get("age_group"),
-            "visit_type": r.get("visit_type"),
-            "reason": r.get("reason"),
-            "status": r.get("status"),
-            "source": r.get("source"),
-            "created_at": r.get("created_at"),
-            "updated_at": r.get("updated_at"),
-        })
-
-    df = pd.DataFrame(rows)
-    logger.info("Extracted %d appointments", len(df))
-    update_last_sync("appointments")
-    return df
+def _appointment_row(r: dict) -> dict:
+    branch = r.get("branch") or {}
+    doctor = r.get("doctor") or {}
+    patient = r.get("patient") or {}
+    return {
+        "appointment_id_api": r.get("appointment_id"),
+        "date": r.get("date"),
+        "time_start": r.get("time_start"),
+        "time_end": r.get("time_end"),
+        "duration_minutes": r.get("duration_minutes"),
+        "branch_id_api": branch.get("id"),
+        "branch_name": branch.get("name"),
+        "doctor_id_api": doctor.get("id"),
+        "doctor_name": doctor.get("name"),
+        "doctor_specialization": doctor.get("specialization"),
+        "patient_id": patient.get("id"),
+        "patient_age": patient.get("age"),
+        "patient_age_group": patient.get("age_group"),
+        "visit_type": r.get("visit_type"),
+        "reason": r.get("reason"),
+        "status": r.get("status"),
+        "source": r.get("source"),
+        "created_at": r.get("created_at"),
+        "updated_at": r.get("updated_at"),
+    }
 
 
 # ── Invoices ───────────────────────────────────────────────────
@@ -315,58 +250,38 @@ def extract_invoices(
     date_to: str,
     branch_id: Optional[int] = None,
     incremental: bool = False,
+    shard: Optional[str] = None,
 ) -> pd.DataFrame:
-    """Fetch invoices from API."""
-    client = _get_client()
-    logger.info("Extracting invoices %s to %s...", date_from, date_to)
+    """Fetch invoices from API (``shard``: see extract_transactions)."""
+    return _extract("invoices", date_from, date_to, branch_id, incremental, shard=shard)
 
-    params: dict = {"date_from": date_from, "date_to": date_to}
-    if branch_id:
-        params["branch_id"] = branch_id
-    if incremental:
-        last_sync = get_last_sync("invoices")
-        if last_sync:
-            params["modified_since"] = last_sync
-            logger.info("Incremental sync since %s", last_sync)
-
-    records = client.fetch_all("/invoices", params)
-    if not records:
-        logger.warning("No invoices returned from API")
-        return pd.DataFrame()
 
-    rows = []
-    for r in records:
-        branch = r.get("branch") or {}
-        patient = r.get("patient") or {}
-        doctor = r.get("doctor") or {}
-        items = r.get("items", [])
-        payments = r.get("payments", [])
-
-        rows.append({
-            "invoice_id_api": r.get("invoice_id"),
-            "created_date": r.get("created_date"),
-            "branch_id_api": branch.get("id"),
-            "branch_name": branch.get("name"),
-            "patient_id": patient.get("id"),
-            "patient_age_group": patient.get("age_group"),
-            "doctor_id_api": doctor.get("id"),
-            "doctor_name": doctor.get("name"),
-            "items_count": len(items),
-            "subtotal": r.get("subtotal"),
-            "discount_total": r.get("discount_total"),
-            "total_amount": r.get("total_amount"),
-            "paid_amount": r.get("paid_amount"),
-            "debt": r.get("debt"),
-            "status": r.get("status"),
-            "payments_count": len(payments),
-            "created_at": r.get("created_at"),
-            "updated_at": r.get("updated_at"),
-        })
-
-    df = pd.DataFrame(rows)
-    logger.info("Extracted %d invoices", len(df))
-    update_last_sync("invoices")
-    return df
+def _invoice_row(r: dict) -> dict:
+    branch = r.get("branch") or {}
+    patient = r.get("patient") or {}
+    doctor = r.get("doctor") or {}
+    items = r.get("items", [])
+    payments = r.get("payments", [])
+    return {
+        "invoice_id_api": r.get("invoice_id"),
+        "created_date": r.get("created_date"),
+        "branch_id_api": branch.get("id"),
+        "branch_name": branch.get("name"),
+        "patient_id": patient.get("id"),
+        "patient_age_group": patient.get("age_group"),
+        "doctor_id_api": doctor.get("id"),
+        "doctor_name": doctor.get("name"),
+        "items_count": len(items),
+        "subtotal": r.get("subtotal"),
+        "discount_total": r.get("discount_total"),
+        "total_amount": r.get("total_amount"),
+        "paid_amount": r.get("paid_amount"),
+        "debt": r.get("debt"),
+        "status": r.get("status"),
+        "payments_count": len(payments),
+        "created_at": r.get("created_at"),
+        "updated_at": r.get("updated_at"),
+    }
 
 
 # ── Patient Stats ──────────────────────────────────────────────
@@ -378,45 +293,500 @@ def extract_patient_stats(
     group_by: str = "month,branch",
 ) -> pd.DataFrame:
     """Fetch aggregated patient statistics from API."""
-    client = _get_client()
-    logger.info("Extracting patient stats %s to %s...", date_from, date_to)
+    return _extract("patient_stats", date_from, date_to, group_by=group_by)
+
 
-    params: dict = {
-        "date_from": date_from,
-        "date_to": date_to,
-        "group_by": group_by,
+def _patient_stats_row(r: dict) -> dict:
+    branch = r.get("branch") or {}
+    age_dist = r.get("age_distribution") or {}
+    return {
+        "period": r.get("period"),
+        "branch_id_api": branch.get("id"),
+        "branch_name": branch.get("name"),
+        "total_patients": r.get("total_patients"),
+        "new_patients": r.get("new_patients"),
+        "returning_patients": r.get("returning_patients"),
+        "retention_rate": r.get("retention_rate"),
+        "avg_age": r.get("avg_age"),
+        "age_0_17": age_dist.get("0_17"),
+        "age_18_30": age_dist.get("18_30"),
+        "age_31_45": age_dist.get("31_45"),
+        "age_46_60": age_dist.get("46_60"),
+        "age_60_plus": age_dist.get("60_plus"),
+        "avg_visits_per_patient": r.get("avg_visits_per_patient"),
+        "avg_revenue_per_patient": r.get("avg_revenue_per_patient"),
+        "avg_ltv": r.get("avg_ltv"),
     }
 
-    data = client.get("/patients/stats", params)
-    records = data.get("data", [])
+
+# ── Endpoint registry ──────────────────────────────────────────
+
+# name -> path, row flattener, column dtypes, label for logs, record id used
+# to merge shards; ``paginated=False`` endpoints return a single response
+ENDPOINTS: dict[str, dict] = {
+    "branches": {
+        "path": "/branches", "row": _branch_row, "dtypes": API_BRANCH_DTYPES,
+        "label": "branches",
+    },
+    "doctors": {
+        "path": "/doctors", "row": _doctor_row, "dtypes": API_DOCTOR_DTYPES,
+        "label": "doctors",
+    },
+    "services": {
+        "path": "/services", "row": _service_row, "dtypes": API_SERVICE_DTYPES,
+        "label": "services",
+    },
+    "transactions": {
+        "path": "/transactions", "row": _flatten_transaction,
+        "dtypes": API_TRANSACTION_DTYPES, "label": "transactions", "id": "transaction_id",
+    },
+    "appointments": {
+        "path": "/appointments", "row": _appointment_row,
+        "dtypes": API_APPOINTMENT_DTYPES, "label": "appointments", "id": "appointment_id",
+    },
+    "invoices": {
+        "path": "/invoices", "row": _invoice_row, "dtypes": API_INVOICE_DTYPES,
+        "label": "invoices", "id": "invoice_id",
+    },
+    "patient_stats": {
+        "path": "/patients/stats", "row": _patient_stats_row,
+        "dtypes": API_PATIENT_STATS_DTYPES, "label": "patient stats rows", "paginated": False,
+    },
+}
+
+# Endpoints that take a date range
+DATED_ENDPOINTS = ("transactions", "appointments", "invoices", "patient_stats")
+
+# Endpoints whose range can be split into shards (records carry an id)
+SHARDABLE_ENDPOINTS = ("transactions", "appointments", "invoices")
+
+SHARD_KINDS = ("month", "branch")
+
+
+def plan_shards(
+    date_from: str,
+    date_to: str,
+    shard: str = "month",
+    branch_ids: Optional[list[int]] = None,
+) -> list[dict]:
+    """
+    Split an extraction range into query windows, in date order.
+
+    ``shard`` is "month", "branch" or "month,branch": calendar months
+    clipped to [date_from, date_to], and/or one shard per id in
+    ``branch_ids``. Returns date_from/date_to(/branch_id) params per shard.
+    """
+    kinds = {k.strip() for k in shard.split(",") if k.strip()}
+    unknown = kinds - set(SHARD_KINDS)
+    if unknown:
+        raise ValueError(f"Unknown shard kind(s): {', '.join(sorted(unknown))}")
+    if "branch" in kinds and not branch_ids:
+        raise ValueError("Branch sharding needs at least one branch id")
+
+    windows = [(date_from, date_to)]
+    if "month" in kinds:
+        windows = []
+        lo, end = pd.Timestamp(date_from), pd.Timestamp(date_to)
+        while lo <= end:
+            hi = min(lo + pd.offsets.MonthEnd(0), end)
+            windows.append((lo.date().isoformat(), hi.date().isoformat()))
+            lo = hi + pd.Timedelta(days=1)
+
+    branches = branch_ids if "branch" in kinds else [None]
+    return [
+        {"date_from": lo, "date_to": hi, **({"branch_id": b} if b is not None else {})}
+        for lo, hi in windows
+        for b in branches
+    ]
+
+
+def _merge_shards(name: str, shards: list[list[dict]]) -> list[dict]:
+    """Concatenate shard results in order, keeping one record per id (the last seen)."""
+    key = ENDPOINTS[name]["id"]
+    merged: dict = {}
+    total = 0
+    for records in shards:
+        for r in records:
+            rid = r.get(key)
+            merged[rid if rid is not None else ("no id", total)] = r
+            total += 1
+    if total > len(merged):
+        logger.info("Dropped %d duplicate %s across shards", total - len(merged), name)
+    return list(merged.values())
+
+
+def _endpoint_params(
+    name: str,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    branch_id: Optional[int] = None,
+    incremental: bool = False,
+    group_by: str = "month,branch",
+) -> dict:
+    """Query params for one endpoint; logs what is being extracted."""
+    params: dict = {}
+    if name in DATED_ENDPOINTS:
+        logger.info("Extracting %s %s to %s...", name, date_from, date_to)
+        params.update(date_from=date_from, date_to=date_to)
+    else:
+        logger.info("Extracting %s from API...", name)
+    if name == "patient_stats":
+        params["group_by"] = group_by
+        return params
+    if branch_id:
+        params["branch_id"] = branch_id
+    if incremental:
+        last_sync = get_last_sync(name)
+        if last_sync:
+            params["modified_since"] = last_sync
+            logger.info("Incremental sync since %s", last_sync)
+    return params
+
+
+def _page_frame(name: str, records: list[dict]) -> pd.DataFrame:
+    """Flatten records of one endpoint into a DataFrame with the endpoint's dtypes."""
+    spec = ENDPOINTS[name]
+    df = pd.DataFrame([spec["row"](r) for r in records])
+    return df.astype({c: t for c, t in spec["dtypes"].items() if c in df.columns})
+
+
+def _to_frame(name: str, records: list[dict]) -> pd.DataFrame:
+    """Flatten records of one endpoint and record the successful sync."""
+    spec = ENDPOINTS[name]
     if not records:
-        logger.warning("No patient stats returned from API")
+        logger.warning("No %s returned from API", spec["label"])
         return pd.DataFrame()
 
-    rows = []
-    for r in records:
-        branch = r.get("branch") or {}
-        age_dist = r.get("age_distribution") or {}
-        rows.append({
-            "period": r.get("period"),
-            "branch_id_api": branch.get("id"),
-            "branch_name": branch.get("name"),
-            "total_patients": r.get("total_patients"),
-            "new_patients": r.get("new_patients"),
-            "returning_patients": r.get("returning_patients"),
-            "retention_rate": r.get("retention_rate"),
-            "avg_age": r.get("avg_age"),
-            "age_0_17": age_dist.get("0_17"),
-            "age_18_30": age_dist.get("18_30"),
-            "age_31_45": age_dist.get("31_45"),
-            "age_46_60": age_dist.get("46_60"),
-            "age_60_plus": age_dist.get("60_plus"),
-            "avg_visits_per_patient": r.get("avg_visits_per_patient"),
-            "avg_revenue_per_patient": r.get("avg_revenue_per_patient"),
-            "avg_ltv": r.get("avg_ltv"),
-        })
-
-    df = pd.DataFrame(rows)
-    logger.info("Extracted %d patient stats rows", len(df))
-    update_last_sync("patient_stats")
+    df = _page_frame(name, records)
+    logger.info("Extracted %d %s", len(df), spec["label"])
+    update_last_sync(name)
     return df
+
+
+def _extract(name: str, *args, shard: Optional[str] = None, **kwargs) -> pd.DataFrame:
+    """Fetch and flatten one endpoint with the shared sync client."""
+    if shard:
+        return asyncio.run(_extract_sharded(name, *args, shard=shard, **kwargs))
+    client = _get_client()
+    spec = ENDPOINTS[name]
+    params = _endpoint_params(name, *args, **kwargs)
+    if spec.get("paginated", True):
+        records = client.fetch_all(spec["path"], params)
+    else:
+        records = client.get(spec["path"], params).get("data", [])
+    return _to_frame(name, records)
+
+
+async def _extract_sharded(name: str, *args, **kwargs) -> pd.DataFrame:
+    async with AsyncClinicIQClient() as client:
+        return await extract_endpoint_async(client, name, *args, **kwargs)
+
+
+async def _shard_windows(
+    client: AsyncClinicIQClient,
+    name: str,
+    params: dict,
+    shard: str,
+    branch_ids: Optional[list[int]],
+) -> list[dict]:
+    """plan_shards for one endpoint; branch ids default to the branch_id
+    filter, else all branches."""
+    if "branch" in shard and not branch_ids:
+        branch_ids = [params["branch_id"]] if "branch_id" in params else [
+            b.get("branch_id") for b in await client.fetch_all("/branches")
+        ]
+    shards = plan_shards(params["date_from"], params["date_to"], shard, branch_ids)
+    logger.info("Fetching %s in %d shards (by %s)", name, len(shards), shard)
+    return shards
+
+
+async def extract_endpoint_async(
+    client: AsyncClinicIQClient,
+    name: str,
+    *args,
+    shard: Optional[str] = None,
+    branch_ids: Optional[list[int]] = None,
+    **kwargs,
+) -> pd.DataFrame:
+    """
+    Async equivalent of the extract_* functions for endpoint ``name``.
+
+    With ``shard`` a SHARDABLE endpoint is fetched as plan_shards windows in
+    parallel and merged in shard order without duplicate records.
+    """
+    spec = ENDPOINTS[name]
+    params = _endpoint_params(name, *args, **kwargs)
+    if shard and name in SHARDABLE_ENDPOINTS:
+        shards = await _shard_windows(client, name, params, shard, branch_ids)
+        results = await asyncio.gather(
+            *(client.fetch_all(spec["path"], {**params, **window}) for window in shards)
+        )
+        records = _merge_shards(name, results)
+    elif spec.get("paginated", True):
+        records = await client.fetch_all(spec["path"], params)
+    else:
+        records = (await client.get(spec["path"], params)).get("data", [])
+    return _to_frame(name, records)
+
+
+def run_key(params: dict, shard: Optional[str] = None) -> str:
+    """Identity of an endpoint crawl: its query params and sharding."""
+    return json.dumps({"params": params, "shard": shard}, sort_keys=True, default=str)
+
+
+def _window_key(window: Optional[dict]) -> str:
+    if not window:
+        return "all"
+    key = f"{window['date_from']}..{window['date_to']}"
+    return f"{key}/{window['branch_id']}" if "branch_id" in window else key
+
+
+async def iter_endpoint_frames(
+    client: AsyncClinicIQClient,
+    name: str,
+    *args,
+    shard: Optional[str] = None,
+    branch_ids: Optional[list[int]] = None,
+    max_pending: int = 4,
+    resume: Optional[Callable[[str], dict]] = None,
+    **kwargs,
+) -> AsyncGenerator[tuple[pd.DataFrame, dict], None]:
+    """
+    Async generator of endpoint ``name`` page by page, as flattened DataFrames.
+
+    Streaming counterpart of extract_endpoint_async: only the pages in
+    flight are held in memory. Shards are fetched concurrently (at most
+    ``max_pending`` pages buffered) and yielded in arrival order, skipping
+    records whose id was already yielded in this run.
+
+    Each frame comes with its progress: run (run_key), window, the cursor
+    of the window's next page, records and done. ``resume(run)`` returns
+    the progress saved by an interrupted run with the same run key, by
+    window: finished windows are skipped, the others continue from their
+    cursor. The sync is not recorded; call update_last_sync once the pages
+    are stored.
+    """
+    params = _endpoint_params(name, *args, **kwargs)
+    run = run_key(params, shard if name in SHARDABLE_ENDPOINTS else None)
+    saved = resume(run) if resume else {}
+    async for item in _iter_frames(
+        client, name, params, run, saved, shard, branch_ids, max_pending
+    ):
+        yield item
+
+
+async def _iter_frames(
+    client: AsyncClinicIQClient,
+    name: str,
+    params: dict,
+    run: str,
+    saved: dict,
+    shard: Optional[str],
+    branch_ids: Optional[list[int]],
+    max_pending: int,
+) -> AsyncGenerator[tuple[pd.DataFrame, dict], None]:
+    spec = ENDPOINTS[name]
+
+    def progress(window: Optional[dict], records: list, cursor: Optional[str]) -> dict:
+        return {
+            "run": run, "window": _window_key(window), "cursor": cursor,
+            "records": len(records), "done": cursor is None,
+        }
+
+    if not spec.get("paginated", True):
+        if saved.get("all", {}).get("done"):
+            return
+        records = (await client.get(spec["path"], params)).get("data", [])
+        if records:
+            yield _page_frame(name, records), progress(None, records, None)
+        return
+
+    if shard and name in SHARDABLE_ENDPOINTS:
+        windows = await _shard_windows(client, name, params, shard, branch_ids)
+    else:
+        windows = [None]
+    pending = []
+    for window in windows:
+        state = saved.get(_window_key(window), {})
+        if not state.get("done"):
+            pending.append((window, state.get("cursor")))
+    if len(pending) < len(windows):
+        logger.info("Skipping %d finished %s windows", len(windows) - len(pending), name)
+
+    pages: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+
+    async def fetch(window: Optional[dict], cursor: Optional[str]) -> None:
+        try:
+            async for records, next_cursor in client.iter_cursor_pages(
+                spec["path"], {**params, **(window or {})}, cursor=cursor
+            ):
+                await pages.put((records, progress(window, records, next_cursor)))
+        except Exception as e:
+            await pages.put(e)
+        else:
+            await pages.put(None)
+
+    tasks = [asyncio.create_task(fetch(window, cursor)) for window, cursor in pending]
+    key = spec.get("id")
+    seen: set = set()
+    try:
+        running = len(tasks)
+        while running:
+            item = await pages.get()
+            if item is None:
+                running -= 1
+                continue
+            if isinstance(item, Exception):
+                raise item
+            records, page_progress = item
+            if key and len(windows) > 1:
+                fresh = []
+                for r in records:
+                    rid = r.get(key)
+                    if rid is None or rid not in seen:
+                        seen.add(rid)
+                        fresh.append(r)
+                records = fresh
+                page_progress["records"] = len(records)
+            # Empty after dedup: still yielded so the cursor is checkpointed
+            yield _page_frame(name, records), page_progress
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _endpoint_kwargs(
+    name: str,
+    date_from: str,
+    date_to: str,
+    incremental: bool,
+    shard: Optional[str],
+    branch_ids: Optional[list[int]],
+) -> dict:
+    """Keyword arguments of one endpoint in a multi-endpoint sync."""
+    kwargs = {}
+    if name in SHARDABLE_ENDPOINTS and shard:
+        kwargs.update(shard=shard, branch_ids=branch_ids)
+    if name in DATED_ENDPOINTS:
+        kwargs.update(date_from=date_from, date_to=date_to)
+    if name not in ("branches", "patient_stats"):
+        kwargs["incremental"] = incremental
+    return kwargs
+
+
+async def _run_endpoints(
+    endpoints: list[str],
+    date_from: str,
+    date_to: str,
+    job: Callable[[AsyncClinicIQClient, str, dict], Awaitable],
+    incremental: bool,
+    max_concurrency: int,
+    shard: Optional[str],
+) -> dict:
+    """Run ``job(client, name, kwargs)`` for every endpoint concurrently."""
+    try:
+        client = AsyncClinicIQClient(max_concurrency=max_concurrency)
+    except Exception as e:
+        return {name: e for name in endpoints}
+
+    async with client:
+        branch_ids = None
+        if shard and "branch" in shard and set(endpoints) & set(SHARDABLE_ENDPOINTS):
+            try:
+                branch_ids = [b.get("branch_id") for b in await client.fetch_all("/branches")]
+            except Exception as e:
+                logger.warning("Could not list branches for sharding: %s", e)
+
+        async def run(name: str):
+            kwargs = _endpoint_kwargs(name, date_from, date_to, incremental, shard, branch_ids)
+            try:
+                return name, await job(client, name, kwargs)
+            except Exception as e:
+                return name, e
+
+        return dict(await asyncio.gather(*(run(n) for n in endpoints)))
+
+
+async def extract_all_async(
+    endpoints: list[str],
+    date_from: str,
+    date_to: str,
+    incremental: bool = False,
+    max_concurrency: int = 4,
+    on_result: Optional[Callable[[str, object], None]] = None,
+    shard: Optional[str] = None,
+) -> dict:
+    """
+    Extract several endpoints concurrently over one AsyncClinicIQClient.
+
+    Reference endpoints (branches) ignore the date range and ``incremental``
+    like extract_branches does; with ``shard`` the SHARDABLE endpoints are
+    also split into parallel windows. Returns endpoint -> DataFrame, or the
+    exception that endpoint raised; ``on_result(name, frame_or_exc)`` is
+    called as soon as each endpoint finishes.
+    """
+    async def job(client, name, kwargs):
+        try:
+            result = await extract_endpoint_async(client, name, **kwargs)
+        except Exception as e:
+            result = e
+        if on_result:
+            on_result(name, result)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    return await _run_endpoints(
+        endpoints, date_from, date_to, job, incremental, max_concurrency, shard
+    )
+
+
+async def stream_all_async(
+    endpoints: list[str],
+    date_from: str,
+    date_to: str,
+    sink: Callable[[str, AsyncIterator[tuple[pd.DataFrame, dict]], bool], Awaitable[int]],
+    incremental: bool = False,
+    max_concurrency: int = 4,
+    shard: Optional[str] = None,
+    resume: Optional[Callable[[str, str], dict]] = None,
+    finish: Optional[Callable[[str, bool], None]] = None,
+) -> dict:
+    """
+    Stream several endpoints concurrently, page by page, into ``sink``.
+
+    ``sink(name, pages, resumed)`` consumes the iter_endpoint_frames pages
+    of one endpoint ((frame, progress) pairs) and returns the number of rows
+    it stored; the sync is recorded only after it returns. ``resume(name,
+    run)`` supplies saved progress (see iter_endpoint_frames); ``resumed``
+    tells the sink that rows of this run were already stored, so a
+    truncate reload must now append. ``finish(name, synced)`` then runs in
+    a worker thread instead of update_last_sync, with ``synced`` telling
+    whether the sync should be recorded. Returns endpoint -> row count, or
+    the exception that endpoint raised.
+    """
+    async def job(client, name, kwargs):
+        shard_kind = kwargs.pop("shard", None)
+        branch_ids = kwargs.pop("branch_ids", None)
+        params = _endpoint_params(name, **kwargs)
+        run = run_key(params, shard_kind)
+        saved = await asyncio.to_thread(resume, name, run) if resume else {}
+        resumed = any(state["records"] for state in saved.values())
+        pages = _iter_frames(
+            client, name, params, run, saved, shard_kind, branch_ids, max_pending=4
+        )
+        rows = await sink(name, pages, resumed)
+        synced = bool(rows or resumed)
+        if synced:
+            logger.info("Streamed %d %s", rows, ENDPOINTS[name]["label"])
+        else:
+            logger.warning("No %s returned from API", ENDPOINTS[name]["label"])
+        if finish:
+            await asyncio.to_thread(finish, name, synced)
+        elif synced:
+            update_last_sync(name)
+        return rows
+
+    return await _run_endpoints(
+        endpoints, date_from, date_to, job, incremental, max_concurrency, shard
+    )
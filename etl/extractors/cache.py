@@ -0,0 +1,210 @@
+"""Content-addressed Parquet cache for parsed Excel extracts.
+
+Parsing xlsx with openpyxl is the slowest ETL stage, so extractor results
+are stored as Parquet under EXTRACT_CACHE_DIR. The cache key combines:
+- SHA-256 of the source file contents
+- extractor name, sheet name and extractor version
+- any extra extractor arguments
+
+One entry is a directory with one Parquet file per returned DataFrame and a
+meta.json written last; an entry without meta.json is treated as a miss.
+The least recently used entries are evicted once the cache exceeds
+EXTRACT_CACHE_MAX_MB.
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+import pandas as pd
+
+from etl.config import EXTRACT_CACHE_DIR, EXTRACT_CACHE_MAX_MB
+
+logger = logging.getLogger(__name__)
+
+_enabled = os.getenv("EXTRACT_CACHE", "1") != "0"
+
+META_FILE = "meta.json"
+
+
+def set_cache_enabled(enabled: bool) -> None:
+    """Enable or disable the extract cache for this process and its children."""
+    global _enabled
+    _enabled = enabled
+    os.environ["EXTRACT_CACHE"] = "1" if enabled else "0"
+
+
+def cache_enabled() -> bool:
+    """Whether cached extracts may be read and written."""
+    return _enabled
+
+
+def file_digest(filepath: Path) -> str:
+    """SHA-256 of file contents, read in 1 MB blocks."""
+    h = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _cache_key(
+    digest: str, name: str, sheet: str, version: int, extra: dict, fingerprint: str
+) -> str:
+    payload = json.dumps(
+        {
+            "file": digest,
+            "extractor": name,
+            "sheet": sheet,
+            "version": version,
+            "args": extra,
+            "fingerprint": fingerprint,
+        },
+        sort_keys=True,
+        default=str,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def _read_entry(entry: Path):
+    """Read cached result, or return None on miss."""
+    meta_path = entry / META_FILE
+    if not meta_path.exists():
+        return None
+    with open(meta_path, "r") as f:
+        meta = json.load(f)
+    frames = [pd.read_parquet(entry / f"part-{i}.parquet") for i in range(meta["parts"])]
+    os.utime(meta_path)  # mark as recently used for LRU eviction
+    return tuple(frames) if meta["tuple"] else frames[0]
+
+
+def _write_entry(entry: Path, result, meta: dict) -> None:
+    frames = list(result) if isinstance(result, tuple) else [result]
+    tmp = entry.with_name(entry.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    try:
+        for i, df in enumerate(frames):
+            df.to_parquet(tmp / f"part-{i}.parquet", index=True)
+        meta = dict(meta, tuple=isinstance(result, tuple), parts=len(frames))
+        with open(tmp / META_FILE, "w") as f:
+            json.dump(meta, f, indent=2, ensure_ascii=False)
+        shutil.rmtree(entry, ignore_errors=True)
+        tmp.rename(entry)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def _entry_size(entry: Path) -> int:
+    return sum(p.stat().st_size for p in entry.iterdir() if p.is_file())
+
+
+def evict(max_bytes: Optional[int] = None) -> int:
+    """Remove least recently used entries until the cache fits into max_bytes.
+
+    Returns:
+        Number of entries removed
+    """
+    if max_bytes is None:
+        max_bytes = EXTRACT_CACHE_MAX_MB * 1024 * 1024
+    cache_dir = Path(EXTRACT_CACHE_DIR)
+    if not cache_dir.exists():
+        return 0
+
+    entries = []
+    for entry in cache_dir.iterdir():
+        meta_path = entry / META_FILE
+        if entry.is_dir() and meta_path.exists():
+            entries.append((meta_path.stat().st_mtime, _entry_size(entry), entry))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, entry in sorted(entries, key=lambda e: e[0]):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+        removed += 1
+
+    if removed:
+        logger.info("Evicted %d cached extracts (cache size now %.1f MB)", removed, total / 1e6)
+    return removed
+
+
+def clear_cache() -> None:
+    """Remove all cached extracts."""
+    shutil.rmtree(EXTRACT_CACHE_DIR, ignore_errors=True)
+
+
+def cached_extract(
+    sheet: str, version: int = 1, fingerprint: Optional[Callable[[], str]] = None
+) -> Callable:
+    """Cache the DataFrame (or tuple of DataFrames) returned by an extractor.
+
+    The decorated function must take the source file path as its first
+    argument. Bump ``version`` whenever the extractor output changes.
+    ``fingerprint`` returns extra settings the output depends on (e.g. the
+    patient hash salt) and is mixed into the key.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(filepath, *args, **kwargs):
+            if not _enabled:
+                return func(filepath, *args, **kwargs)
+
+            filepath = Path(filepath)
+            bound = signature.bind(filepath, *args, **kwargs)
+            bound.apply_defaults()
+            extra = dict(list(bound.arguments.items())[1:])
+
+            digest = file_digest(filepath)
+            key = _cache_key(
+                digest, func.__qualname__, sheet, version, extra,
+                fingerprint() if fingerprint else "",
+            )
+            entry = Path(EXTRACT_CACHE_DIR) / key
+
+            try:
+                cached = _read_entry(entry)
+            except Exception as e:
+                logger.warning("Ignoring unreadable cache entry %s: %s", entry, e)
+                cached = None
+            if cached is not None:
+                logger.info("Cache hit for %s (%s, sheet=%s)", func.__name__, filepath.name, sheet)
+                return cached
+
+            start = time.perf_counter()
+            result = func(filepath, *args, **kwargs)
+            elapsed = time.perf_counter() - start
+
+            try:
+                _write_entry(entry, result, {
+                    "extractor": func.__qualname__,
+                    "sheet": sheet,
+                    "version": version,
+                    "source_file": filepath.name,
+                    "source_sha256": digest,
+                    "parse_seconds": round(elapsed, 3),
+                })
+                logger.info("Cached %s for %s (parsed in %.1fs)", func.__name__, filepath.name, elapsed)
+                evict()
+            except Exception as e:
+                logger.warning("Could not cache %s for %s: %s", func.__name__, filepath.name, e)
+
+            return result
+
+        return wrapper
+
+    return decorator
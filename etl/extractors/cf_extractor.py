@@ -3,11 +3,16 @@
 import logging
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
+from etl.config import CF_BRANCH_MAP
+from etl.extractors.cache import cached_extract
+
 logger = logging.getLogger(__name__)
 
 
+@cached_extract(sheet="2023_офиц", version=1)
 def extract_cf_entries(filepath: Path) -> pd.DataFrame:
     """
     Extract detailed CF entries from 1C export.
@@ -72,69 +77,78 @@ def extract_cf_monthly_svod(filepath: Path, sheet_name: str = "CF_СВОД") ->
     # Row 5: Column headers (Статья, then per ЮЛ per month)
     # Row 6+: Data
 
-    # We parse the line items from the Статья column and pivot
-    records = []
-
-    year_months_row = df_raw.iloc[0]
-    le_row = df_raw.iloc[1]
     header_row = df_raw.iloc[5]
-
-    stat_col = None
-    for idx, val in header_row.items():
-        if val == "Статья":
-            stat_col = idx
-            break
-
-    if stat_col is None:
+    stat_matches = np.flatnonzero((header_row == "Статья").to_numpy())
+    if len(stat_matches) == 0:
         logger.error("Could not find 'Статья' column in CF_СВОД")
         return pd.DataFrame()
+    stat_col = stat_matches[0]
+
+    # Value columns: (year_month, legal_entity) MultiIndex from header rows 0 and 1
+    year_months = df_raw.iloc[0, stat_col + 1:]
+    legal_entities = df_raw.iloc[1, stat_col + 1:]
+    keep = (year_months.notna() & legal_entities.notna()).to_numpy()
+    columns = pd.MultiIndex.from_arrays(
+        [
+            year_months[keep].astype(str).to_numpy(),
+            legal_entities[keep].astype(str).to_numpy(),
+        ],
+        names=["year_month_str", "legal_entity"],
+    )
 
-    # Build column mapping: col_index -> (year_month, legal_entity)
-    col_map = {}
-    for col_idx in range(stat_col + 1, len(header_row)):
-        ym = year_months_row.iloc[col_idx]
-        le = le_row.iloc[col_idx]
-        if pd.notna(ym) and pd.notna(le):
-            col_map[col_idx] = (str(ym), str(le))
-
-    for row_idx in range(6, len(df_raw)):
-        line_item = df_raw.iloc[row_idx, stat_col]
-        if pd.isna(line_item) or not str(line_item).strip():
-            continue
-        line_item = str(line_item).strip()
-
-        for col_idx, (ym, le) in col_map.items():
-            val = df_raw.iloc[row_idx, col_idx]
-            if pd.notna(val):
-                try:
-                    amount = float(val)
-                except (ValueError, TypeError):
-                    continue
-                if amount == 0:
-                    continue
-                records.append({
-                    "year_month_str": ym,
-                    "legal_entity": le,
-                    "line_item": line_item,
-                    "amount": amount,
-                    "source_file": filepath.name,
-                })
-
-    df = pd.DataFrame(records)
-    if not df.empty:
-        logger.info(f"Extracted {len(df)} CF monthly records")
-    else:
+    line_items = df_raw.iloc[6:, stat_col]
+    line_items = line_items[line_items.notna()].astype(str).str.strip()
+    line_items = line_items[line_items != ""]
+
+    block = df_raw.iloc[6:, stat_col + 1:].loc[line_items.index, keep]
+    block.index = pd.Index(line_items.to_numpy(), name="line_item")
+    block.columns = columns
+
+    df = _unpivot(block)
+    if df.empty:
         logger.warning("No CF monthly records extracted")
+        return pd.DataFrame()
 
+    df["source_file"] = filepath.name
+    logger.info(f"Extracted {len(df)} CF monthly records")
     return df
 
 
+def _unpivot(block: pd.DataFrame) -> pd.DataFrame:
+    """
+    Stack a line_item x column-MultiIndex block into long format.
+
+    Rows are emitted in row-major order (line item, then column), values are
+    coerced to float and empty, non-numeric and zero cells are dropped.
+    """
+    n_rows, n_cols = block.shape
+    amounts = pd.to_numeric(
+        pd.Series(block.to_numpy().ravel()), errors="coerce"
+    ).astype(float).to_numpy()
+
+    long = {
+        name: np.tile(block.columns.get_level_values(name).to_numpy(), n_rows)
+        for name in block.columns.names
+    }
+    long[block.index.name] = np.repeat(block.index.to_numpy(), n_cols)
+    long["amount"] = amounts
+
+    df = pd.DataFrame(long)
+    df = df[df["amount"].notna() & (df["amount"] != 0)]
+    return df.reset_index(drop=True)
+
+
 def extract_cf_clinics(filepath: Path) -> pd.DataFrame:
     """
     Extract CF data broken down by clinics.
 
     Expected: 2025_01_БР CF (2).xlsx, sheet "CF сlinics"
-    Structure: columns per clinic (ТАГАНКА, БАУМАНКА, ДИНАМО, РУБЛЕВКА, ЗИЛАРТ)
+    Structure: row 1 has one column per clinic (ТАГАНКА, БАУМАНКА, ...),
+    row 3+ has line items in the Статья column. Clinic columns are detected
+    from CF_BRANCH_MAP keys, so any number of clinics is supported. If the
+    clinic columns are grouped by month, the group labels from row 0 are
+    returned in a year_month_str column; clinic columns left of the first
+    label belong to no month and are dropped with a warning.
     """
     logger.info(f"Reading CF by clinics from {filepath}")
 
@@ -144,37 +158,43 @@ def extract_cf_clinics(filepath: Path) -> pd.DataFrame:
     logger.info(f"Read raw sheet: {df_raw.shape}")
 
     # Row 1 has clinic names, Row 3 has line items (Статья column)
-    clinic_row = df_raw.iloc[1]
-    clinics = {}
-    for idx, val in clinic_row.items():
-        if pd.notna(val) and str(val).strip():
-            name = str(val).strip()
-            if name in ("ТАГАНКА", "БАУМАНКА", "ДИНАМО", "РУБЛЕВКА", "ЗИЛАРТ"):
-                clinics[idx] = name
-
-    records = []
-    for row_idx in range(3, len(df_raw)):
-        line_item = df_raw.iloc[row_idx, 1]
-        if pd.isna(line_item) or not str(line_item).strip():
-            continue
-        line_item = str(line_item).strip()
-
-        for col_idx, clinic_name in clinics.items():
-            val = df_raw.iloc[row_idx, col_idx]
-            if pd.notna(val):
-                try:
-                    amount = float(val)
-                except (ValueError, TypeError):
-                    continue
-                if amount == 0:
-                    continue
-                records.append({
-                    "branch": clinic_name,
-                    "line_item": line_item,
-                    "amount": amount,
-                    "source_file": filepath.name,
-                })
-
-    df = pd.DataFrame(records)
-    logger.info(f"Extracted {len(df)} CF clinic records")
+    clinic_row = df_raw.iloc[1].astype("string").str.strip()
+    is_clinic = clinic_row.isin(CF_BRANCH_MAP.keys()).to_numpy()
+    if not is_clinic.any():
+        logger.warning("No clinic columns found in CF сlinics")
+        return pd.DataFrame()
+
+    # Optional month groups: row 0 labels over (merged) clinic column blocks
+    first_clinic = np.flatnonzero(is_clinic)[0]
+    periods = df_raw.iloc[0].copy()
+    periods.iloc[:first_clinic] = None
+    periods = periods.ffill()
+    grouped = periods[is_clinic].notna().any()
+    if grouped:
+        unlabelled = is_clinic & periods.isna().to_numpy()
+        if unlabelled.any():
+            logger.warning(
+                f"Dropping clinic columns before the first month label in row 0: "
+                f"{list(clinic_row[unlabelled])}"
+            )
+            is_clinic = is_clinic & ~unlabelled
+
+    levels = {"branch": clinic_row[is_clinic].to_numpy(dtype=object)}
+    if grouped:
+        levels = {"year_month_str": periods[is_clinic].astype(str).to_numpy(), **levels}
+
+    line_items = df_raw.iloc[3:, 1]
+    line_items = line_items[line_items.notna()].astype(str).str.strip()
+    line_items = line_items[line_items != ""]
+
+    block = df_raw.iloc[3:].loc[line_items.index, is_clinic]
+    block.index = pd.Index(line_items.to_numpy(), name="line_item")
+    block.columns = pd.MultiIndex.from_arrays(list(levels.values()), names=list(levels))
+
+    df = _unpivot(block)
+    df["source_file"] = filepath.name
+    logger.info(
+        f"Extracted {len(df)} CF clinic records "
+        f"({df['branch'].nunique()} clinics)"
+    )
     return df
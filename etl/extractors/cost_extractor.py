@@ -5,9 +5,12 @@ from pathlib import Path
 
 import pandas as pd
 
+from etl.extractors.cache import cached_extract
+
 logger = logging.getLogger(__name__)
 
 
+@cached_extract(sheet="отчет", version=1)
 def extract_cost_structure(filepath: Path) -> pd.DataFrame:
     """
     Extract unit economics per procedure.
@@ -54,6 +57,7 @@ def extract_cost_structure(filepath: Path) -> pd.DataFrame:
     return df
 
 
+@cached_extract(sheet="Лиды общие+Источники первичных лидов", version=1)
 def extract_leads(filepath: Path) -> tuple[pd.DataFrame, pd.DataFrame]:
     """
     Extract lead data.
@@ -0,0 +1,154 @@
+"""Patient name anonymization.
+
+Patient names are replaced by a 64-bit key: the first 8 bytes of the SHA-256
+of the stripped name (optionally prefixed with PATIENT_HASH_SALT), read as a
+signed big-endian integer, so it fits a BIGINT column. This is the same value
+as the former 16-hex-char hash, i.e. ('x' || hex)::bit(64)::bigint in SQL.
+Hashing is done once per unique name, and known name -> key pairs are kept
+in a per-salt cache so that overlapping exports do not rehash the same
+patients. The cache is only persisted when PATIENT_HASH_CACHE_DIR points to a
+directory outside the repository, since it stores the names in plaintext.
+"""
+
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from etl.config import PATIENT_HASH_CACHE_DIR, PATIENT_HASH_SALT, PROJECT_ROOT
+
+logger = logging.getLogger(__name__)
+
+
+def salt_fingerprint(salt: str = PATIENT_HASH_SALT) -> str:
+    """Short non-reversible id of the salt, safe to use in file names and keys."""
+    return hashlib.sha256(f"patient-salt:{salt}".encode("utf-8")).hexdigest()[:12]
+
+
+def _patient_key(name: str, salt: str) -> int:
+    digest = hashlib.sha256((salt + name).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+def hash_patient(name: str, salt: str = PATIENT_HASH_SALT) -> Optional[int]:
+    """Create anonymized 64-bit patient key from full name."""
+    if not name or pd.isna(name):
+        return None
+    return _patient_key(name.strip(), salt)
+
+
+def _inside_project(path: Path) -> bool:
+    return path.resolve().is_relative_to(PROJECT_ROOT.resolve())
+
+
+class PatientHashCache:
+    """Name -> key mapping for a single salt, optionally persisted to Parquet.
+
+    The file holds real patient names, so it must live in the same protected
+    location as the source exports it was built from. Without ``path`` it is
+    written to PATIENT_HASH_CACHE_DIR; if that is unset the mapping is kept in
+    memory only. Paths inside the repository are rejected.
+    """
+
+    def __init__(self, path: Optional[Path] = None, salt: str = PATIENT_HASH_SALT):
+        self.salt = salt
+        if path is None and PATIENT_HASH_CACHE_DIR:
+            path = Path(PATIENT_HASH_CACHE_DIR) / f"patient_keys_{salt_fingerprint(salt)}.parquet"
+        self.path = Path(path) if path else None
+        if self.path is not None and _inside_project(self.path):
+            raise ValueError(
+                f"Patient hash cache {self.path} is inside the repository; "
+                "set PATIENT_HASH_CACHE_DIR to a protected directory outside it"
+            )
+        self._map: Optional[dict] = None
+        self._dirty = False
+
+    def _load(self) -> dict:
+        if self._map is None:
+            self._map = {}
+            if self.path is not None and self.path.exists():
+                try:
+                    df = pd.read_parquet(self.path)
+                    self._map = dict(zip(df["name"], df["hash"]))
+                    logger.info("Loaded %d cached patient keys", len(self._map))
+                except Exception as e:
+                    logger.warning("Ignoring unreadable patient hash cache %s: %s", self.path, e)
+        return self._map
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+    def hash_unique(self, names) -> np.ndarray:
+        """Key an array of unique stripped names, reusing cached keys."""
+        known = self._load()
+        salt = self.salt
+        keys = np.empty(len(names), dtype=np.int64)
+        cached = 0
+        for i, name in enumerate(names):
+            key = known.get(name)
+            if key is None:
+                key = known[name] = _patient_key(name, salt)
+                self._dirty = True
+            else:
+                cached += 1
+            keys[i] = key
+        logger.debug("Patient keys: %d unique, %d from cache", len(names), cached)
+        return keys
+
+    def save(self) -> None:
+        """Write the cache to disk if it changed (atomic replace)."""
+        if self.path is None or not self._dirty or self._map is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + f".{os.getpid()}.tmp")
+        pd.DataFrame({
+            "name": list(self._map.keys()),
+            "hash": np.fromiter(self._map.values(), dtype=np.int64, count=len(self._map)),
+        }).to_parquet(tmp, index=False)
+        os.replace(tmp, self.path)
+        self._dirty = False
+        logger.info("Saved %d patient keys to %s", len(self._map), self.path)
+
+
+_cache: Optional[PatientHashCache] = None
+
+
+def get_patient_hash_cache() -> PatientHashCache:
+    """Process-wide cache for the configured salt."""
+    global _cache
+    if _cache is None or _cache.salt != PATIENT_HASH_SALT:
+        _cache = PatientHashCache()
+    return _cache
+
+
+def hash_patients(
+    names: pd.Series, cache: Optional[PatientHashCache] = None
+) -> pd.Series:
+    """Vectorized hash_patient: key each unique stripped name once.
+
+    Names are factorized, the unique values are keyed (or taken from
+    ``cache``), and the result is mapped back through the factor codes.
+    Returns an Int64 Series; null and empty names give <NA>, like
+    hash_patient.
+    """
+    result = pd.Series(pd.NA, index=names.index, dtype="Int64")
+    valid = names.notna() & (names.astype(str) != "")
+    if not valid.any():
+        return result
+
+    codes, uniques = pd.factorize(names[valid].astype(str).str.strip())
+    if cache is None:
+        keys = np.fromiter(
+            (_patient_key(n, PATIENT_HASH_SALT) for n in uniques),
+            dtype=np.int64,
+            count=len(uniques),
+        )
+    else:
+        keys = cache.hash_unique(uniques)
+
+    result[valid] = keys[codes]
+    return result
@@ -1,10 +1,19 @@
 """Extract MIS transactions from Детализация_транзакций_+_услуги Excel file."""
 
-import hashlib
 import logging
 from pathlib import Path
+from typing import Iterator
 
 import pandas as pd
+from openpyxl import load_workbook
+
+from etl.dtypes import MIS_TRANSACTION_DTYPES, apply_dtypes
+from etl.extractors.cache import cache_enabled, cached_extract
+from etl.extractors.patients import (
+    get_patient_hash_cache,
+    hash_patients,
+    salt_fingerprint,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -29,13 +38,53 @@ EXPECTED_COLUMNS = [
 ]
 
 
-def hash_patient(name: str) -> str:
-    """Create anonymized patient hash from full name."""
-    if not name or pd.isna(name):
-        return None
-    return hashlib.sha256(name.strip().encode("utf-8")).hexdigest()[:16]
+RENAME_MAP = {
+    "Дата транзакции": "transaction_date",
+    "Клиника": "clinic",
+    "Пациент": "patient_name",
+    "Возраст пациента": "patient_age",
+    "Взрослый/Ребенок": "age_group",
+    "Тип оплаты": "payment_type",
+    "Тип операции": "operation_type",
+    "Клиника, где создан счет на оплату": "invoice_clinic",
+    "Сумма счета": "invoice_amount",
+    "Долг в рамках текущего счета": "invoice_debt",
+    "Статус счета": "invoice_status",
+    "Позиции счета": "service_items",
+    "Даты визитов": "visit_dates",
+    "Причины обращения": "visit_reasons",
+    "Врач": "doctor_name",
+    "Статус визитов": "visit_status",
+    "Сумма транзакции": "transaction_amount",
+}
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+def _clean_transactions(df: pd.DataFrame) -> pd.DataFrame:
+    """Rename columns, coerce types, hash patients and drop invalid rows."""
+    df = df.rename(columns=RENAME_MAP)
+
+    df["transaction_date"] = pd.to_datetime(df["transaction_date"], errors="coerce")
+    df["transaction_amount"] = pd.to_numeric(df["transaction_amount"], errors="coerce")
+    df["invoice_amount"] = pd.to_numeric(df["invoice_amount"], errors="coerce")
+    df["invoice_debt"] = pd.to_numeric(df["invoice_debt"], errors="coerce")
+    df["patient_age"] = pd.to_numeric(df["patient_age"], errors="coerce").astype(
+        "Int64"
+    )
+
+    cache = get_patient_hash_cache() if cache_enabled() else None
+    df["patient_hash"] = hash_patients(df["patient_name"], cache)
+
+    invalid = df["transaction_date"].isna() | df["transaction_amount"].isna()
+    if invalid.sum() > 0:
+        logger.warning(f"Dropping {invalid.sum()} rows with null date/amount")
+        df = df[~invalid]
+
+    return apply_dtypes(df, MIS_TRANSACTION_DTYPES, "mis_transactions")
 
 
+@cached_extract(sheet="result", version=3, fingerprint=salt_fingerprint)
 def extract_transactions(filepath: Path) -> pd.DataFrame:
     """
     Read MIS transaction file and return cleaned DataFrame.
@@ -52,45 +101,64 @@ def extract_transactions(filepath: Path) -> pd.DataFrame:
     if missing:
         logger.warning(f"Missing expected columns: {missing}")
 
-    rename_map = {
-        "Дата транзакции": "transaction_date",
-        "Клиника": "clinic",
-        "Пациент": "patient_name",
-        "Возраст пациента": "patient_age",
-        "Взрослый/Ребенок": "age_group",
-        "Тип оплаты": "payment_type",
-        "Тип операции": "operation_type",
-        "Клиника, где создан счет на оплату": "invoice_clinic",
-        "Сумма счета": "invoice_amount",
-        "Долг в рамках текущего счета": "invoice_debt",
-        "Статус счета": "invoice_status",
-        "Позиции счета": "service_items",
-        "Даты визитов": "visit_dates",
-        "Причины обращения": "visit_reasons",
-        "Врач": "doctor_name",
-        "Статус визитов": "visit_status",
-        "Сумма транзакции": "transaction_amount",
-    }
-
-    df = df.rename(columns=rename_map)
-
-    df["transaction_date"] = pd.to_datetime(df["transaction_date"], errors="coerce")
-    df["transaction_amount"] = pd.to_numeric(df["transaction_amount"], errors="coerce")
-    df["invoice_amount"] = pd.to_numeric(df["invoice_amount"], errors="coerce")
-    df["invoice_debt"] = pd.to_numeric(df["invoice_debt"], errors="coerce")
-    df["patient_age"] = pd.to_numeric(df["patient_age"], errors="coerce").astype(
-        "Int64"
-    )
-
-    df["patient_hash"] = df["patient_name"].apply(hash_patient)
-
-    invalid = df["transaction_date"].isna() | df["transaction_amount"].isna()
-    if invalid.sum() > 0:
-        logger.warning(f"Dropping {invalid.sum()} rows with null date/amount")
-        df = df[~invalid]
+    df = _clean_transactions(df)
+    if cache_enabled():
+        get_patient_hash_cache().save()
 
     logger.info(
         f"Extracted {len(df)} transactions, "
         f"date range: {df['transaction_date'].min()} - {df['transaction_date'].max()}"
     )
     return df
+
+
+def iter_transactions(
+    filepath: Path, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream MIS transaction file in cleaned DataFrame chunks.
+
+    Opens the workbook in openpyxl read-only mode and walks the "result"
+    sheet row by row, so only one chunk of ``chunk_size`` rows is held in
+    memory at a time. Each chunk is cleaned exactly like
+    :func:`extract_transactions`.
+    """
+    logger.info(f"Streaming transactions from {filepath} (chunk_size={chunk_size})")
+
+    wb = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        rows = wb["result"].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            logger.warning("Sheet 'result' is empty")
+            return
+        columns = [str(c).strip() if c is not None else "" for c in header]
+
+        missing = [c for c in EXPECTED_COLUMNS if c not in columns]
+        if missing:
+            logger.warning(f"Missing expected columns: {missing}")
+
+        total = 0
+        buffer = []
+        for row in rows:
+            if all(v is None for v in row):
+                continue
+            buffer.append(row[: len(columns)])
+            if len(buffer) >= chunk_size:
+                chunk = _clean_transactions(pd.DataFrame(buffer, columns=columns))
+                buffer = []
+                total += len(chunk)
+                logger.info(f"Streamed chunk of {len(chunk)} transactions ({total} total)")
+                yield chunk
+
+        if buffer:
+            chunk = _clean_transactions(pd.DataFrame(buffer, columns=columns))
+            total += len(chunk)
+            logger.info(f"Streamed chunk of {len(chunk)} transactions ({total} total)")
+            yield chunk
+
+        if cache_enabled():
+            get_patient_hash_cache().save()
+        logger.info(f"Streamed {total} transactions from {filepath}")
+    finally:
+        wb.close()
@@ -0,0 +1,81 @@
+"""Resumable API sync checkpoints (raw.api_sync_checkpoints).
+
+Every streamed page is committed together with the cursor of the next page
+of its window, so after a crash the raw table holds exactly the pages the
+checkpoints describe. A rerun with the same parameters (run key) skips
+finished windows and continues the others from their cursor; a run with
+different parameters discards the old checkpoints and starts over.
+"""
+
+import logging
+from typing import Callable, Optional
+
+from sqlalchemy import inspect, text
+
+from etl.loaders.dwh_loader import get_engine
+
+logger = logging.getLogger(__name__)
+
+
+def load_checkpoints(endpoint: str, run_key: str) -> dict[str, dict]:
+    """Saved progress by window of an interrupted run of ``endpoint`` with ``run_key``."""
+    with get_engine().begin() as conn:
+        rows = conn.execute(
+            text(
+                "SELECT window_key, run_key, cursor, records, pages, done "
+                "FROM raw.api_sync_checkpoints WHERE endpoint = :endpoint"
+            ),
+            {"endpoint": endpoint},
+        ).mappings().all()
+        if any(r["run_key"] != run_key for r in rows):
+            logger.info(f"Discarding checkpoints of an earlier {endpoint} run with other parameters")
+            _delete(conn, endpoint)
+            return {}
+
+    saved = {r["window_key"]: dict(r) for r in rows}
+    if saved:
+        logger.info(
+            f"Resuming {endpoint}: {sum(r['done'] for r in rows)}/{len(rows)} windows done, "
+            f"{sum(r['records'] for r in rows)} records already loaded"
+        )
+    return saved
+
+
+def save_checkpoint(conn, endpoint: str, progress: dict) -> None:
+    """Record a committed page (run, window, next cursor, records, done) on ``conn``."""
+    conn.execute(
+        text(
+            "INSERT INTO raw.api_sync_checkpoints "
+            "(endpoint, window_key, run_key, cursor, records, pages, done) "
+            "VALUES (:endpoint, :window, :run, :cursor, :records, 1, :done) "
+            "ON CONFLICT (endpoint, window_key) DO UPDATE SET "
+            "run_key = EXCLUDED.run_key, cursor = EXCLUDED.cursor, "
+            "records = api_sync_checkpoints.records + EXCLUDED.records, "
+            "pages = api_sync_checkpoints.pages + 1, done = EXCLUDED.done, updated_at = NOW()"
+        ),
+        {"endpoint": endpoint, **progress},
+    )
+
+
+def clear_checkpoints(
+    endpoint: str, record_sync: Optional[Callable[[str], None]] = None
+) -> None:
+    """
+    Forget the checkpoints of ``endpoint`` (its sync finished or is restarted).
+
+    ``record_sync(endpoint)`` (e.g. update_last_sync) runs before the DELETE
+    commits, so the sync is not recorded without its checkpoints being
+    cleared. A database without raw.api_sync_checkpoints has nothing to clear.
+    """
+    with get_engine().begin() as conn:
+        if inspect(conn).has_table("api_sync_checkpoints", schema="raw"):
+            _delete(conn, endpoint)
+        if record_sync:
+            record_sync(endpoint)
+
+
+def _delete(conn, endpoint: str) -> None:
+    conn.execute(
+        text("DELETE FROM raw.api_sync_checkpoints WHERE endpoint = :endpoint"),
+        {"endpoint": endpoint},
+    )
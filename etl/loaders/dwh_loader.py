@@ -1,10 +1,17 @@
 """Load transformed data into DWH PostgreSQL."""
 
+import asyncio
+import contextlib
+import io
+import itertools
 import logging
-from typing import Optional
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import AsyncIterable, Callable, Iterable, Iterator, Optional
 
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import Integer, create_engine, inspect, text
 
 from etl.config import DWH_URL
 
@@ -12,6 +19,10 @@ logger = logging.getLogger(__name__)
 
 _engine = None
 
+# Rows per COPY chunk and the NULL marker used in the CSV stream
+COPY_CHUNK_ROWS = 100_000
+COPY_NULL = "\\N"
+
 
 def get_engine():
     """Get or create SQLAlchemy engine."""
@@ -21,6 +32,499 @@ def get_engine():
     return _engine
 
 
+def _copy_buffer(cursor, sql: str, buf: io.StringIO) -> None:
+    """Stream a CSV buffer through COPY FROM STDIN (psycopg2 or psycopg 3)."""
+    if hasattr(cursor, "copy_expert"):
+        cursor.copy_expert(sql, buf)
+    else:
+        with cursor.copy(sql) as copy:
+            copy.write(buf.getvalue())
+
+
+def _table_columns(conn, schema: str, table_name: str) -> dict:
+    """Column name -> reflected SQLAlchemy type of an existing table."""
+    return {c["name"]: c["type"] for c in inspect(conn).get_columns(table_name, schema=schema)}
+
+
+def _align_to_table(
+    conn,
+    df: pd.DataFrame,
+    schema: str,
+    table_name: str,
+    columns: Optional[dict] = None,
+    skipped: Optional[set] = None,
+) -> pd.DataFrame:
+    """
+    Fit a frame to the target table's columns before COPY.
+
+    Frame columns the table does not have are dropped with a warning naming
+    them (once per column when ``skipped`` is shared across frames). Float
+    columns bound for integer columns are cast to Int64: nullable integers
+    arrive as float64 with NaN, and "1.0" is not valid INT/BIGINT input.
+    ``columns`` is the _table_columns mapping, reflected when omitted.
+    """
+    if columns is None:
+        columns = _table_columns(conn, schema, table_name)
+    extra = [c for c in df.columns if c not in columns]
+    if extra:
+        unseen = [c for c in extra if c not in skipped] if skipped is not None else extra
+        if unseen:
+            logger.warning(f"Skipping columns not in {schema}.{table_name}: {unseen}")
+        if skipped is not None:
+            skipped.update(extra)
+        df = df[[c for c in df.columns if c in columns]]
+
+    integer = {
+        c: "Int64"
+        for c in df.columns
+        if isinstance(columns[c], Integer) and pd.api.types.is_float_dtype(df[c])
+    }
+    if integer:
+        df = df.astype(integer)
+    return df
+
+
+def _drop_secondary_indexes(conn, schema: str, table_name: str) -> list[str]:
+    """Drop indexes not backing a constraint, return their definitions."""
+    rows = conn.execute(
+        text(
+            "SELECT i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid) "
+            "FROM pg_index i "
+            "WHERE i.indrelid = CAST(:table AS regclass) "
+            "AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)"
+        ),
+        {"table": f"{schema}.{table_name}"},
+    ).fetchall()
+    for name, _ in rows:
+        conn.exec_driver_sql(f"DROP INDEX {name}")
+    # Indexes of a partitioned table are reported as "ON ONLY parent";
+    # recreate them on the parent so every partition gets one again
+    return [ddl.replace(" ON ONLY ", " ON ", 1) for _, ddl in rows]
+
+
+def _range_partition_column(conn, schema: str, table_name: str) -> Optional[str]:
+    """Partition key column if the table is RANGE-partitioned on one column."""
+    return conn.execute(
+        text(
+            "SELECT a.attname FROM pg_partitioned_table p "
+            "JOIN pg_attribute a ON a.attrelid = p.partrelid AND a.attnum = p.partattrs[0] "
+            "WHERE p.partrelid = CAST(:table AS regclass) "
+            "AND p.partstrat = 'r' AND p.partnatts = 1"
+        ),
+        {"table": f"{schema}.{table_name}"},
+    ).scalar()
+
+
+def _partitions(conn, schema: str, table_name: str) -> set[str]:
+    """Names of the partitions attached to a partitioned table."""
+    return set(
+        conn.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = CAST(:table AS regclass)"
+            ),
+            {"table": f"{schema}.{table_name}"},
+        ).scalars()
+    )
+
+
+def _month_partition_name(table_name: str, month: pd.Period) -> str:
+    return f"{table_name}_{month.year:04d}_{month.month:02d}"
+
+
+def ensure_month_partitions(conn, schema: str, table_name: str, dates) -> list[str]:
+    """
+    Create missing monthly partitions for the months present in ``dates``.
+
+    Partitions are named <table>_YYYY_MM and cover [1st of month, 1st of
+    next month). Returns the names of partitions that were created.
+    """
+    months = pd.to_datetime(pd.Series(dates)).dropna().dt.to_period("M").unique()
+    quote = conn.dialect.identifier_preparer.quote
+    existing = _partitions(conn, schema, table_name)
+
+    created = []
+    for month in sorted(months):
+        name = _month_partition_name(table_name, month)
+        if name in existing:
+            continue
+        lo = month.start_time.date()
+        hi = (month + 1).start_time.date()
+        conn.exec_driver_sql(
+            f"CREATE TABLE IF NOT EXISTS {quote(schema)}.{quote(name)} "
+            f"PARTITION OF {quote(schema)}.{quote(table_name)} "
+            f"FOR VALUES FROM ('{lo}') TO ('{hi}')"
+        )
+        created.append(name)
+
+    if created:
+        logger.info(f"Created {len(created)} partitions of {schema}.{table_name}: {created}")
+    return created
+
+
+def _truncate_covered_partitions(conn, schema: str, table_name: str, lo, hi) -> list[str]:
+    """TRUNCATE monthly partitions that lie entirely within [lo, hi]."""
+    if lo is None or hi is None:
+        return []
+    quote = conn.dialect.identifier_preparer.quote
+    lo, hi = pd.Timestamp(lo), pd.Timestamp(hi)
+    first = lo.to_period("M") if lo.day == 1 else lo.to_period("M") + 1
+    last = hi.to_period("M") if (hi + pd.Timedelta(days=1)).day == 1 else hi.to_period("M") - 1
+    if first > last:
+        return []
+
+    existing = _partitions(conn, schema, table_name)
+    names = [
+        _month_partition_name(table_name, m)
+        for m in pd.period_range(first, last, freq="M")
+        if _month_partition_name(table_name, m) in existing
+    ]
+    if names:
+        conn.exec_driver_sql(
+            "TRUNCATE TABLE " + ", ".join(f"{quote(schema)}.{quote(n)}" for n in names)
+        )
+        logger.info(f"Truncated {len(names)} partitions of {schema}.{table_name}: {names}")
+    return names
+
+
+def _copy_rows(conn, df: pd.DataFrame, qualified: str, chunk_size: int) -> None:
+    """COPY frame rows into an existing table on ``conn``, chunk by chunk."""
+    quote = conn.dialect.identifier_preparer.quote
+    columns = ", ".join(quote(str(c)) for c in df.columns)
+    sql = f"COPY {qualified} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')"
+
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        for offset in range(0, len(df), chunk_size):
+            buf = io.StringIO()
+            df.iloc[offset:offset + chunk_size].to_csv(
+                buf, index=False, header=False, na_rep=COPY_NULL
+            )
+            buf.seek(0)
+            _copy_buffer(cursor, sql, buf)
+    finally:
+        cursor.close()
+
+
+def copy_dataframe(
+    df: pd.DataFrame,
+    schema: str,
+    table_name: str,
+    if_exists: str = "append",
+    chunk_size: int = COPY_CHUNK_ROWS,
+    on_commit: Optional[Callable] = None,
+) -> int:
+    """
+    Bulk-load DataFrame with COPY ... FROM STDIN (CSV) in one transaction.
+
+    if_exists:
+        'append'   — add rows to the table (created from the frame if missing)
+        'truncate' — TRUNCATE the existing table and reload it, keeping its
+                     DDL (types, constraints, indexes); secondary indexes are
+                     dropped before COPY and rebuilt in bulk afterwards,
+                     then the table is VACUUM ANALYZEd so index-only scans
+                     work right away
+        'replace'  — let pandas drop and recreate the table from the frame
+
+    Missing monthly partitions of RANGE-partitioned tables are created
+    before COPY (see ensure_month_partitions).
+
+    Rows are streamed in chunks of ``chunk_size`` through an in-memory CSV
+    buffer. NaN/NaT/None/pd.NA are written as NULL. Falls back to
+    DataFrame.to_sql on non-PostgreSQL engines.
+
+    ``on_commit(conn)`` runs in the load's transaction after the COPY, so
+    bookkeeping such as marking mart slices commits or rolls back with it.
+
+    Returns:
+        Number of rows loaded
+    """
+    return copy_frames(
+        [df], schema, table_name, if_exists=if_exists, chunk_size=chunk_size,
+        on_commit=on_commit,
+    )
+
+
+def _prepare_table(
+    conn, first: pd.DataFrame, schema: str, table_name: str, if_exists: str,
+    drop_indexes: bool = True,
+) -> tuple[dict, Optional[str], list[str]]:
+    """
+    Apply ``if_exists`` to the target table before the first COPY.
+
+    Returns the table's columns (see _table_columns), the RANGE partition
+    column (if any) and the definitions of secondary indexes dropped for a
+    truncate reload.
+    """
+    exists = inspect(conn).has_table(table_name, schema=schema)
+    if not (exists and if_exists in ("append", "truncate")):
+        # Create/replace the table definition only; rows go through COPY
+        mode = "replace" if if_exists == "truncate" else if_exists
+        first.head(0).to_sql(table_name, conn, schema=schema, if_exists=mode, index=False)
+        return _table_columns(conn, schema, table_name), None, []
+
+    columns = _table_columns(conn, schema, table_name)
+    index_defs = []
+    if if_exists == "truncate":
+        quote = conn.dialect.identifier_preparer.quote
+        conn.exec_driver_sql(f"TRUNCATE TABLE {quote(schema)}.{quote(table_name)} RESTART IDENTITY")
+        if drop_indexes:
+            index_defs = _drop_secondary_indexes(conn, schema, table_name)
+    return columns, _range_partition_column(conn, schema, table_name), index_defs
+
+
+def _copy_frame(
+    conn, df: pd.DataFrame, schema: str, table_name: str,
+    columns: dict, partition_column: Optional[str], chunk_size: int,
+    skipped: Optional[set] = None,
+) -> int:
+    quote = conn.dialect.identifier_preparer.quote
+    df = _align_to_table(conn, df, schema, table_name, columns, skipped)
+    if partition_column:
+        ensure_month_partitions(conn, schema, table_name, df[partition_column])
+    _copy_rows(conn, df, f"{quote(schema)}.{quote(table_name)}", chunk_size)
+    return len(df)
+
+
+def copy_frames(
+    frames: Iterable,
+    schema: str,
+    table_name: str,
+    if_exists: str = "append",
+    chunk_size: int = COPY_CHUNK_ROWS,
+    checkpointed: bool = False,
+    on_commit: Optional[Callable] = None,
+) -> int:
+    """
+    COPY a stream of DataFrames into one table in one transaction.
+
+    Same modes as copy_dataframe, applied once: the table is prepared from
+    the first frame (truncated, created, ...) and every frame is COPYed as
+    it is produced, so only one frame is in memory at a time. Nothing is
+    done when ``frames`` is empty. ``on_commit(conn)`` runs in that
+    transaction after the last frame.
+
+    With ``checkpointed`` the items are (frame, on_commit) pairs and each
+    frame is COPYed in its own transaction together with ``on_commit(conn)``
+    (e.g. saving a sync cursor), so an interrupted stream leaves a
+    consistent prefix. Secondary indexes are kept during such a truncate.
+    """
+    engine = get_engine()
+    start = time.perf_counter()
+    items = iter(frames)
+    first = next(items, None)
+    if first is None:
+        return 0
+    items = itertools.chain([first], items)
+    rows = 0
+
+    if engine.dialect.name != "postgresql":
+        mode = "replace" if if_exists == "truncate" else if_exists
+        for item in items:
+            df = item[0] if checkpointed else item
+            df.to_sql(table_name, engine, schema=schema, if_exists=mode, index=False)
+            rows += len(df)
+            mode = "append"
+        if on_commit:
+            with engine.begin() as conn:
+                on_commit(conn)
+        return rows
+
+    quote = engine.dialect.identifier_preparer.quote
+    qualified = f"{quote(schema)}.{quote(table_name)}"
+
+    skipped: set = set()
+    if checkpointed:
+        columns = partition_column = None
+        for df, on_commit in items:
+            with engine.begin() as conn:
+                if df.empty:
+                    on_commit(conn)
+                    continue
+                if columns is None:
+                    columns, partition_column, _ = _prepare_table(
+                        conn, df, schema, table_name, if_exists, drop_indexes=False
+                    )
+                rows += _copy_frame(
+                    conn, df, schema, table_name, columns, partition_column, chunk_size,
+                    skipped,
+                )
+                on_commit(conn)
+    else:
+        with engine.begin() as conn:
+            columns, partition_column, index_defs = _prepare_table(
+                conn, first, schema, table_name, if_exists
+            )
+            for df in items:
+                rows += _copy_frame(
+                    conn, df, schema, table_name, columns, partition_column, chunk_size,
+                    skipped,
+                )
+
+            if index_defs:
+                for ddl in index_defs:
+                    conn.exec_driver_sql(ddl)
+                logger.info(f"Rebuilt {len(index_defs)} indexes on {schema}.{table_name}")
+            if on_commit:
+                on_commit(conn)
+
+    if if_exists == "truncate" and columns is not None:
+        # Sets the visibility map as well as statistics; VACUUM cannot run
+        # inside a transaction block
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql(f"VACUUM (ANALYZE) {qualified}")
+
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"COPY {rows} rows into {schema}.{table_name} in {elapsed:.1f}s "
+        f"({rows / elapsed if elapsed else 0:,.0f} rows/sec)"
+    )
+    return rows
+
+
+# End of stream marker for copy_frames_async
+_END = object()
+
+
+def _drain(pending: queue.Queue) -> Iterator[pd.DataFrame]:
+    """Frames from ``pending`` until _END; re-raises a queued producer error."""
+    while (item := pending.get()) is not _END:
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+
+async def _put(pending: queue.Queue, item, writer: asyncio.Future) -> None:
+    """Queue ``item`` without blocking the event loop; fail if the writer died."""
+    while True:
+        if writer.done():
+            writer.result()
+            raise RuntimeError("COPY writer stopped before the end of the stream")
+        try:
+            pending.put_nowait(item)
+            return
+        except queue.Full:
+            await asyncio.sleep(0.01)
+
+
+async def copy_frames_async(
+    frames: AsyncIterable[pd.DataFrame],
+    schema: str,
+    table_name: str,
+    if_exists: str = "append",
+    max_pending: int = 4,
+    checkpointed: bool = False,
+) -> int:
+    """
+    copy_frames fed by an async producer, with COPY in a worker thread.
+
+    Frames pass through a queue of at most ``max_pending`` frames: the
+    producer (e.g. API pagination) keeps fetching while earlier frames are
+    written and waits when the database falls behind, so memory stays
+    bounded. If the producer fails, the transaction is rolled back and the
+    producer's error is raised.
+    """
+    pending: queue.Queue = queue.Queue(maxsize=max_pending)
+    writer = asyncio.get_running_loop().run_in_executor(
+        None,
+        lambda: copy_frames(
+            _drain(pending), schema, table_name, if_exists=if_exists, checkpointed=checkpointed
+        ),
+    )
+    try:
+        async for df in frames:
+            await _put(pending, df, writer)
+    except BaseException as e:
+        # Hand the error to the writer so it rolls back, then wait for it
+        with contextlib.suppress(Exception):
+            await _put(pending, e, writer)
+        await asyncio.wait([writer])
+        if not writer.cancelled():
+            writer.exception()  # retrieved: the producer's error is the one raised
+        raise
+    await _put(pending, _END, writer)
+    return await writer
+
+
+def merge_dataframe(
+    df: pd.DataFrame,
+    schema: str,
+    table_name: str,
+    key: Optional[str] = None,
+    range_column: Optional[str] = None,
+    chunk_size: int = COPY_CHUNK_ROWS,
+    on_commit: Optional[Callable] = None,
+) -> dict:
+    """
+    Merge a batch into an existing table through a temporary staging table.
+
+    The batch is COPY'd into a staging table, then, in one transaction:
+    - monthly partitions are created for a RANGE-partitioned table
+    - with ``range_column``, existing rows whose ``range_column`` falls
+      within the batch's min..max are deleted first (range replace); when
+      it is the partition key, months covered entirely are TRUNCATEd
+      partition by partition instead
+    - staged rows are inserted, skipping those whose ``key`` already exists
+    - ``on_commit(conn)`` runs, if given
+
+    Work is proportional to the batch, not to the table.
+
+    Returns:
+        {"inserted": N, "deleted": M}
+    """
+    engine = get_engine()
+    start = time.perf_counter()
+
+    with engine.begin() as conn:
+        quote = conn.dialect.identifier_preparer.quote
+        qualified = f"{quote(schema)}.{quote(table_name)}"
+        stage = quote(f"stage_{table_name}")
+
+        df = _align_to_table(conn, df, schema, table_name)
+        columns = ", ".join(quote(str(c)) for c in df.columns)
+
+        conn.exec_driver_sql(
+            f"CREATE TEMP TABLE {stage} ON COMMIT DROP AS "
+            f"SELECT {columns} FROM {qualified} WITH NO DATA"
+        )
+        _copy_rows(conn, df, stage, chunk_size)
+
+        partition_column = _range_partition_column(conn, schema, table_name)
+        if partition_column:
+            ensure_month_partitions(conn, schema, table_name, df[partition_column])
+
+        deleted = 0
+        if range_column:
+            col = quote(range_column)
+            if range_column == partition_column:
+                # Whole months in range: TRUNCATE their partitions instead of DELETE
+                lo, hi = conn.exec_driver_sql(f"SELECT min({col}), max({col}) FROM {stage}").one()
+                _truncate_covered_partitions(conn, schema, table_name, lo, hi)
+            deleted = conn.exec_driver_sql(
+                f"DELETE FROM {qualified} t "
+                f"USING (SELECT min({col}) AS lo, max({col}) AS hi FROM {stage}) r "
+                f"WHERE t.{col} BETWEEN r.lo AND r.hi"
+            ).rowcount
+
+        where = ""
+        if key:
+            k = quote(key)
+            where = f" WHERE NOT EXISTS (SELECT 1 FROM {qualified} t WHERE t.{k} = s.{k})"
+        inserted = conn.exec_driver_sql(
+            f"INSERT INTO {qualified} ({columns}) SELECT {columns} FROM {stage} s{where}"
+        ).rowcount
+        if on_commit:
+            on_commit(conn)
+
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"Merged {len(df)} rows into {schema}.{table_name} in {elapsed:.1f}s: "
+        f"{inserted} inserted, {len(df) - inserted} already present, {deleted} deleted"
+    )
+    return {"inserted": inserted, "deleted": deleted}
+
+
 def load_to_raw(df: pd.DataFrame, table_name: str, if_exists: str = "append") -> int:
     """
     Load DataFrame into raw schema table.
@@ -28,90 +532,116 @@ def load_to_raw(df: pd.DataFrame, table_name: str, if_exists: str = "append") ->
     Args:
         df: Data to load
         table_name: Table name (without schema prefix)
-        if_exists: 'append' or 'replace'
+        if_exists: 'append', 'truncate' (keep DDL) or 'replace'
 
     Returns:
         Number of rows loaded
     """
-    engine = get_engine()
     logger.info(f"Loading {len(df)} rows into raw.{table_name}")
-    df.to_sql(table_name, engine, schema="raw", if_exists=if_exists, index=False)
+    copy_dataframe(df, "raw", table_name, if_exists=if_exists)
     logger.info(f"Loaded {len(df)} rows into raw.{table_name}")
     return len(df)
 
 
-def load_to_dwh(df: pd.DataFrame, table_name: str, if_exists: str = "append") -> int:
-    """Load DataFrame into dwh schema table."""
-    engine = get_engine()
+async def stream_to_raw(
+    frames: AsyncIterable, table_name: str, if_exists: str = "append",
+    checkpointed: bool = False,
+) -> int:
+    """Load DataFrames from an async producer into a raw table as they arrive."""
+    logger.info(f"Streaming rows into raw.{table_name}")
+    rows = await copy_frames_async(
+        frames, "raw", table_name, if_exists=if_exists, checkpointed=checkpointed
+    )
+    logger.info(f"Loaded {rows} rows into raw.{table_name}")
+    return rows
+
+
+def load_to_dwh(
+    df: pd.DataFrame, table_name: str, if_exists: str = "append",
+    on_commit: Optional[Callable] = None,
+) -> int:
+    """Load DataFrame into dwh schema table (``on_commit`` as in copy_dataframe)."""
     logger.info(f"Loading {len(df)} rows into dwh.{table_name}")
-    df.to_sql(table_name, engine, schema="dwh", if_exists=if_exists, index=False)
+    copy_dataframe(df, "dwh", table_name, if_exists=if_exists, on_commit=on_commit)
     logger.info(f"Loaded {len(df)} rows into dwh.{table_name}")
     return len(df)
 
 
+def _upsert_names(
+    conn, table: str, id_col: str, name_col: str, names: list[str],
+    extra: Optional[dict] = None,
+) -> dict:
+    """Insert missing names into a dimension in one statement.
+
+    All candidate names (plus optional per-name ``extra`` columns) are sent
+    as arrays and unnested server-side; new rows come back via RETURNING and
+    existing ones via a join on the same input, so one round trip yields the
+    name -> id mapping for every candidate.
+    """
+    extra = extra or {}
+    columns = [name_col, *extra]
+    params = {name_col: names, **extra}
+    casts = ", ".join(f"CAST(:{c} AS text[])" for c in columns)
+    col_list = ", ".join(columns)
+
+    rows = conn.execute(
+        text(
+            f"WITH input AS ("
+            f"  SELECT * FROM unnest({casts}) AS t({col_list})"
+            f"), inserted AS ("
+            f"  INSERT INTO {table} ({col_list}) SELECT {col_list} FROM input i"
+            f"  WHERE NOT EXISTS ("
+            f"    SELECT 1 FROM {table} d WHERE d.{name_col} = i.{name_col}"
+            f"  )"
+            f"  ON CONFLICT ({name_col}) DO NOTHING"
+            f"  RETURNING {id_col}, {name_col}"
+            f") "
+            f"SELECT {id_col}, {name_col}, TRUE FROM inserted "
+            f"UNION ALL "
+            f"SELECT d.{id_col}, d.{name_col}, FALSE FROM {table} d "
+            f"JOIN input USING ({name_col})"
+        ),
+        params,
+    ).fetchall()
+
+    inserted = sum(1 for row in rows if row[2])
+    if inserted:
+        logger.info(f"Inserted {inserted} new rows into {table}")
+    return {row[1]: row[0] for row in rows}
+
+
 def upsert_doctors(doctor_names: list[str], branch_lookup: dict) -> dict:
     """
-    Insert new doctors into dim_doctor, return full name->id mapping.
+    Insert new doctors into dim_doctor, return name->id mapping for doctor_names.
     """
-    engine = get_engine()
+    names = list(dict.fromkeys(n for n in doctor_names if n))
+    if not names:
+        return {}
 
+    engine = get_engine()
     with engine.begin() as conn:
-        existing = pd.read_sql("SELECT doctor_id, full_name FROM dwh.dim_doctor", conn)
-        existing_map = dict(zip(existing["full_name"], existing["doctor_id"]))
-
-        new_names = [n for n in doctor_names if n and n not in existing_map]
-        if new_names:
-            logger.info(f"Inserting {len(new_names)} new doctors")
-            for name in new_names:
-                result = conn.execute(
-                    text(
-                        "INSERT INTO dwh.dim_doctor (full_name) VALUES (:name) "
-                        "ON CONFLICT (full_name) DO NOTHING RETURNING doctor_id"
-                    ),
-                    {"name": name},
-                )
-                row = result.fetchone()
-                if row:
-                    existing_map[name] = row[0]
-
-        if new_names:
-            refreshed = pd.read_sql(
-                "SELECT doctor_id, full_name FROM dwh.dim_doctor", conn
-            )
-            existing_map = dict(zip(refreshed["full_name"], refreshed["doctor_id"]))
-
-    return existing_map
+        return _upsert_names(conn, "dwh.dim_doctor", "doctor_id", "full_name", names)
 
 
 def upsert_services(service_names: list[str]) -> dict:
-    """Insert new services into dim_service, return name->id mapping."""
-    engine = get_engine()
+    """Insert new services into dim_service, return name->id mapping for service_names.
 
-    with engine.begin() as conn:
-        existing = pd.read_sql("SELECT service_id, name FROM dwh.dim_service", conn)
-        existing_map = dict(zip(existing["name"], existing["service_id"]))
-
-        new_names = [n for n in service_names if n and n not in existing_map]
-        if new_names:
-            logger.info(f"Inserting {len(new_names)} new services")
-            from etl.config import classify_service
-
-            for name in new_names:
-                category = classify_service(name)
-                conn.execute(
-                    text(
-                        "INSERT INTO dwh.dim_service (name, category) VALUES (:name, :cat) "
-                        "ON CONFLICT (name) DO NOTHING"
-                    ),
-                    {"name": name[:200], "cat": category},
-                )
+    Categories are classified once per unique name and sent with the names.
+    """
+    names = list(dict.fromkeys(n[:200] for n in service_names if n))
+    if not names:
+        return {}
 
-            refreshed = pd.read_sql(
-                "SELECT service_id, name FROM dwh.dim_service", conn
-            )
-            existing_map = dict(zip(refreshed["name"], refreshed["service_id"]))
+    from etl.config import classify_service
 
-    return existing_map
+    categories = [classify_service(n) for n in names]
+
+    engine = get_engine()
+    with engine.begin() as conn:
+        return _upsert_names(
+            conn, "dwh.dim_service", "service_id", "name", names,
+            extra={"category": categories},
+        )
 
 
 def get_branch_lookup() -> dict:
@@ -132,14 +662,121 @@ def get_payment_type_lookup() -> dict:
     return dict(zip(df["name"], df["payment_type_id"]))
 
 
-def refresh_materialized_views():
-    """Refresh all materialized views in marts schema."""
+def get_expense_type_lookup() -> dict:
+    """Get name -> expense_type_id mapping."""
     engine = get_engine()
-    views = ["monthly_pnl", "doctor_kpi", "branch_comparison", "service_economics"]
+    with engine.connect() as conn:
+        df = pd.read_sql(
+            "SELECT expense_type_id, name FROM dwh.dim_expense_type", conn
+        )
+    return dict(zip(df["name"], df["expense_type_id"]))
+
+
+MART_VIEWS = ["monthly_pnl", "doctor_kpi", "branch_comparison", "service_economics"]
+
+
+def _mart_dependencies(conn, views: list[str]) -> dict[str, set[str]]:
+    """view -> set of other marts views it reads from (via pg_depend)."""
+    rows = conn.execute(
+        text(
+            "SELECT DISTINCT v.relname, d.relname "
+            "FROM pg_depend dep "
+            "JOIN pg_rewrite r ON r.oid = dep.objid "
+            "JOIN pg_class v ON v.oid = r.ev_class "
+            "JOIN pg_class d ON d.oid = dep.refobjid "
+            "JOIN pg_namespace n ON n.oid = v.relnamespace AND n.oid = d.relnamespace "
+            "WHERE n.nspname = 'marts' AND v.relkind = 'm' AND d.relkind = 'm' "
+            "AND v.oid <> d.oid"
+        )
+    ).fetchall()
+    deps = {view: set() for view in views}
+    for view, dependency in rows:
+        if view in deps and dependency in deps:
+            deps[view].add(dependency)
+    return deps
+
+
+def _refresh_levels(deps: dict[str, set[str]]) -> list[list[str]]:
+    """Group views into levels; views in one level do not depend on each other."""
+    levels, done = [], set()
+    remaining = dict(deps)
+    while remaining:
+        level = [v for v, d in remaining.items() if d <= done]
+        if not level:
+            # Dependency cycle: refresh the rest one by one
+            level = [next(iter(remaining))]
+        levels.append(level)
+        done.update(level)
+        for v in level:
+            del remaining[v]
+    return levels
+
+
+def _refresh_view(view: str, concurrently: bool) -> dict:
+    """Refresh one marts view on its own connection, return timing and row count."""
+    engine = get_engine()
+    start = time.perf_counter()
     with engine.begin() as conn:
-        for view in views:
-            try:
-                conn.execute(text(f"REFRESH MATERIALIZED VIEW marts.{view}"))
-                logger.info(f"Refreshed marts.{view}")
-            except Exception as e:
-                logger.warning(f"Could not refresh marts.{view}: {e}")
+        can_concurrently = concurrently and conn.execute(
+            text(
+                "SELECT m.ispopulated AND EXISTS ("
+                "  SELECT 1 FROM pg_index i"
+                "  WHERE i.indrelid = CAST(:view AS regclass) AND i.indisunique"
+                "  AND i.indpred IS NULL AND i.indexprs IS NULL"
+                ") FROM pg_matviews m "
+                "WHERE m.schemaname = 'marts' AND m.matviewname = :name"
+            ),
+            {"view": f"marts.{view}", "name": view},
+        ).scalar()
+        mode = "CONCURRENTLY " if can_concurrently else ""
+        conn.exec_driver_sql(f"REFRESH MATERIALIZED VIEW {mode}marts.{view}")
+        rows = conn.exec_driver_sql(f"SELECT count(*) FROM marts.{view}").scalar()
+    return {
+        "view": view,
+        "seconds": time.perf_counter() - start,
+        "rows": rows,
+        "concurrently": bool(can_concurrently),
+        "error": None,
+    }
+
+
+def refresh_materialized_views(
+    views: Optional[list[str]] = None, workers: int = 4, concurrently: bool = True
+) -> list[dict]:
+    """
+    Refresh materialized views in marts schema.
+
+    Views that do not read from each other are refreshed in parallel, each
+    on its own connection; views built on other marts wait for them.
+    REFRESH ... CONCURRENTLY is used when the view is populated and has a
+    unique index, so dashboards keep reading the old data meanwhile.
+
+    Returns:
+        One dict per view: view, seconds, rows, concurrently, error
+    """
+    views = views or MART_VIEWS
+    engine = get_engine()
+    with engine.connect() as conn:
+        levels = _refresh_levels(_mart_dependencies(conn, views))
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        for level in levels:
+            futures = {pool.submit(_refresh_view, view, concurrently): view for view in level}
+            for future in as_completed(futures):
+                view = futures[future]
+                try:
+                    result = future.result()
+                    logger.info(
+                        f"Refreshed marts.{view} in {result['seconds']:.1f}s "
+                        f"({result['rows']} rows{', concurrently' if result['concurrently'] else ''})"
+                    )
+                except Exception as e:
+                    logger.warning(f"Could not refresh marts.{view}: {e}")
+                    result = {
+                        "view": view, "seconds": None, "rows": None,
+                        "concurrently": False, "error": str(e),
+                    }
+                results[view] = result
+
+    return [results[view] for view in views]
@@ -0,0 +1,197 @@
+"""Index usage report and advice for the warehouse schemas.
+
+Statistics come from pg_stat_user_indexes. Indexes of partitioned tables
+are reported once per parent index, with sizes and counters summed over
+the partitions.
+"""
+
+import logging
+import time
+
+from sqlalchemy import text
+
+from etl.loaders.dwh_loader import get_engine
+
+logger = logging.getLogger(__name__)
+
+SCHEMAS = ("raw", "dwh", "marts")
+
+# Indexes the mart refresh relies on (same DDL as sql/03_dwh_facts.sql)
+RECOMMENDED_INDEXES = {
+    "dwh.idx_fact_tx_date_brin": (
+        "CREATE INDEX IF NOT EXISTS idx_fact_tx_date_brin "
+        "ON dwh.fact_transactions USING BRIN (transaction_date)"
+    ),
+    "dwh.idx_fact_tx_mart": (
+        "CREATE INDEX IF NOT EXISTS idx_fact_tx_mart "
+        "ON dwh.fact_transactions(transaction_date, branch_id, operation_type) "
+        "INCLUDE (transaction_amount, patient_hash, doctor_id, is_primary_visit, is_child)"
+    ),
+}
+
+# Below these an index-only scan still visits the heap / a BRIN stops pruning
+MIN_ALL_VISIBLE = 0.9
+MIN_BRIN_CORRELATION = 0.9
+# Unused indexes smaller than this are not worth reporting
+MIN_UNUSED_BYTES = 1024 * 1024
+
+_USAGE_SQL = """
+    WITH leaf AS (
+        SELECT
+            COALESCE(pg_partition_root(s.indexrelid), s.indexrelid) AS root,
+            s.indexrelid, s.idx_scan, s.idx_tup_read, s.idx_tup_fetch
+        FROM pg_stat_user_indexes s
+    )
+    SELECT
+        n.nspname AS schema,
+        t.relname AS table,
+        c.relname AS index,
+        am.amname AS method,
+        i.indisunique AS is_unique,
+        EXISTS (SELECT 1 FROM pg_constraint k WHERE k.conindid = c.oid) AS is_constraint,
+        ARRAY(
+            SELECT a.attname
+            FROM unnest(i.indkey::INT2[]) WITH ORDINALITY AS k(attnum, ord)
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+            WHERE k.ord <= i.indnkeyatts
+            ORDER BY k.ord
+        ) AS key_columns,
+        i.indnatts > i.indnkeyatts AS covering,
+        count(l.indexrelid) AS partitions,
+        COALESCE(sum(pg_relation_size(l.indexrelid)), 0)::BIGINT AS size_bytes,
+        COALESCE(sum(l.idx_scan), 0)::BIGINT AS scans,
+        COALESCE(sum(l.idx_tup_read), 0)::BIGINT AS tuples_read,
+        COALESCE(sum(l.idx_tup_fetch), 0)::BIGINT AS tuples_fetched
+    FROM pg_class c
+    JOIN pg_index i ON i.indexrelid = c.oid
+    JOIN pg_class t ON t.oid = i.indrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_am am ON am.oid = c.relam
+    LEFT JOIN leaf l ON l.root = c.oid
+    WHERE n.nspname = ANY(:schemas) AND NOT c.relispartition
+    GROUP BY c.oid, n.nspname, t.relname, c.relname, am.amname, i.indisunique,
+             i.indkey, i.indnkeyatts, i.indnatts, i.indrelid
+    ORDER BY size_bytes DESC
+"""
+
+# Heap pages marked all-visible, per table (partitions summed into the parent)
+_VISIBILITY_SQL = """
+    SELECT
+        n.nspname AS schema,
+        r.relname AS table,
+        sum(c.relpages)::BIGINT AS pages,
+        sum(c.relallvisible)::BIGINT AS all_visible
+    FROM pg_class c
+    JOIN pg_class r ON r.oid = COALESCE(pg_partition_root(c.oid), c.oid)
+    JOIN pg_namespace n ON n.oid = r.relnamespace
+    WHERE c.relkind IN ('r', 'm') AND n.nspname = ANY(:schemas)
+    GROUP BY 1, 2
+"""
+
+# Physical order of a column: page-weighted |correlation| over the partitions
+_CORRELATION_SQL = """
+    SELECT sum(abs(s.correlation) * c.relpages) / NULLIF(sum(c.relpages), 0)
+    FROM pg_stats s
+    JOIN pg_namespace n ON n.nspname = s.schemaname
+    JOIN pg_class c ON c.relnamespace = n.oid AND c.relname = s.tablename
+    WHERE COALESCE(pg_partition_root(c.oid), c.oid) = CAST(:table AS regclass)
+      AND s.attname = :column AND NOT s.inherited AND c.relkind = 'r'
+"""
+
+
+def index_usage(conn=None) -> list[dict]:
+    """Size and pg_stat_user_indexes counters of every index in SCHEMAS."""
+    if conn is None:
+        with get_engine().connect() as conn:
+            return index_usage(conn)
+    rows = conn.execute(text(_USAGE_SQL), {"schemas": list(SCHEMAS)}).mappings()
+    return [dict(r) for r in rows]
+
+
+def advise_indexes(usage: list[dict], conn) -> list[str]:
+    """Human-readable advice derived from an index_usage() report."""
+    advice = []
+    present = {f"{u['schema']}.{u['index']}" for u in usage}
+
+    for name in RECOMMENDED_INDEXES:
+        if name not in present:
+            advice.append(f"{name} is missing: run `index-advise --apply`")
+
+    for u in usage:
+        name = f"{u['schema']}.{u['index']}"
+        if u["scans"] == 0 and name in RECOMMENDED_INDEXES:
+            if u["size_bytes"] >= MIN_UNUSED_BYTES:
+                advice.append(
+                    f"{name} is not used yet: the planner prefers sequential scans; "
+                    f"on SSD storage set random_page_cost = 1.1"
+                )
+        elif (
+            u["scans"] == 0 and u["size_bytes"] >= MIN_UNUSED_BYTES
+            and not u["is_unique"] and not u["is_constraint"]
+        ):
+            advice.append(
+                f"{name} ({format_size(u['size_bytes'])}) has no scans since the "
+                f"statistics reset: drop candidate"
+            )
+        if u["method"] != "btree" or u["is_unique"]:
+            continue
+        keys = u["key_columns"]
+        for other in usage:
+            if (
+                other is not u
+                and other["table"] == u["table"] and other["schema"] == u["schema"]
+                and other["method"] == "btree"
+                and len(other["key_columns"]) > len(keys)
+                and other["key_columns"][:len(keys)] == keys
+            ):
+                advice.append(
+                    f"{name} is a prefix of {other['schema']}.{other['index']}: redundant"
+                )
+                break
+
+    visibility = {
+        (r.schema, r.table): r
+        for r in conn.execute(text(_VISIBILITY_SQL), {"schemas": list(SCHEMAS)})
+    }
+    for u in usage:
+        table = f"{u['schema']}.{u['table']}"
+        if u["covering"]:
+            v = visibility.get((u["schema"], u["table"]))
+            if v and v.pages and v.all_visible / v.pages < MIN_ALL_VISIBLE:
+                advice.append(
+                    f"{table}: only {v.all_visible / v.pages:.0%} of pages all-visible, "
+                    f"index-only scans on {u['index']} read the heap; run VACUUM {table}"
+                )
+        if u["method"] == "brin":
+            correlation = conn.execute(
+                text(_CORRELATION_SQL), {"table": table, "column": u["key_columns"][0]}
+            ).scalar()
+            if correlation is not None and correlation < MIN_BRIN_CORRELATION:
+                advice.append(
+                    f"{table}.{u['key_columns'][0]} correlation is {correlation:.2f}: "
+                    f"rows are not stored in order, {u['index']} prunes little; "
+                    f"reload the table sorted by {u['key_columns'][0]}"
+                )
+    return advice
+
+
+def create_missing_indexes() -> list[str]:
+    """Create RECOMMENDED_INDEXES that do not exist yet, return their names."""
+    with get_engine().begin() as conn:
+        present = {f"{u['schema']}.{u['index']}" for u in index_usage(conn)}
+        created = []
+        for name, ddl in RECOMMENDED_INDEXES.items():
+            if name not in present:
+                start = time.perf_counter()
+                conn.exec_driver_sql(ddl)
+                created.append(name)
+                logger.info(f"Created {name} in {time.perf_counter() - start:.1f}s")
+    return created
+
+
+def format_size(size_bytes: int) -> str:
+    """Bytes as a short human-readable size."""
+    for unit in ("B", "kB", "MB", "GB"):
+        if size_bytes < 1024 or unit == "GB":
+            return f"{size_bytes:.0f} {unit}" if unit == "B" else f"{size_bytes:.1f} {unit}"
+        size_bytes /= 1024
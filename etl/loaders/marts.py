@@ -0,0 +1,247 @@
+"""Incremental maintenance of marts summary tables.
+
+Fact loaders record the (year_month, branch_id) slices they touched in
+marts.dirty_slices. refresh_marts recomputes only those slices of the
+marts.agg_* summary tables (delete + insert from dwh.fact_transactions,
+restricted to the dirty months so partitions are pruned) and then refreshes
+the materialized views, which are built from the small summary tables.
+
+Branch and doctor summaries also carry a HyperLogLog sketch of their
+patients (patients_hll, format described in sql/04_marts.sql), so distinct
+patients over several months or branches can be estimated by merging
+sketches instead of rescanning facts.
+"""
+
+import contextlib
+import logging
+import time
+
+import pandas as pd
+from sqlalchemy import text
+
+from etl.loaders.dwh_loader import get_engine, refresh_materialized_views
+
+logger = logging.getLogger(__name__)
+
+# Rows of dwh.fact_transactions t that belong to the slices being refreshed
+_SLICE_FILTER = """
+    FROM dwh.fact_transactions t
+    JOIN refresh_slices s
+      ON s.year_month = DATE_TRUNC('month', t.transaction_date)::DATE
+     AND COALESCE(s.branch_id, 0) = COALESCE(t.branch_id, 0)
+    WHERE t.transaction_date >= :lo AND t.transaction_date < :hi
+"""
+
+
+@contextlib.contextmanager
+def _transaction(conn=None):
+    """``conn`` as is, or a new transaction when it is None."""
+    if conn is not None:
+        yield conn
+    else:
+        with get_engine().begin() as conn:
+            yield conn
+
+
+def _with_patient_sketch(select: str, keys: list[str], where: str = "") -> str:
+    """Append a patients_hll column, built per (year_month, *keys), to a summary SELECT."""
+    columns = ", ".join(keys)
+    positions = [str(i) for i in range(1, len(keys) + 3)]
+    join = " AND ".join(
+        ["k.year_month = a.year_month"]
+        + [f"COALESCE(k.{key}, 0) = COALESCE(a.{key}, 0)" for key in keys]
+    )
+    return f"""
+        WITH registers AS (
+            SELECT
+                DATE_TRUNC('month', t.transaction_date)::DATE AS year_month,
+                {", ".join(f"t.{key}" for key in keys)},
+                marts.hll_register(t.patient_hash) AS register,
+                marts.hll_rank(MIN(marts.hll_suffix(t.patient_hash))) AS rank
+            {_SLICE_FILTER}
+              AND t.patient_hash IS NOT NULL{where}
+            GROUP BY {", ".join(positions)}
+        ),
+        sketches AS (
+            SELECT
+                year_month, {columns},
+                string_agg(marts.hll_entry(register, rank), ''::BYTEA ORDER BY register) AS patients_hll
+            FROM registers
+            GROUP BY {", ".join(positions[:-1])}
+        )
+        SELECT a.*, k.patients_hll
+        FROM ({select}) a
+        LEFT JOIN sketches k ON {join}
+    """
+
+
+# Summary table -> SELECT computing its rows for the slices in refresh_slices
+SUMMARY_TABLES = {
+    "agg_branch_month": _with_patient_sketch(f"""
+        SELECT
+            DATE_TRUNC('month', t.transaction_date)::DATE AS year_month,
+            t.branch_id,
+            SUM(CASE WHEN t.operation_type = 'Оплата' THEN t.transaction_amount ELSE 0 END) AS gross_revenue,
+            SUM(CASE WHEN t.operation_type = 'Возврат оплаты' THEN ABS(t.transaction_amount) ELSE 0 END) AS refunds,
+            SUM(t.transaction_amount) AS net_revenue,
+            COUNT(DISTINCT t.patient_hash) AS unique_patients,
+            COUNT(*) FILTER (WHERE t.operation_type = 'Оплата') AS payment_count,
+            COUNT(*) FILTER (WHERE t.is_primary_visit = TRUE AND t.operation_type = 'Оплата') AS primary_visits,
+            AVG(CASE WHEN t.operation_type = 'Оплата' THEN t.transaction_amount END) AS avg_ticket,
+            SUM(t.transaction_amount) FILTER (WHERE t.is_child = TRUE AND t.operation_type = 'Оплата') AS children_revenue,
+            SUM(t.transaction_amount) FILTER (WHERE t.is_child = FALSE AND t.operation_type = 'Оплата') AS adult_revenue
+        {_SLICE_FILTER}
+        GROUP BY 1, 2
+    """, ["branch_id"]),
+    "agg_doctor_month": _with_patient_sketch(f"""
+        SELECT
+            DATE_TRUNC('month', t.transaction_date)::DATE AS year_month,
+            t.doctor_id,
+            t.branch_id,
+            SUM(t.transaction_amount) FILTER (WHERE t.operation_type = 'Оплата') AS revenue,
+            COUNT(*) FILTER (WHERE t.operation_type = 'Оплата') AS visit_count,
+            COUNT(DISTINCT t.patient_hash) AS unique_patients,
+            COUNT(*) FILTER (WHERE t.is_primary_visit = TRUE AND t.operation_type = 'Оплата') AS primary_visits,
+            AVG(t.transaction_amount) FILTER (WHERE t.operation_type = 'Оплата') AS avg_ticket,
+            SUM(t.transaction_amount) FILTER (WHERE t.operation_type = 'Оплата')
+                / GREATEST(COUNT(DISTINCT t.transaction_date) FILTER (WHERE t.operation_type = 'Оплата'), 1)
+                AS revenue_per_workday
+        {_SLICE_FILTER}
+          AND t.doctor_id IS NOT NULL
+        GROUP BY 1, 2, 3
+    """, ["doctor_id", "branch_id"], where=" AND t.doctor_id IS NOT NULL"),
+    "agg_service_month": f"""
+        SELECT
+            DATE_TRUNC('month', t.transaction_date)::DATE AS year_month,
+            t.branch_id,
+            t.service_name,
+            COUNT(*) FILTER (WHERE t.operation_type = 'Оплата') AS service_count,
+            SUM(t.transaction_amount) FILTER (WHERE t.operation_type = 'Оплата') AS total_revenue
+        {_SLICE_FILTER}
+          AND t.service_name IS NOT NULL
+        GROUP BY 1, 2, 3
+    """,
+}
+
+
+def mark_dirty_slices(
+    df: pd.DataFrame,
+    date_column: str = "transaction_date",
+    branch_column: str = "branch_id",
+    conn=None,
+) -> int:
+    """
+    Record the (year_month, branch_id) slices present in a loaded frame.
+
+    Pass the load's ``conn`` so the slices are recorded in the same
+    transaction as the fact rows.
+    """
+    if df.empty:
+        return 0
+    slices = pd.DataFrame({
+        "year_month": pd.to_datetime(df[date_column]).dt.to_period("M").dt.start_time.dt.date,
+        "branch_id": df[branch_column].astype("Int64"),
+    }).dropna(subset=["year_month"]).drop_duplicates()
+
+    with _transaction(conn) as conn:
+        conn.execute(
+            text(
+                "INSERT INTO marts.dirty_slices (year_month, branch_id) "
+                "SELECT * FROM unnest(CAST(:months AS date[]), CAST(:branches AS int[])) "
+                "ON CONFLICT DO NOTHING"
+            ),
+            {
+                "months": list(slices["year_month"]),
+                "branches": [None if pd.isna(b) else int(b) for b in slices["branch_id"]],
+            },
+        )
+    logger.info(f"Marked {len(slices)} mart slices for refresh")
+    return len(slices)
+
+
+def mark_summarized_months(lo=None, hi=None, conn=None) -> int:
+    """
+    Mark every summarized slice with year_month in [lo, hi] (all when omitted).
+
+    Call this when fact rows were deleted or truncated: the slices they
+    belonged to are exactly the ones already present in agg_branch_month
+    (or still pending in dirty_slices). ``conn`` as in mark_dirty_slices.
+    """
+    where, params = "", {}
+    if lo is not None:
+        where += " AND year_month >= DATE_TRUNC('month', CAST(:lo AS date))"
+        params["lo"] = pd.Timestamp(lo).date()
+    if hi is not None:
+        where += " AND year_month <= CAST(:hi AS date)"
+        params["hi"] = pd.Timestamp(hi).date()
+
+    with _transaction(conn) as conn:
+        marked = conn.execute(
+            text(
+                "INSERT INTO marts.dirty_slices (year_month, branch_id) "
+                f"SELECT DISTINCT year_month, branch_id FROM marts.agg_branch_month WHERE TRUE{where} "
+                "ON CONFLICT DO NOTHING"
+            ),
+            params,
+        ).rowcount
+    if marked:
+        logger.info(f"Marked {marked} summarized mart slices for refresh")
+    return marked
+
+
+def refresh_summaries(full: bool = False) -> list[dict]:
+    """
+    Recompute the dirty slices of every summary table in one transaction.
+
+    With ``full`` every slice present in the facts or the summaries is
+    recomputed. Returns one dict per summary table: table, seconds, rows.
+    """
+    results = []
+    with get_engine().begin() as conn:
+        if full:
+            conn.execute(text(
+                "INSERT INTO marts.dirty_slices (year_month, branch_id) "
+                "SELECT DISTINCT DATE_TRUNC('month', transaction_date)::DATE, branch_id "
+                "FROM dwh.fact_transactions "
+                "UNION SELECT year_month, branch_id FROM marts.agg_branch_month "
+                "ON CONFLICT DO NOTHING"
+            ))
+
+        # Take the queue; it stays intact if anything below fails
+        conn.execute(text(
+            "CREATE TEMP TABLE refresh_slices ON COMMIT DROP AS "
+            "WITH taken AS (DELETE FROM marts.dirty_slices RETURNING year_month, branch_id) "
+            "SELECT year_month, branch_id FROM taken"
+        ))
+        count, lo, hi = conn.execute(text(
+            "SELECT count(*), min(year_month), (max(year_month) + INTERVAL '1 month')::DATE "
+            "FROM refresh_slices"
+        )).one()
+        if not count:
+            logger.info("No dirty mart slices")
+            return results
+        conn.execute(text("ANALYZE refresh_slices"))
+        logger.info(f"Recomputing {count} mart slices ({lo} .. {hi})")
+
+        for table, select in SUMMARY_TABLES.items():
+            start = time.perf_counter()
+            conn.execute(text(
+                f"DELETE FROM marts.{table} a USING refresh_slices s "
+                f"WHERE a.year_month = s.year_month "
+                f"AND COALESCE(a.branch_id, 0) = COALESCE(s.branch_id, 0)"
+            ))
+            rows = conn.execute(
+                text(f"INSERT INTO marts.{table} {select}"), {"lo": lo, "hi": hi}
+            ).rowcount
+            results.append({
+                "table": table, "seconds": time.perf_counter() - start, "rows": rows,
+            })
+            logger.info(f"Recomputed marts.{table}: {rows} rows in {results[-1]['seconds']:.1f}s")
+    return results
+
+
+def refresh_marts(full: bool = False, workers: int = 4) -> dict:
+    """Recompute dirty summary slices, then refresh the materialized views."""
+    summaries = refresh_summaries(full=full)
+    views = refresh_materialized_views(workers=workers)
+    return {"summaries": summaries, "views": views}
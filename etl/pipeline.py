@@ -1,9 +1,12 @@
 """ETL Pipeline orchestration for Белая Радуга analytics."""
 
 import logging
+import os
 import sys
+import time
 from datetime import date, timedelta
 from pathlib import Path
+from typing import Optional
 
 import click
 
@@ -14,13 +17,110 @@ logging.basicConfig(
     format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
     datefmt="%Y-%m-%d %H:%M:%S",
 )
+# httpx logs every request at INFO
+logging.getLogger("httpx").setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
 
 @click.group()
-def cli():
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    help="Re-parse Excel sources instead of using cached extracts",
+)
+def cli(no_cache):
     """Белая Радуга ETL Pipeline."""
-    pass
+    if no_cache:
+        from etl.extractors.cache import set_cache_enabled
+
+        set_cache_enabled(False)
+
+
+TRANSACTION_COLUMNS = [
+    "transaction_date", "branch_id", "patient_hash", "patient_age",
+    "is_child", "payment_type_id", "operation_type", "invoice_branch_id",
+    "invoice_amount", "invoice_debt", "service_id", "service_name",
+    "visit_date", "doctor_id", "is_primary_visit", "transaction_amount", "row_key",
+]
+
+CF_ENTRY_COLUMNS = [
+    "entry_date", "branch_id", "expense_type_id", "direction",
+    "amount", "counterparty", "description",
+]
+
+
+def _load_transactions_frame(
+    df_raw,
+    branch_lookup: dict,
+    pt_lookup: dict,
+    if_exists: str,
+    replace_range: bool = False,
+    row_key_counts: Optional[dict] = None,
+) -> int:
+    """
+    Load one extracted transactions frame into raw and dwh.
+
+    if_exists='merge' stages the frame and inserts only fact rows whose
+    row_key is not loaded yet; with replace_range the fact rows in the
+    frame's date range are deleted first. The raw landing table is always
+    range-replaced in merge mode.
+    """
+    import pandas as pd
+
+    from etl.transformers.transactions import transform_transactions
+    from etl.loaders.dwh_loader import (
+        load_to_raw,
+        load_to_dwh,
+        merge_dataframe,
+        upsert_doctors,
+        upsert_services,
+    )
+    from etl.loaders.marts import mark_dirty_slices, mark_summarized_months
+
+    df_landing = df_raw.drop(columns=["patient_hash"], errors="ignore")
+    if if_exists == "merge":
+        merge_dataframe(df_landing, "raw", "mis_transactions", range_column="transaction_date")
+    else:
+        load_to_raw(df_landing, "mis_transactions", if_exists=if_exists)
+
+    raw_doctors = pd.Series(df_raw["doctor_name"].dropna().unique(), dtype=object)
+    doctor_names = list(raw_doctors.astype(str).str.strip().unique())
+    doctor_map = upsert_doctors(doctor_names, branch_lookup)
+
+    raw_services = pd.Series(df_raw["service_items"].dropna().unique(), dtype=object)
+    service_names = list(raw_services.astype(str).str.strip().str[:200].unique())
+    service_map = upsert_services(service_names)
+
+    df_transformed = transform_transactions(
+        df_raw, branch_lookup, pt_lookup, set(doctor_map.keys()), row_key_counts
+    )
+
+    df_transformed["doctor_id"] = df_transformed["doctor_name"].map(doctor_map).astype("Int64")
+    df_transformed["service_id"] = df_transformed["service_name"].map(service_map).astype("Int64")
+
+    # Date order keeps the BRIN index on transaction_date selective
+    df_fact = df_transformed[TRANSACTION_COLUMNS].sort_values("transaction_date", kind="stable")
+
+    def mark_slices(conn):
+        # Slices whose rows were removed, then slices of the new rows; marked
+        # in the fact load's transaction so they commit together
+        if if_exists == "truncate":
+            mark_summarized_months(conn=conn)
+        elif replace_range:
+            mark_summarized_months(
+                df_fact["transaction_date"].min(), df_fact["transaction_date"].max(), conn=conn
+            )
+        mark_dirty_slices(df_fact, conn=conn)
+
+    if if_exists == "merge":
+        loaded = merge_dataframe(
+            df_fact, "dwh", "fact_transactions", key="row_key",
+            range_column="transaction_date" if replace_range else None,
+            on_commit=mark_slices,
+        )["inserted"]
+    else:
+        loaded = load_to_dwh(df_fact, "fact_transactions", if_exists=if_exists, on_commit=mark_slices)
+    return loaded
 
 
 @cli.command()
@@ -29,18 +129,36 @@ def cli():
     type=click.Path(exists=True),
     help="Path to Детализация_транзакций Excel file",
 )
-def transactions(file):
+@click.option(
+    "--chunk-size",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Stream the file in chunks of N rows (read-only mode, flat memory)",
+)
+@click.option(
+    "--merge",
+    is_flag=True,
+    help="Insert only rows not loaded yet instead of reloading the tables",
+)
+@click.option(
+    "--replace-range",
+    is_flag=True,
+    help="With --merge: replace existing rows in the file's date range",
+)
+def transactions(file, chunk_size, merge, replace_range):
     """Load MIS transactions into DWH."""
-    from etl.extractors.transaction_extractor import extract_transactions
-    from etl.transformers.transactions import transform_transactions
-    from etl.loaders.dwh_loader import (
-        get_branch_lookup,
-        get_payment_type_lookup,
-        load_to_raw,
-        load_to_dwh,
-        upsert_doctors,
-        upsert_services,
+    if replace_range and not merge:
+        raise click.UsageError("--replace-range requires --merge")
+    if merge and chunk_size:
+        # Chunks are not date-ordered, so per-chunk range deletes would
+        # remove rows loaded by earlier chunks of the same file
+        raise click.UsageError("--merge cannot be combined with --chunk-size")
+
+    from etl.extractors.transaction_extractor import (
+        extract_transactions,
+        iter_transactions,
     )
+    from etl.loaders.dwh_loader import get_branch_lookup, get_payment_type_lookup
 
     filepath = Path(file) if file else DATA_DIR / "mis" / "transactions.xlsx"
     if not filepath.exists():
@@ -49,33 +167,27 @@ def transactions(file):
 
     logger.info("=== Loading MIS Transactions ===")
 
-    df_raw = extract_transactions(filepath)
-    load_to_raw(df_raw.drop(columns=["patient_hash"], errors="ignore"), "mis_transactions", if_exists="replace")
-
     branch_lookup = get_branch_lookup()
     pt_lookup = get_payment_type_lookup()
 
-    doctor_names = list(df_raw["doctor_name"].dropna().unique())
-    doctor_map = upsert_doctors(doctor_names, branch_lookup)
-
-    service_names = list(df_raw["service_items"].dropna().apply(lambda x: str(x).strip()[:200]).unique())
-    service_map = upsert_services(service_names)
-
-    df_transformed = transform_transactions(
-        df_raw, branch_lookup, pt_lookup, set(doctor_map.keys())
-    )
-
-    df_transformed["doctor_id"] = df_transformed["doctor_name"].map(doctor_map)
-    df_transformed["service_id"] = df_transformed["service_name"].map(service_map)
-
-    cols_to_load = [
-        "transaction_date", "branch_id", "patient_hash", "patient_age",
-        "is_child", "payment_type_id", "operation_type", "invoice_branch_id",
-        "invoice_amount", "invoice_debt", "service_id", "service_name",
-        "visit_date", "doctor_id", "is_primary_visit", "transaction_amount",
-    ]
+    if chunk_size:
+        # First chunk truncates the tables, the rest are appended
+        if_exists = "truncate"
+        row_key_counts = {}
+        total = 0
+        for df_chunk in iter_transactions(filepath, chunk_size=chunk_size):
+            total += _load_transactions_frame(
+                df_chunk, branch_lookup, pt_lookup, if_exists, row_key_counts=row_key_counts
+            )
+            if_exists = "append"
+        logger.info(f"Loaded {total} transactions in chunks of {chunk_size}")
+    else:
+        df_raw = extract_transactions(filepath)
+        _load_transactions_frame(
+            df_raw, branch_lookup, pt_lookup, "merge" if merge else "truncate",
+            replace_range=replace_range,
+        )
 
-    load_to_dwh(df_transformed[cols_to_load], "fact_transactions", if_exists="replace")
     logger.info("=== MIS Transactions loaded successfully ===")
 
 
@@ -85,7 +197,12 @@ def cashflow(file):
     """Load Cash Flow entries from 1C export."""
     from etl.extractors.cf_extractor import extract_cf_entries
     from etl.transformers.cashflow import transform_cf_entries
-    from etl.loaders.dwh_loader import get_branch_lookup, load_to_raw
+    from etl.loaders.dwh_loader import (
+        get_branch_lookup,
+        get_expense_type_lookup,
+        load_to_dwh,
+        load_to_raw,
+    )
 
     filepath = Path(file) if file else DATA_DIR / "accounting" / "cf_2024_br.xlsx"
     if not filepath.exists():
@@ -95,14 +212,59 @@ def cashflow(file):
     logger.info("=== Loading Cash Flow Entries ===")
 
     df_raw = extract_cf_entries(filepath)
-    load_to_raw(df_raw, "cf_entries", if_exists="replace")
+    load_to_raw(df_raw, "cf_entries", if_exists="truncate")
 
     branch_lookup = get_branch_lookup()
-    df_transformed = transform_cf_entries(df_raw, branch_lookup)
+    df_transformed = transform_cf_entries(df_raw, branch_lookup, get_expense_type_lookup())
+
+    df_fact = df_transformed.dropna(subset=["entry_date", "direction"])
+    skipped = len(df_transformed) - len(df_fact)
+    if skipped:
+        logger.warning(f"Skipping {skipped} CF entries without date or direction")
+    load_to_dwh(
+        df_fact[[c for c in CF_ENTRY_COLUMNS if c in df_fact.columns]],
+        "fact_cf_entries",
+        if_exists="truncate",
+    )
 
     logger.info("=== Cash Flow Entries loaded successfully ===")
 
 
+@cli.command("cf-monthly")
+@click.option("--file", type=click.Path(exists=True), help="Path to CF_СВОД Excel file")
+@click.option("--sheet", default="CF_СВОД", show_default=True, help="Sheet name")
+def cf_monthly(file, sheet):
+    """Load monthly consolidated Cash Flow (CF_СВОД)."""
+    from etl.extractors.cf_extractor import extract_cf_monthly_svod
+    from etl.transformers.cashflow import transform_cf_monthly
+    from etl.loaders.dwh_loader import get_expense_type_lookup, load_to_dwh, load_to_raw
+
+    filepath = Path(file) if file else DATA_DIR / "accounting" / "cf_2025_svod.xlsx"
+    if not filepath.exists():
+        logger.error(f"File not found: {filepath}")
+        sys.exit(1)
+
+    logger.info("=== Loading CF Monthly ===")
+
+    df_raw = extract_cf_monthly_svod(filepath, sheet_name=sheet)
+    df = transform_cf_monthly(df_raw, get_expense_type_lookup())
+    if df.empty:
+        logger.error("No CF monthly records to load")
+        sys.exit(1)
+
+    load_to_raw(
+        df[["year_month", "legal_entity", "line_item", "amount", "source_file"]],
+        "cf_monthly",
+        if_exists="truncate",
+    )
+    load_to_dwh(
+        df[["year_month", "legal_entity_id", "line_item", "expense_type_id", "amount"]],
+        "fact_cf_monthly",
+        if_exists="truncate",
+    )
+    logger.info("=== CF Monthly loaded successfully ===")
+
+
 @cli.command()
 @click.option("--file", type=click.Path(exists=True), help="Path to cost structure file")
 def costs(file):
@@ -117,7 +279,7 @@ def costs(file):
 
     logger.info("=== Loading Cost Structure ===")
     df = extract_cost_structure(filepath)
-    load_to_raw(df, "cost_structure", if_exists="replace")
+    load_to_raw(df, "cost_structure", if_exists="truncate")
     logger.info("=== Cost Structure loaded successfully ===")
 
 
@@ -135,24 +297,125 @@ def leads(file):
 
     logger.info("=== Loading Leads ===")
     df_monthly, _ = extract_leads(filepath)
-    load_to_raw(df_monthly, "leads_monthly", if_exists="replace")
+    load_to_raw(df_monthly, "leads_monthly", if_exists="truncate")
     logger.info("=== Leads loaded successfully ===")
 
 
 @cli.command()
-def refresh():
-    """Refresh all materialized views."""
-    from etl.loaders.dwh_loader import refresh_materialized_views
-
-    logger.info("=== Refreshing Materialized Views ===")
-    refresh_materialized_views()
+@click.option(
+    "--workers",
+    type=int,
+    default=4,
+    show_default=True,
+    help="Views refreshed in parallel, each on its own connection",
+)
+@click.option("--full", "full_rebuild", is_flag=True, help="Recompute every mart slice, not only dirty ones")
+def refresh(workers, full_rebuild):
+    """Recompute dirty mart slices and refresh materialized views."""
+    from etl.loaders.marts import refresh_marts
+
+    logger.info("=== Refreshing Marts ===")
+    results = refresh_marts(full=full_rebuild, workers=workers)
+    for r in results["summaries"]:
+        logger.info("  %-20s %7.1fs  %8d rows  recomputed", r["table"], r["seconds"], r["rows"])
+    for r in results["views"]:
+        if r["error"]:
+            logger.info("  %-20s ERROR: %s", r["view"], r["error"])
+        else:
+            logger.info(
+                "  %-20s %7.1fs  %8d rows  %s",
+                r["view"], r["seconds"], r["rows"],
+                "concurrently" if r["concurrently"] else "locked",
+            )
     logger.info("=== Done ===")
 
 
+@cli.command("index-advise")
+@click.option("--apply", is_flag=True, help="Create recommended indexes that are missing")
+def index_advise(apply):
+    """Report index sizes and usage, and suggest index changes."""
+    from etl.loaders.dwh_loader import get_engine
+    from etl.loaders.indexes import advise_indexes, create_missing_indexes, index_usage, format_size
+
+    if apply:
+        created = create_missing_indexes()
+        logger.info(f"Created {len(created)} missing indexes")
+
+    with get_engine().connect() as conn:
+        usage = index_usage(conn)
+        advice = advise_indexes(usage, conn)
+
+    logger.info("=== Index usage ===")
+    logger.info("  %-45s %-6s %10s %12s %14s %14s", "index", "method", "size", "scans", "tuples read", "heap fetched")
+    for u in usage:
+        logger.info(
+            "  %-45s %-6s %10s %12d %14d %14d",
+            f"{u['schema']}.{u['index']}", u["method"], format_size(u["size_bytes"]),
+            u["scans"], u["tuples_read"], u["tuples_fetched"],
+        )
+    if advice:
+        logger.info("=== Advice ===")
+        for line in advice:
+            logger.info(f"  - {line}")
+    else:
+        logger.info("No index changes suggested")
+
+
+def _extract_source(name: str, filepath: Path):
+    """Parse one source file. Runs in a worker process for `full`."""
+    start = time.perf_counter()
+    if name == "transactions":
+        from etl.extractors.transaction_extractor import extract_transactions
+
+        df = extract_transactions(filepath)
+    elif name == "costs":
+        from etl.extractors.cost_extractor import extract_cost_structure
+
+        df = extract_cost_structure(filepath)
+    elif name == "leads":
+        from etl.extractors.cost_extractor import extract_leads
+
+        df, _ = extract_leads(filepath)
+    else:
+        raise ValueError(f"Unknown source: {name}")
+    return df, time.perf_counter() - start
+
+
+def _load_source(name: str, df) -> int:
+    """Write one extracted source into DWH. Runs in the main process."""
+    from etl.loaders.dwh_loader import (
+        get_branch_lookup,
+        get_payment_type_lookup,
+        load_to_raw,
+    )
+
+    if name == "transactions":
+        return _load_transactions_frame(
+            df, get_branch_lookup(), get_payment_type_lookup(), "truncate"
+        )
+    if name == "costs":
+        return load_to_raw(df, "cost_structure", if_exists="truncate")
+    if name == "leads":
+        return load_to_raw(df, "leads_monthly", if_exists="truncate")
+    raise ValueError(f"Unknown source: {name}")
+
+
 @cli.command()
+@click.option(
+    "--workers",
+    type=int,
+    default=None,
+    help="Parallel parse processes (default: one per source, 1 = sequential)",
+)
 @click.pass_context
-def full(ctx):
-    """Run full ETL pipeline: all sources + refresh views."""
+def full(ctx, workers):
+    """Run full ETL pipeline: all sources + refresh views.
+
+    Excel sources are parsed in parallel in a process pool; each source is
+    written to DWH as soon as its parse finishes, one writer at a time.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
     logger.info("========== FULL ETL PIPELINE ==========")
 
     sources = {
@@ -161,16 +424,74 @@ def full(ctx):
         "leads": DATA_DIR / "mis" / "leads.xlsx",
     }
 
+    available = {}
     for name, path in sources.items():
         if path.exists():
-            logger.info(f"Running {name}...")
-            ctx.invoke(globals()[name], file=str(path))
+            available[name] = path
         else:
             logger.warning(f"Skipping {name}: {path} not found")
 
+    workers = workers or max(1, min(len(available), os.cpu_count() or 1))
+    timings = {}
+    failed = False
+
+    def load(name, df, parse_seconds):
+        nonlocal failed
+        start = time.perf_counter()
+        try:
+            rows = _load_source(name, df)
+        except Exception as e:
+            logger.error(f"Failed to load {name}: {e}")
+            timings[name] = (parse_seconds, None, f"ERROR: {e}")
+            failed = True
+            return
+        timings[name] = (parse_seconds, time.perf_counter() - start, rows)
+
+    if workers == 1 or len(available) <= 1:
+        for name, path in available.items():
+            logger.info(f"Running {name}...")
+            df, parse_seconds = _extract_source(name, path)
+            load(name, df, parse_seconds)
+    else:
+        logger.info(f"Parsing {len(available)} sources with {workers} workers...")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(_extract_source, name, path): name
+                for name, path in available.items()
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    df, parse_seconds = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to parse {name}: {e}")
+                    timings[name] = (None, None, f"ERROR: {e}")
+                    failed = True
+                    continue
+                logger.info(f"Parsed {name} in {parse_seconds:.1f}s, loading...")
+                load(name, df, parse_seconds)
+
+    start = time.perf_counter()
     ctx.invoke(refresh)
+    refresh_seconds = time.perf_counter() - start
+
+    def fmt(seconds):
+        return f"{seconds:7.1f}s" if seconds is not None else "      -"
+
+    logger.info("========== TIMINGS ==========")
+    for name in available:
+        parse_seconds, load_seconds, rows = timings.get(name, (None, None, "not run"))
+        status = f"{rows} rows" if isinstance(rows, int) else rows
+        logger.info(
+            "  %-14s parse %s  load %s  %s",
+            name, fmt(parse_seconds), fmt(load_seconds), status,
+        )
+    logger.info("  %-14s %s", "refresh", fmt(refresh_seconds))
     logger.info("========== FULL ETL PIPELINE COMPLETE ==========")
 
+    if failed:
+        sys.exit(1)
+
 
 # ── API-based commands ─────────────────────────────────────────
 
@@ -223,9 +544,36 @@ def api_test():
     default="all",
     help="Comma-separated list: branches,doctors,services,transactions,appointments,invoices,patient_stats",
 )
-def api_sync(date_from, date_to, incremental, endpoints):
+@click.option(
+    "--concurrent/--sequential",
+    default=True,
+    help="Fetch endpoints concurrently (async client) or one after another",
+)
+@click.option(
+    "--shard",
+    type=click.Choice(["none", "month", "branch", "month,branch"]),
+    default="none",
+    help="Split transactions/appointments/invoices into parallel windows (backfills)",
+)
+@click.option(
+    "--stream/--buffer",
+    default=True,
+    help="With --concurrent: write each page to raw tables as it arrives",
+)
+@click.option(
+    "--resume/--restart",
+    default=True,
+    help="Continue an interrupted streaming sync from its checkpoints, or start over",
+)
+def api_sync(date_from, date_to, incremental, endpoints, concurrent, shard, stream, resume):
     """Sync data from ClinicIQ API into DWH."""
+    import asyncio
+    import functools
+
+    from etl.extractors.api_client import rate_limiter, update_last_sync
     from etl.extractors.api_extractor import (
+        extract_all_async,
+        stream_all_async,
         extract_branches,
         extract_doctors,
         extract_services,
@@ -234,7 +582,8 @@ def api_sync(date_from, date_to, incremental, endpoints):
         extract_invoices,
         extract_patient_stats,
     )
-    from etl.loaders.dwh_loader import load_to_raw
+    from etl.loaders.checkpoints import clear_checkpoints, load_checkpoints, save_checkpoint
+    from etl.loaders.dwh_loader import load_to_raw, stream_to_raw
 
     today = date.today()
     if not date_from:
@@ -254,91 +603,100 @@ def api_sync(date_from, date_to, incremental, endpoints):
     logger.info("Period: %s to %s", date_from, date_to)
     logger.info("Mode: %s", "incremental" if incremental else "full")
     logger.info("Endpoints: %s", ", ".join(endpoint_list))
+    shard = None if shard == "none" else shard
+
+    # Reference data needs no date range; branches and patient stats are
+    # always reloaded in full
+    extractors = {
+        "branches": lambda: extract_branches(),
+        "doctors": lambda: extract_doctors(incremental=incremental),
+        "services": lambda: extract_services(incremental=incremental),
+        "transactions": lambda: extract_transactions(
+            date_from, date_to, incremental=incremental, shard=shard
+        ),
+        "appointments": lambda: extract_appointments(
+            date_from, date_to, incremental=incremental, shard=shard
+        ),
+        "invoices": lambda: extract_invoices(
+            date_from, date_to, incremental=incremental, shard=shard
+        ),
+        "patient_stats": lambda: extract_patient_stats(date_from, date_to),
+    }
+    mode = "append" if incremental else "truncate"
+    load_modes = {
+        "branches": "truncate", "doctors": mode, "services": mode,
+        "transactions": mode, "appointments": mode, "invoices": mode,
+        "patient_stats": "truncate",
+    }
 
-    results = {}
-
-    # 1. Reference data (no date range needed)
-    if "branches" in endpoint_list:
-        try:
-            df = extract_branches()
-            if not df.empty:
-                load_to_raw(df, "api_branches", if_exists="replace")
-            results["branches"] = len(df)
-        except Exception as e:
-            logger.error("Failed to sync branches: %s", e)
-            results["branches"] = f"ERROR: {e}"
-
-    if "doctors" in endpoint_list:
-        try:
-            df = extract_doctors(incremental=incremental)
-            if not df.empty:
-                mode = "append" if incremental else "replace"
-                load_to_raw(df, "api_doctors", if_exists=mode)
-            results["doctors"] = len(df)
-        except Exception as e:
-            logger.error("Failed to sync doctors: %s", e)
-            results["doctors"] = f"ERROR: {e}"
-
-    if "services" in endpoint_list:
-        try:
-            df = extract_services(incremental=incremental)
-            if not df.empty:
-                mode = "append" if incremental else "replace"
-                load_to_raw(df, "api_services", if_exists=mode)
-            results["services"] = len(df)
-        except Exception as e:
-            logger.error("Failed to sync services: %s", e)
-            results["services"] = f"ERROR: {e}"
-
-    # 2. Transactional data (date range required)
-    if "transactions" in endpoint_list:
-        try:
-            df = extract_transactions(
-                date_from, date_to, incremental=incremental
+    start = time.perf_counter()
+    if concurrent and stream:
+        # Pages go straight to the raw tables, each committed with its cursor
+        # checkpoint; results are row counts
+        if not resume:
+            for endpoint in endpoint_list:
+                clear_checkpoints(endpoint)
+
+        async def sink(endpoint, pages, resumed):
+            async def items():
+                async for frame, progress in pages:
+                    yield frame, functools.partial(
+                        save_checkpoint, endpoint=endpoint, progress=progress
+                    )
+
+            return await stream_to_raw(
+                items(), f"api_{endpoint}",
+                if_exists="append" if resumed else load_modes[endpoint],
+                checkpointed=True,
             )
-            if not df.empty:
-                mode = "append" if incremental else "replace"
-                load_to_raw(df, "api_transactions", if_exists=mode)
-            results["transactions"] = len(df)
-        except Exception as e:
-            logger.error("Failed to sync transactions: %s", e)
-            results["transactions"] = f"ERROR: {e}"
 
-    if "appointments" in endpoint_list:
-        try:
-            df = extract_appointments(
-                date_from, date_to, incremental=incremental
-            )
-            if not df.empty:
-                mode = "append" if incremental else "replace"
-                load_to_raw(df, "api_appointments", if_exists=mode)
-            results["appointments"] = len(df)
-        except Exception as e:
-            logger.error("Failed to sync appointments: %s", e)
-            results["appointments"] = f"ERROR: {e}"
+        def finish(endpoint, synced):
+            # The sync time is recorded in the transaction clearing the checkpoints
+            clear_checkpoints(endpoint, record_sync=update_last_sync if synced else None)
 
-    if "invoices" in endpoint_list:
-        try:
-            df = extract_invoices(
-                date_from, date_to, incremental=incremental
+        fetched = asyncio.run(
+            stream_all_async(
+                endpoint_list, date_from, date_to, sink, incremental=incremental,
+                shard=shard, resume=load_checkpoints, finish=finish,
             )
-            if not df.empty:
-                mode = "append" if incremental else "replace"
-                load_to_raw(df, "api_invoices", if_exists=mode)
-            results["invoices"] = len(df)
-        except Exception as e:
-            logger.error("Failed to sync invoices: %s", e)
-            results["invoices"] = f"ERROR: {e}"
+        )
+    elif concurrent:
+        fetched = asyncio.run(
+            extract_all_async(
+                endpoint_list, date_from, date_to, incremental=incremental, shard=shard
+            )
+        )
+    else:
+        fetched = {}
+        for endpoint in endpoint_list:
+            try:
+                fetched[endpoint] = extractors[endpoint]()
+            except Exception as e:
+                fetched[endpoint] = e
+    throttle = rate_limiter().stats()
+    logger.info(
+        "Fetched %d endpoints in %.1fs (%d requests throttled, %.1fs waited in total)",
+        len(fetched), time.perf_counter() - start,
+        throttle["throttled_requests"], throttle["throttled_seconds"],
+    )
 
-    if "patient_stats" in endpoint_list:
+    results = {}
+    for endpoint in endpoint_list:
+        df = fetched[endpoint]
         try:
-            df = extract_patient_stats(date_from, date_to)
+            if isinstance(df, Exception):
+                raise df
+            if isinstance(df, int):  # streamed, already loaded
+                results[endpoint] = df
+                continue
             if not df.empty:
-                load_to_raw(df, "api_patient_stats", if_exists="replace")
-            results["patient_stats"] = len(df)
+                load_to_raw(df, f"api_{endpoint}", if_exists=load_modes[endpoint])
+            # Checkpoints of an earlier interrupted streaming sync are stale now
+            clear_checkpoints(endpoint)
+            results[endpoint] = len(df)
         except Exception as e:
-            logger.error("Failed to sync patient stats: %s", e)
-            results["patient_stats"] = f"ERROR: {e}"
+            logger.error("Failed to sync %s: %s", endpoint.replace("_", " "), e)
+            results[endpoint] = f"ERROR: {e}"
 
     # Summary
     logger.info("========== SYNC RESULTS ==========")
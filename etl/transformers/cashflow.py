@@ -4,16 +4,59 @@ import logging
 
 import pandas as pd
 
-from etl.config import CF_BRANCH_MAP, LEGAL_ENTITY_MAP
+from etl.config import CF_BRANCH_MAP, LEGAL_ENTITY_MAP, classify_expense_type
 
 logger = logging.getLogger(__name__)
 
 
-def transform_cf_entries(df: pd.DataFrame, branch_lookup: dict) -> pd.DataFrame:
+def resolve_expense_types(
+    df: pd.DataFrame, column: str, expense_type_lookup: dict
+) -> pd.Series:
+    """
+    Map CF line items to expense_type_id, once per unique line item.
+
+    A line item equal to a dim_expense_type name (case-insensitive) maps to
+    it directly, anything else goes through classify_expense_type. Line
+    items that match nothing keep a NULL id and are reported with their
+    row counts and totals.
+    """
+    by_name = {str(name).lower(): type_id for name, type_id in expense_type_lookup.items()}
+
+    def resolve(item):
+        if pd.isna(item):
+            return None
+        item = str(item).strip()
+        type_id = by_name.get(item.lower())
+        if type_id is None:
+            type_id = expense_type_lookup.get(classify_expense_type(item))
+        return type_id
+
+    codes, uniques = pd.factorize(df[column])
+    resolved = pd.array([resolve(u) for u in uniques] + [None], dtype="Int64")
+    ids = pd.Series(resolved[codes], index=df.index)
+
+    unknown = df[ids.isna() & df[column].notna()]
+    if not unknown.empty:
+        report = unknown.groupby(column)["amount"].agg(["count", "sum"]).sort_values(
+            "sum", key=abs, ascending=False
+        )
+        logger.warning(
+            f"{len(report)} CF line items without expense type "
+            f"({len(unknown)} rows, {unknown['amount'].sum():,.2f} total):"
+        )
+        for item, row in report.iterrows():
+            logger.warning(f"  {item!r}: {int(row['count'])} rows, {row['sum']:,.2f}")
+    return ids
+
+
+def transform_cf_entries(
+    df: pd.DataFrame, branch_lookup: dict, expense_type_lookup: dict | None = None
+) -> pd.DataFrame:
     """
     Transform raw CF entries into DWH-ready format.
 
-    Maps branch_uu (Подразделение_УУ) to branch_id.
+    Maps branch_uu (Подразделение_УУ) to branch_id and, given
+    expense_type_lookup, expense_category (НОВАЯ СТАТЬЯ) to expense_type_id.
     """
     logger.info(f"Transforming {len(df)} CF entries")
 
@@ -28,21 +71,29 @@ def transform_cf_entries(df: pd.DataFrame, branch_lookup: dict) -> pd.DataFrame:
             return branch_lookup[code]
         return None
 
-    result["branch_id"] = result["branch_uu"].apply(map_branch)
+    result["branch_id"] = result["branch_uu"].apply(map_branch).astype("Int64")
 
     unmapped = result["branch_id"].isna().sum()
     if unmapped > 0:
         logger.warning(f"{unmapped} CF entries with unmapped branch")
 
+    if expense_type_lookup is not None and "expense_category" in result.columns:
+        result["expense_type_id"] = resolve_expense_types(
+            result, "expense_category", expense_type_lookup
+        )
+
     return result
 
 
-def transform_cf_monthly(df: pd.DataFrame) -> pd.DataFrame:
+def transform_cf_monthly(
+    df: pd.DataFrame, expense_type_lookup: dict | None = None
+) -> pd.DataFrame:
     """
     Transform monthly CF SVOD data.
 
     Maps legal_entity short name to legal_entity_id.
     Parses year_month string to date.
+    Given expense_type_lookup, maps line_item to expense_type_id.
     """
     if df.empty:
         return df
@@ -65,6 +116,12 @@ def transform_cf_monthly(df: pd.DataFrame) -> pd.DataFrame:
 
     result["year_month"] = result["year_month_str"].apply(parse_year_month)
     result = result.dropna(subset=["year_month", "legal_entity_id"])
+    result["legal_entity_id"] = result["legal_entity_id"].astype("Int64")
+
+    if expense_type_lookup is not None:
+        result["expense_type_id"] = resolve_expense_types(
+            result, "line_item", expense_type_lookup
+        )
 
     logger.info(f"Transformed {len(result)} CF monthly records")
     return result
@@ -1,10 +1,14 @@
 """Transform MIS transactions: map branches, doctors, services, anonymize patients."""
 
+import hashlib
 import logging
+from typing import Optional
 
+import numpy as np
 import pandas as pd
 
 from etl.config import MIS_BRANCH_MAP, classify_service
+from etl.dtypes import FACT_TRANSACTION_DTYPES, apply_dtypes
 
 logger = logging.getLogger(__name__)
 
@@ -28,69 +32,197 @@ def resolve_payment_type_id(payment_type: str, pt_lookup: dict) -> int | None:
     return pt_lookup.get(name)
 
 
+def _resolve_unique(series: pd.Series, resolve, dtype: str) -> pd.Series:
+    """
+    Apply ``resolve`` to the unique non-null values of ``series`` only.
+
+    ``resolve`` receives a Series of unique values (as stripped strings) and
+    returns a Series of the same length; results are cast to ``dtype`` and
+    broadcast back through the factorized codes, nulls stay null.
+    """
+    codes, uniques = pd.factorize(series)
+    names = pd.Series(uniques, dtype=object).astype(str).str.strip()
+    resolved = pd.Series(resolve(names), dtype=object).astype(dtype)
+
+    if dtype == "category":
+        values = pd.Categorical.from_codes(
+            np.where(codes >= 0, resolved.cat.codes.to_numpy()[codes], -1),
+            dtype=resolved.dtype,
+        )
+    else:
+        values = resolved.array.take(codes, allow_fill=True)
+    return pd.Series(values, index=series.index)
+
+
+# Fields that identify a transaction row across exports
+ROW_KEY_COLUMNS = [
+    "transaction_date", "patient_hash", "transaction_amount",
+    "invoice_amount", "service_name", "doctor_name",
+]
+
+
+_KEY_MULT = np.uint64(0x9E3779B97F4A7C15)
+_KEY_MIX = np.uint64(0xBF58476D1CE4E5B9)
+
+
+def _key_text(values: pd.Series) -> pd.Series:
+    """Stable text form of key column values."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.strftime("%Y-%m-%d")
+    return values.astype(object).astype(str)
+
+
+def _value_hashes(series: pd.Series) -> np.ndarray:
+    """64-bit hash of every value; nulls hash to 0.
+
+    Amounts are hashed numerically as whole kopecks, integer keys (patient
+    keys) by value, everything else as text, once per unique value.
+    """
+    if pd.api.types.is_integer_dtype(series):
+        missing = series.isna().to_numpy()
+        values = series.to_numpy(dtype=np.int64, na_value=0)
+        with np.errstate(over="ignore"):
+            hashes = _mix(values.view(np.uint64) + _KEY_MULT)
+        return np.where(missing, np.uint64(0), hashes)
+
+    if pd.api.types.is_float_dtype(series):
+        values = series.to_numpy(dtype=np.float64)
+        missing = np.isnan(values)
+        cents = np.round(np.where(missing, 0, values) * 100).astype(np.int64)
+        with np.errstate(over="ignore"):
+            hashes = _mix(cents.view(np.uint64) + _KEY_MULT)
+        return np.where(missing, np.uint64(0), hashes)
+
+    codes, uniques = pd.factorize(series)
+    text = _key_text(pd.Series(uniques))
+    hashes = np.fromiter(
+        (
+            int.from_bytes(hashlib.md5(t.encode("utf-8")).digest()[:8], "little")
+            for t in text
+        ),
+        dtype=np.uint64,
+        count=len(text),
+    )
+    # code -1 (null) picks the trailing 0
+    return np.append(hashes, np.uint64(0))[codes]
+
+
+def _mix(h: np.ndarray) -> np.ndarray:
+    """Finalizer that spreads the bits of a uint64 hash (splitmix64)."""
+    h = h ^ (h >> np.uint64(30))
+    h = h * _KEY_MIX
+    h = h ^ (h >> np.uint64(27))
+    h = h * _KEY_MULT
+    return h ^ (h >> np.uint64(31))
+
+
+def row_keys(df: pd.DataFrame, counts: Optional[dict] = None) -> pd.Series:
+    """
+    Deterministic 64-bit row key derived from the ROW_KEY_COLUMNS values.
+
+    Each column value is hashed (MD5, once per unique value) and the
+    per-column hashes are mixed in column order. Rows with identical key
+    fields (e.g. two equal payments by the same patient on the same day)
+    are told apart by their occurrence number, so reloading the same export
+    always yields the same keys. Pass the same ``counts`` dict for
+    consecutive chunks of one file to keep occurrence numbers running
+    across chunk boundaries.
+    """
+    with np.errstate(over="ignore"):
+        key = np.zeros(len(df), dtype=np.uint64)
+        for col in ROW_KEY_COLUMNS:
+            key = _mix((key ^ _value_hashes(df[col])) * _KEY_MULT)
+
+        occurrence = pd.Series(key).groupby(key).cumcount().to_numpy(dtype=np.uint64)
+        if counts is not None:
+            seen = pd.Series(key).map(counts).fillna(0).to_numpy(dtype=np.uint64)
+            occurrence = occurrence + seen
+            for k, n in pd.Series(key).value_counts().items():
+                counts[k] = counts.get(k, 0) + n
+
+        dup = occurrence > 0
+        key[dup] = _mix(key[dup] ^ (occurrence[dup] * _KEY_MIX))
+
+    return pd.Series(key.view(np.int64), index=df.index)
+
+
 def transform_transactions(
     df: pd.DataFrame,
     branch_lookup: dict,
     payment_type_lookup: dict,
     doctor_names: set,
+    row_key_counts: Optional[dict] = None,
 ) -> pd.DataFrame:
     """
     Transform raw transactions DataFrame into DWH-ready format.
 
+    Every lookup is resolved once per unique value (branch, payment type,
+    service, visit date, ...) and mapped back, so the cost scales with the
+    number of distinct values rather than the number of rows.
+
     Args:
         df: Raw extracted transactions
         branch_lookup: code -> branch_id mapping
         payment_type_lookup: name -> payment_type_id mapping
         doctor_names: set of known doctor names (to collect new ones)
+        row_key_counts: occurrence counts shared by chunks of one file,
+            see row_keys
 
     Returns:
         Transformed DataFrame ready for dwh.fact_transactions
     """
     logger.info(f"Transforming {len(df)} transactions")
 
-    result = pd.DataFrame()
+    def branch_ids(names):
+        return names.map(MIS_BRANCH_MAP).map(branch_lookup)
+
+    result = pd.DataFrame(index=df.index)
 
     result["transaction_date"] = df["transaction_date"]
-    result["branch_id"] = df["clinic"].apply(
-        lambda x: resolve_branch_id(x, branch_lookup)
-    )
+    result["branch_id"] = _resolve_unique(df["clinic"], branch_ids, "Int64")
     result["patient_hash"] = df["patient_hash"]
     result["patient_age"] = df["patient_age"]
-    result["is_child"] = df["age_group"].apply(
-        lambda x: str(x).strip() == "Ребенок" if pd.notna(x) else None
+    result["is_child"] = _resolve_unique(
+        df["age_group"], lambda s: s == "Ребенок", "boolean"
     )
-    result["payment_type_id"] = df["payment_type"].apply(
-        lambda x: resolve_payment_type_id(x, payment_type_lookup)
+    result["payment_type_id"] = _resolve_unique(
+        df["payment_type"], lambda s: s.map(payment_type_lookup), "Int64"
     )
     result["operation_type"] = df["operation_type"]
-    result["invoice_branch_id"] = df["invoice_clinic"].apply(
-        lambda x: resolve_branch_id(x, branch_lookup)
-    )
+    result["invoice_branch_id"] = _resolve_unique(df["invoice_clinic"], branch_ids, "Int64")
     result["invoice_amount"] = df["invoice_amount"]
     result["invoice_debt"] = df["invoice_debt"]
 
-    result["service_name"] = df["service_items"].apply(
-        lambda x: str(x).strip()[:200] if pd.notna(x) else None
+    result["service_name"] = _resolve_unique(
+        df["service_items"], lambda s: s.str[:200], "category"
     )
-    result["service_category"] = result["service_name"].apply(classify_service)
-
-    result["visit_date"] = pd.to_datetime(
-        df["visit_dates"].apply(lambda x: str(x).split(",")[0].strip() if pd.notna(x) else None),
-        errors="coerce",
+    service_category = _resolve_unique(
+        result["service_name"], lambda s: s.map(classify_service), "category"
     )
-    result["doctor_name"] = df["doctor_name"].apply(
-        lambda x: str(x).strip() if pd.notna(x) else None
+    other = classify_service(None)
+    if other not in service_category.cat.categories:
+        service_category = service_category.cat.add_categories(other)
+    result["service_category"] = service_category.fillna(other)
+
+    result["visit_date"] = _resolve_unique(
+        df["visit_dates"],
+        lambda s: pd.to_datetime(s.str.split(",").str[0].str.strip(), errors="coerce"),
+        "datetime64[ns]",
     )
+    result["doctor_name"] = _resolve_unique(df["doctor_name"], lambda s: s, "category")
 
-    new_doctors = set(result["doctor_name"].dropna()) - doctor_names
+    new_doctors = set(result["doctor_name"].dropna().unique()) - doctor_names
     if new_doctors:
         logger.info(f"Found {len(new_doctors)} new doctors")
 
-    result["is_primary_visit"] = df["visit_status"].apply(
-        lambda x: str(x).strip() == "Первичный" if pd.notna(x) else None
+    result["is_primary_visit"] = _resolve_unique(
+        df["visit_status"], lambda s: s == "Первичный", "boolean"
     )
     result["transaction_amount"] = df["transaction_amount"]
 
+    result = apply_dtypes(result, FACT_TRANSACTION_DTYPES, "fact_transactions")
+    result["row_key"] = row_keys(result, row_key_counts)
+
     null_branches = result["branch_id"].isna().sum()
     if null_branches > 0:
         logger.warning(f"{null_branches} transactions with unmapped branch")
@@ -213,3 +213,21 @@ CREATE TABLE IF NOT EXISTS raw.suppliers (
     closing_credit      NUMERIC(15,2),
     loaded_at           TIMESTAMPTZ DEFAULT NOW()
 );
+
+-- ============================================================
+-- 13. Чекпоинты синхронизации ClinicIQ API (etl/loaders/checkpoints.py)
+--     Курсор следующей страницы фиксируется в той же транзакции, что и
+--     COPY строк страницы, поэтому прерванный api-sync продолжает обход
+--     с места остановки, не загружая страницы повторно
+-- ============================================================
+CREATE TABLE IF NOT EXISTS raw.api_sync_checkpoints (
+    endpoint            TEXT NOT NULL,  -- "transactions", "invoices", ...
+    window_key          TEXT NOT NULL,  -- "all" или окно шардирования "2025-01-01..2025-01-31/3"
+    run_key             TEXT NOT NULL,  -- параметры запуска (период, modified_since, шарды)
+    cursor              TEXT,           -- курсор следующей страницы; NULL — окно пройдено
+    records             BIGINT NOT NULL DEFAULT 0,
+    pages               INT NOT NULL DEFAULT 0,
+    done                BOOLEAN NOT NULL DEFAULT FALSE,
+    updated_at          TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (endpoint, window_key)
+);
@@ -137,6 +137,7 @@ CREATE TABLE IF NOT EXISTS dwh.dim_expense_type (
 
 INSERT INTO dwh.dim_expense_type (name, category, parent_category, sort_order) VALUES
     -- Выручка
+    ('Приход по операционной деятельности',         'Выручка',       'Доходы', 9),
     ('Выручка наличными',                           'Выручка',       'Доходы', 10),
     ('Выручка на расчетный счет (в т.ч. Карты)',    'Выручка',       'Доходы', 11),
     ('Выручка безналичными',                        'Выручка',       'Доходы', 12),
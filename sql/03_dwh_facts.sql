@@ -1,13 +1,19 @@
 -- Белая Радуга: DWH Fact tables
 
+-- Таблицы фактов секционированы помесячно по дате (PARTITION BY RANGE).
+-- Секции вида dwh.fact_transactions_2025_01 создаёт ETL при загрузке,
+-- см. etl/loaders/dwh_loader.py: ensure_month_partitions.
+-- Запросы с условием на саму дату (transaction_date >= ... AND < ...)
+-- читают только нужные секции; DATE_TRUNC('month', ...) = ... — нет.
+
 -- ============================================================
 -- Факт: Транзакции (нормализованная версия raw.mis_transactions)
 -- ============================================================
 CREATE TABLE IF NOT EXISTS dwh.fact_transactions (
-    transaction_id      BIGSERIAL PRIMARY KEY,
+    transaction_id      BIGSERIAL,
     transaction_date    DATE NOT NULL,
     branch_id           INT REFERENCES dwh.dim_branch(branch_id),
-    patient_hash        TEXT,               -- SHA256 от patient_name
+    patient_hash        BIGINT,             -- первые 8 байт SHA256 от patient_name
     patient_age         INT,
     is_child            BOOLEAN,
     payment_type_id     INT REFERENCES dwh.dim_payment_type(payment_type_id),
@@ -21,20 +27,51 @@ CREATE TABLE IF NOT EXISTS dwh.fact_transactions (
     doctor_id           INT REFERENCES dwh.dim_doctor(doctor_id),
     is_primary_visit    BOOLEAN,            -- TRUE if "Первичный"
     transaction_amount  NUMERIC(15,2) NOT NULL,
+    row_key             BIGINT,             -- хэш ключевых полей, для инкрементальной загрузки
 
+    PRIMARY KEY (transaction_id, transaction_date),
     CONSTRAINT chk_operation_type CHECK (operation_type IN ('Оплата', 'Возврат оплаты'))
-);
+) PARTITION BY RANGE (transaction_date);
 
-CREATE INDEX IF NOT EXISTS idx_fact_tx_date ON dwh.fact_transactions(transaction_date);
+-- Строки загружаются отсортированными по дате, поэтому для диапазонов дат
+-- хватает BRIN (десятки КБ вместо B-tree размером с колонку)
+DROP INDEX IF EXISTS dwh.idx_fact_tx_date;
+CREATE INDEX IF NOT EXISTS idx_fact_tx_date_brin ON dwh.fact_transactions USING BRIN (transaction_date);
+-- Покрывающий индекс под агрегаты витрин (etl/loaders/marts.py, agg_branch_month
+-- и agg_doctor_month): все читаемые колонки есть в индексе, возможен Index Only Scan
+CREATE INDEX IF NOT EXISTS idx_fact_tx_mart ON dwh.fact_transactions(transaction_date, branch_id, operation_type)
+    INCLUDE (transaction_amount, patient_hash, doctor_id, is_primary_visit, is_child);
 CREATE INDEX IF NOT EXISTS idx_fact_tx_branch ON dwh.fact_transactions(branch_id);
 CREATE INDEX IF NOT EXISTS idx_fact_tx_doctor ON dwh.fact_transactions(doctor_id);
 CREATE INDEX IF NOT EXISTS idx_fact_tx_patient ON dwh.fact_transactions(patient_hash);
 
+-- Для баз, созданных до появления row_key
+ALTER TABLE dwh.fact_transactions ADD COLUMN IF NOT EXISTS row_key BIGINT;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_fact_tx_row_key ON dwh.fact_transactions(row_key, transaction_date);
+
+-- Для баз, где patient_hash хранился как 16 hex-символов: то же значение в BIGINT.
+-- row_key от этого меняется — после миграции транзакции перезагрузить без --merge.
+-- Старые витрины читали patient_hash напрямую и блокируют смену типа, поэтому
+-- они удаляются; 04_marts.sql создаёт их заново (затем refresh --full).
+DO $$
+BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_schema = 'dwh' AND table_name = 'fact_transactions'
+          AND column_name = 'patient_hash') = 'text' THEN
+        DROP MATERIALIZED VIEW IF EXISTS
+            marts.monthly_pnl, marts.doctor_kpi, marts.branch_comparison, marts.service_economics
+            CASCADE;
+        ALTER TABLE dwh.fact_transactions
+            ALTER COLUMN patient_hash TYPE BIGINT
+            USING ('x' || patient_hash)::BIT(64)::BIGINT;
+    END IF;
+END $$;
+
 -- ============================================================
 -- Факт: Cash Flow записи (из проводок 1С)
 -- ============================================================
 CREATE TABLE IF NOT EXISTS dwh.fact_cf_entries (
-    cf_entry_id         BIGSERIAL PRIMARY KEY,
+    cf_entry_id         BIGSERIAL,
     entry_date          DATE NOT NULL,
     legal_entity_id     INT REFERENCES dwh.dim_legal_entity(legal_entity_id),
     branch_id           INT REFERENCES dwh.dim_branch(branch_id),
@@ -42,8 +79,10 @@ CREATE TABLE IF NOT EXISTS dwh.fact_cf_entries (
     direction           TEXT NOT NULL,       -- "Поступление" / "Расход"
     amount              NUMERIC(15,2) NOT NULL,
     counterparty        TEXT,
-    description         TEXT
-);
+    description         TEXT,
+
+    PRIMARY KEY (cf_entry_id, entry_date)
+) PARTITION BY RANGE (entry_date);
 
 CREATE INDEX IF NOT EXISTS idx_fact_cf_date ON dwh.fact_cf_entries(entry_date);
 CREATE INDEX IF NOT EXISTS idx_fact_cf_branch ON dwh.fact_cf_entries(branch_id);
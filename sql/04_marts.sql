@@ -1,39 +1,136 @@
 -- Белая Радуга: Marts (витрины для дашбордов)
 
+-- ============================================================
+-- Инкрементальные агрегаты по срезам (year_month, branch_id)
+-- ============================================================
+-- Загрузчики фактов отмечают затронутые срезы в marts.dirty_slices;
+-- `refresh` пересчитывает в agg_* только эти срезы (etl/loaders/marts.py),
+-- после чего витрины ниже обновляются уже из небольших агрегатов.
+
+CREATE TABLE IF NOT EXISTS marts.dirty_slices (
+    year_month      DATE NOT NULL,
+    branch_id       INT,
+    marked_at       TIMESTAMPTZ DEFAULT NOW(),
+    UNIQUE NULLS NOT DISTINCT (year_month, branch_id)
+);
+
+-- ============================================================
+-- HyperLogLog-скетчи уникальных пациентов
+-- ============================================================
+-- patient_hash — 64 бита SHA-256, поэтому дополнительное хэширование не нужно:
+-- старшие 12 бит — номер регистра (4096 регистров, ошибка ~1.6%),
+-- ранг — позиция первой единицы в оставшихся 52 битах.
+-- Скетч среза хранится разреженно в BYTEA: по 3 байта на непустой регистр
+-- (номер регистра uint16 big-endian + ранг uint8), по возрастанию номера.
+-- Скетчи объединяются поэлементным максимумом рангов, так что число
+-- уникальных пациентов за любой набор месяцев и филиалов считается без
+-- обращения к фактам (dashboard/sketches.py).
+
+CREATE OR REPLACE FUNCTION marts.hll_register(patient_hash BIGINT) RETURNS INT
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE
+RETURN ((patient_hash >> 52) & 4095)::INT;
+
+CREATE OR REPLACE FUNCTION marts.hll_suffix(patient_hash BIGINT) RETURNS BIGINT
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE
+RETURN patient_hash & 4503599627370495;
+
+-- Ранг убывает с ростом суффикса, поэтому MAX(ранг) = hll_rank(MIN(hll_suffix(...)))
+CREATE OR REPLACE FUNCTION marts.hll_rank(suffix BIGINT) RETURNS INT
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE
+RETURN 53 - length(ltrim(suffix::BIT(64)::TEXT, '0'));
+
+CREATE OR REPLACE FUNCTION marts.hll_entry(register INT, rank INT) RETURNS BYTEA
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE
+RETURN int2send(register::SMALLINT) || set_byte('\x00'::BYTEA, 0, rank);
+
+CREATE TABLE IF NOT EXISTS marts.agg_branch_month (
+    year_month          DATE NOT NULL,
+    branch_id           INT,
+    gross_revenue       NUMERIC(15,2),
+    refunds             NUMERIC(15,2),
+    net_revenue         NUMERIC(15,2),
+    unique_patients     BIGINT,
+    payment_count       BIGINT,
+    primary_visits      BIGINT,
+    avg_ticket          NUMERIC,
+    children_revenue    NUMERIC(15,2),
+    adult_revenue       NUMERIC(15,2),
+    patients_hll        BYTEA               -- скетч уникальных пациентов, см. выше
+);
+
+CREATE INDEX IF NOT EXISTS idx_agg_branch_month ON marts.agg_branch_month(year_month, branch_id);
+
+CREATE TABLE IF NOT EXISTS marts.agg_doctor_month (
+    year_month          DATE NOT NULL,
+    doctor_id           INT NOT NULL,
+    branch_id           INT,
+    revenue             NUMERIC(15,2),
+    visit_count         BIGINT,
+    unique_patients     BIGINT,
+    primary_visits      BIGINT,
+    avg_ticket          NUMERIC,
+    revenue_per_workday NUMERIC,
+    patients_hll        BYTEA
+);
+
+CREATE INDEX IF NOT EXISTS idx_agg_doctor_month ON marts.agg_doctor_month(year_month, branch_id);
+
+-- Для баз, созданных до появления скетчей (заполнятся после refresh --full)
+ALTER TABLE marts.agg_branch_month ADD COLUMN IF NOT EXISTS patients_hll BYTEA;
+ALTER TABLE marts.agg_doctor_month ADD COLUMN IF NOT EXISTS patients_hll BYTEA;
+
+CREATE TABLE IF NOT EXISTS marts.agg_service_month (
+    year_month          DATE NOT NULL,
+    branch_id           INT,
+    service_name        TEXT NOT NULL,
+    service_count       BIGINT,
+    total_revenue       NUMERIC(15,2)
+);
+
+CREATE INDEX IF NOT EXISTS idx_agg_service_month ON marts.agg_service_month(year_month, branch_id);
+
+-- Витрины ниже пересоздаются при каждом применении файла, чтобы в уже
+-- существующей базе действовали актуальные определения. Данные витрин
+-- строятся из agg_*, так что пересоздание дешёвое; права выдаёт 05_roles.sql.
+
 -- ============================================================
 -- Витрина: P&L помесячно по филиалам
 -- ============================================================
-CREATE MATERIALIZED VIEW IF NOT EXISTS marts.monthly_pnl AS
+DROP MATERIALIZED VIEW IF EXISTS marts.monthly_pnl CASCADE;
+CREATE MATERIALIZED VIEW marts.monthly_pnl AS
 WITH
 -- Выручка accrual (из МИС транзакций)
 revenue_accrual AS (
     SELECT
-        DATE_TRUNC('month', transaction_date)::DATE AS year_month,
+        year_month,
         branch_id,
-        SUM(CASE WHEN operation_type = 'Оплата' THEN transaction_amount ELSE 0 END) AS gross_revenue,
-        SUM(CASE WHEN operation_type = 'Возврат оплаты' THEN ABS(transaction_amount) ELSE 0 END) AS refunds,
-        SUM(transaction_amount) AS net_revenue,
-        COUNT(DISTINCT patient_hash) AS unique_patients,
-        COUNT(*) FILTER (WHERE operation_type = 'Оплата') AS payment_count,
-        COUNT(*) FILTER (WHERE is_primary_visit = TRUE AND operation_type = 'Оплата') AS primary_visits,
-        AVG(CASE WHEN operation_type = 'Оплата' THEN transaction_amount END) AS avg_ticket
-    FROM dwh.fact_transactions
-    GROUP BY 1, 2
+        gross_revenue,
+        refunds,
+        net_revenue,
+        unique_patients,
+        payment_count,
+        primary_visits,
+        avg_ticket,
+        patients_hll
+    FROM marts.agg_branch_month
 ),
--- Cash flow по статьям (из CF помесячных данных)
+-- Cash flow по статьям (из CF помесячных данных); expense_type_id
+-- проставляется при загрузке (etl/transformers/cashflow.py)
 cf_summary AS (
     SELECT
-        year_month,
-        branch_id,
-        SUM(amount) FILTER (WHERE line_item ILIKE '%приход%операц%' OR line_item ILIKE '%выручк%') AS cash_revenue,
-        SUM(ABS(amount)) FILTER (WHERE line_item ILIKE '%материал%') AS materials,
-        SUM(ABS(amount)) FILTER (WHERE line_item ILIKE '%лаборатор%') AS lab,
-        SUM(ABS(amount)) FILTER (WHERE line_item ILIKE '%зарплат%доктор%' OR line_item ILIKE '%ФОТ%врач%') AS payroll_doctors,
-        SUM(ABS(amount)) FILTER (WHERE line_item ILIKE '%зарплат%ассист%') AS payroll_assistants,
-        SUM(ABS(amount)) FILTER (WHERE line_item ILIKE '%аренд%') AS rent,
-        SUM(ABS(amount)) FILTER (WHERE line_item ILIKE '%маркетинг%' OR line_item ILIKE '%реклам%') AS marketing,
-        SUM(ABS(amount)) FILTER (WHERE line_item ILIKE '%IT%' OR line_item ILIKE '%клиник айкью%') AS it_costs
-    FROM dwh.fact_cf_monthly
+        f.year_month,
+        f.branch_id,
+        SUM(f.amount) FILTER (WHERE e.category = 'Выручка') AS cash_revenue,
+        SUM(ABS(f.amount)) FILTER (WHERE e.category = 'Материалы') AS materials,
+        SUM(ABS(f.amount)) FILTER (WHERE e.category = 'Лаборатория') AS lab,
+        SUM(ABS(f.amount)) FILTER (WHERE e.category = 'ФОТ врачей') AS payroll_doctors,
+        SUM(ABS(f.amount)) FILTER (WHERE e.category = 'ФОТ ассистентов') AS payroll_assistants,
+        SUM(ABS(f.amount)) FILTER (WHERE e.category = 'Аренда') AS rent,
+        SUM(ABS(f.amount)) FILTER (WHERE e.category = 'Маркетинг') AS marketing,
+        SUM(ABS(f.amount)) FILTER (WHERE e.category = 'IT') AS it_costs,
+        SUM(ABS(f.amount)) FILTER (WHERE f.expense_type_id IS NULL) AS cf_unclassified
+    FROM dwh.fact_cf_monthly f
+    LEFT JOIN dwh.dim_expense_type e ON e.expense_type_id = f.expense_type_id
     GROUP BY 1, 2
 )
 SELECT
@@ -69,81 +166,94 @@ SELECT
         - COALESCE(c.payroll_assistants, 0)
         - COALESCE(c.rent, 0)
         - COALESCE(c.marketing, 0)
-        - COALESCE(c.it_costs, 0) AS ebitda
+        - COALESCE(c.it_costs, 0) AS ebitda,
+    -- CF строки без статьи (см. предупреждения загрузчика)
+    c.cf_unclassified,
+    r.patients_hll
 FROM revenue_accrual r
 FULL OUTER JOIN cf_summary c USING (year_month, branch_id)
 LEFT JOIN dwh.dim_branch b ON COALESCE(r.branch_id, c.branch_id) = b.branch_id
 ORDER BY year_month, branch_id;
 
+-- Уникальный ключ нужен для REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS idx_monthly_pnl_key ON marts.monthly_pnl(year_month, branch_id);
+
 -- ============================================================
 -- Витрина: KPI врачей помесячно
 -- ============================================================
-CREATE MATERIALIZED VIEW IF NOT EXISTS marts.doctor_kpi AS
+DROP MATERIALIZED VIEW IF EXISTS marts.doctor_kpi CASCADE;
+CREATE MATERIALIZED VIEW marts.doctor_kpi AS
 SELECT
-    DATE_TRUNC('month', t.transaction_date)::DATE AS year_month,
-    t.doctor_id,
+    a.year_month,
+    a.doctor_id,
     d.full_name AS doctor_name,
     d.specialization,
-    t.branch_id,
+    a.branch_id,
     b.display_name AS branch_name,
-    SUM(t.transaction_amount) FILTER (WHERE t.operation_type = 'Оплата') AS revenue,
-    COUNT(*) FILTER (WHERE t.operation_type = 'Оплата') AS visit_count,
-    COUNT(DISTINCT t.patient_hash) AS unique_patients,
-    COUNT(*) FILTER (WHERE t.is_primary_visit = TRUE AND t.operation_type = 'Оплата') AS primary_visits,
-    AVG(t.transaction_amount) FILTER (WHERE t.operation_type = 'Оплата') AS avg_ticket,
-    SUM(t.transaction_amount) FILTER (WHERE t.operation_type = 'Оплата')
-        / GREATEST(COUNT(DISTINCT t.transaction_date) FILTER (WHERE t.operation_type = 'Оплата'), 1)
-        AS revenue_per_workday
-FROM dwh.fact_transactions t
-LEFT JOIN dwh.dim_doctor d ON t.doctor_id = d.doctor_id
-LEFT JOIN dwh.dim_branch b ON t.branch_id = b.branch_id
-WHERE t.doctor_id IS NOT NULL
-GROUP BY 1, 2, 3, 4, 5, 6
+    a.revenue,
+    a.visit_count,
+    a.unique_patients,
+    a.primary_visits,
+    a.avg_ticket,
+    a.revenue_per_workday,
+    a.patients_hll
+FROM marts.agg_doctor_month a
+LEFT JOIN dwh.dim_doctor d ON a.doctor_id = d.doctor_id
+LEFT JOIN dwh.dim_branch b ON a.branch_id = b.branch_id
 ORDER BY year_month, revenue DESC;
 
+CREATE UNIQUE INDEX IF NOT EXISTS idx_doctor_kpi_key ON marts.doctor_kpi(year_month, doctor_id, branch_id);
+
 -- ============================================================
 -- Витрина: Сравнение филиалов
 -- ============================================================
-CREATE MATERIALIZED VIEW IF NOT EXISTS marts.branch_comparison AS
+DROP MATERIALIZED VIEW IF EXISTS marts.branch_comparison CASCADE;
+CREATE MATERIALIZED VIEW marts.branch_comparison AS
 SELECT
-    DATE_TRUNC('month', t.transaction_date)::DATE AS year_month,
-    t.branch_id,
+    a.year_month,
+    a.branch_id,
     b.display_name AS branch_name,
-    SUM(t.transaction_amount) FILTER (WHERE t.operation_type = 'Оплата') AS revenue,
-    SUM(t.transaction_amount) AS net_revenue,
-    COUNT(*) FILTER (WHERE t.operation_type = 'Оплата') AS payments,
-    COUNT(DISTINCT t.patient_hash) AS unique_patients,
-    COUNT(*) FILTER (WHERE t.is_primary_visit AND t.operation_type = 'Оплата') AS primary_visits,
-    AVG(t.transaction_amount) FILTER (WHERE t.operation_type = 'Оплата') AS avg_ticket,
-    SUM(t.transaction_amount) FILTER (WHERE t.is_child = TRUE AND t.operation_type = 'Оплата') AS children_revenue,
-    SUM(t.transaction_amount) FILTER (WHERE t.is_child = FALSE AND t.operation_type = 'Оплата') AS adult_revenue
-FROM dwh.fact_transactions t
-LEFT JOIN dwh.dim_branch b ON t.branch_id = b.branch_id
-GROUP BY 1, 2, 3
+    a.gross_revenue AS revenue,
+    a.net_revenue,
+    a.payment_count AS payments,
+    a.unique_patients,
+    a.primary_visits,
+    a.avg_ticket,
+    a.children_revenue,
+    a.adult_revenue,
+    a.patients_hll
+FROM marts.agg_branch_month a
+LEFT JOIN dwh.dim_branch b ON a.branch_id = b.branch_id
 ORDER BY year_month, revenue DESC;
 
+CREATE UNIQUE INDEX IF NOT EXISTS idx_branch_comparison_key ON marts.branch_comparison(year_month, branch_id);
+
 -- ============================================================
 -- Витрина: Экономика услуг
 -- ============================================================
-CREATE MATERIALIZED VIEW IF NOT EXISTS marts.service_economics AS
+DROP MATERIALIZED VIEW IF EXISTS marts.service_economics CASCADE;
+CREATE MATERIALIZED VIEW marts.service_economics AS
 SELECT
-    t.service_name,
-    t.branch_id,
+    s.service_name,
+    s.branch_id,
     b.display_name AS branch_name,
-    COUNT(*) FILTER (WHERE t.operation_type = 'Оплата') AS service_count,
-    SUM(t.transaction_amount) FILTER (WHERE t.operation_type = 'Оплата') AS total_revenue,
-    AVG(t.transaction_amount) FILTER (WHERE t.operation_type = 'Оплата') AS avg_price,
+    SUM(s.service_count)::BIGINT AS service_count,
+    SUM(s.total_revenue) AS total_revenue,
+    SUM(s.total_revenue) / NULLIF(SUM(s.service_count), 0) AS avg_price,
     cs.material_cost,
     cs.doctor_pay,
     cs.margin_pct
-FROM dwh.fact_transactions t
-LEFT JOIN dwh.dim_branch b ON t.branch_id = b.branch_id
-LEFT JOIN dwh.fact_cost_structure cs ON t.service_name = cs.service_name
-WHERE t.service_name IS NOT NULL
+FROM marts.agg_service_month s
+LEFT JOIN dwh.dim_branch b ON s.branch_id = b.branch_id
+LEFT JOIN dwh.fact_cost_structure cs ON s.service_name = cs.service_name
 GROUP BY 1, 2, 3, cs.material_cost, cs.doctor_pay, cs.margin_pct
-HAVING COUNT(*) FILTER (WHERE t.operation_type = 'Оплата') >= 5
+HAVING SUM(s.service_count) >= 5
 ORDER BY total_revenue DESC;
 
+-- Услуга может совпасть с несколькими строками себестоимости, поэтому они входят в ключ
+CREATE UNIQUE INDEX IF NOT EXISTS idx_service_economics_key
+    ON marts.service_economics(service_name, branch_id, material_cost, doctor_pay, margin_pct);
+
 -- ============================================================
 -- Витрина: Алерты оптимизации
 -- ============================================================
@@ -0,0 +1,32 @@
+"""Shared fixtures. Database tests run only when TEST_DB_URL is set."""
+
+import os
+import uuid
+
+import pytest
+from sqlalchemy import create_engine
+
+from etl.loaders import dwh_loader
+
+
+@pytest.fixture
+def db_engine(monkeypatch):
+    """Engine for TEST_DB_URL (PostgreSQL), installed as the loaders' engine."""
+    url = os.getenv("TEST_DB_URL")
+    if not url:
+        pytest.skip("TEST_DB_URL is not set")
+    engine = create_engine(url, pool_pre_ping=True)
+    monkeypatch.setattr(dwh_loader, "_engine", engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def scratch_schema(db_engine):
+    """Empty schema dropped after the test."""
+    schema = f"test_{uuid.uuid4().hex[:8]}"
+    with db_engine.begin() as conn:
+        conn.exec_driver_sql(f"CREATE SCHEMA {schema}")
+    yield schema
+    with db_engine.begin() as conn:
+        conn.exec_driver_sql(f"DROP SCHEMA {schema} CASCADE")
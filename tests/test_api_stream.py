@@ -0,0 +1,51 @@
+"""Streaming API pages into a raw table (see conftest.db_engine)."""
+
+import asyncio
+
+from etl.extractors.api_extractor import _page_frame
+from etl.loaders.dwh_loader import copy_frames_async
+
+
+PAGES = [
+    # Page 1: no doctor ids at all, so the column is all null
+    [
+        {"transaction_id": 1, "amount": 100, "doctor": None, "patient": {"age": 30}},
+        {"transaction_id": 2, "amount": 250.5, "patient": {"age": 41}},
+    ],
+    # Page 2: integer fields with a missing value come out as NaN floats
+    [
+        {"transaction_id": 3, "amount": -50, "doctor": {"id": 7}, "patient": {"age": None}},
+        {"transaction_id": 4, "amount": 80, "doctor": {"id": None}, "patient": {"age": 12}},
+    ],
+]
+
+
+async def _frames():
+    for records in PAGES:
+        yield _page_frame("transactions", records)
+
+
+def _columns(engine, schema, table):
+    with engine.connect() as conn:
+        return dict(conn.exec_driver_sql(
+            "SELECT column_name, data_type FROM information_schema.columns "
+            f"WHERE table_schema = '{schema}' AND table_name = '{table}'"
+        ).fetchall())
+
+
+def test_stream_pages_with_null_ints(db_engine, scratch_schema):
+    rows = asyncio.run(copy_frames_async(_frames(), scratch_schema, "api_transactions"))
+
+    assert rows == 4
+    types = _columns(db_engine, scratch_schema, "api_transactions")
+    assert types["doctor_id_api"] == "bigint"
+    assert types["patient_age"] == "bigint"
+    assert types["amount"] == "double precision"
+    with db_engine.connect() as conn:
+        loaded = conn.exec_driver_sql(
+            f"SELECT transaction_id_api, doctor_id_api, patient_age, amount "
+            f"FROM {scratch_schema}.api_transactions ORDER BY 1"
+        ).fetchall()
+    assert loaded == [
+        (1, None, 30, 100.0), (2, None, 41, 250.5), (3, 7, None, -50.0), (4, None, 12, 80.0),
+    ]
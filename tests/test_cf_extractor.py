@@ -0,0 +1,224 @@
+"""Vectorized CF extractors must match the original row-by-row implementations."""
+
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from etl.extractors.cf_extractor import extract_cf_clinics, extract_cf_monthly_svod
+
+
+SHEET = [
+    # Row 0: year-month labels; the last column has no legal entity
+    [None, None, "2025-1", "2025-1", "2025-2", "2025-2", "2025-3"],
+    # Row 1: ЮЛ
+    [None, None, "БР", "БРЦ", "БР", "БРЦ", None],
+    [None, None, None, None, None, None, None],
+    [None, None, None, None, None, None, None],
+    [None, None, None, None, None, None, None],
+    # Row 5: column headers
+    ["Код", "Статья", "Сумма", "Сумма", "Сумма", "Сумма", "Сумма"],
+    # Row 6+: data
+    ["1", "Выручка", 100.5, 200, None, 0, 999],
+    ["2", "  Аренда ", -50, "н/д", "75", None, 1],
+    [None, None, 10, 20, 30, 40, 50],
+    ["3", "   ", 1, 2, 3, 4, 5],
+    ["4", "Итого расходы", -50, -10.25, 75, "-", 7],
+    ["5", "Прочее", None, None, None, None, None],
+    ["6", 2025, "1e3", 0.0, "abc", 12, None],
+]
+
+
+def _reference_svod(filepath: Path, sheet_name: str = "CF_СВОД") -> pd.DataFrame:
+    """Row-loop implementation the vectorized unpivot replaced."""
+    df_raw = pd.read_excel(filepath, sheet_name=sheet_name, engine="openpyxl", header=None)
+    header_row = df_raw.iloc[5]
+    records = []
+
+    year_months_row = df_raw.iloc[0]
+    le_row = df_raw.iloc[1]
+
+    stat_col = None
+    for idx, val in header_row.items():
+        if val == "Статья":
+            stat_col = idx
+            break
+
+    col_map = {}
+    for col_idx in range(stat_col + 1, len(header_row)):
+        ym = year_months_row.iloc[col_idx]
+        le = le_row.iloc[col_idx]
+        if pd.notna(ym) and pd.notna(le):
+            col_map[col_idx] = (str(ym), str(le))
+
+    for row_idx in range(6, len(df_raw)):
+        line_item = df_raw.iloc[row_idx, stat_col]
+        if pd.isna(line_item) or not str(line_item).strip():
+            continue
+        line_item = str(line_item).strip()
+        for col_idx, (ym, le) in col_map.items():
+            val = df_raw.iloc[row_idx, col_idx]
+            if pd.notna(val):
+                try:
+                    amount = float(val)
+                except (ValueError, TypeError):
+                    continue
+                if amount == 0:
+                    continue
+                records.append({
+                    "year_month_str": ym,
+                    "legal_entity": le,
+                    "line_item": line_item,
+                    "amount": amount,
+                    "source_file": filepath.name,
+                })
+    return pd.DataFrame(records)
+
+
+@pytest.fixture
+def svod_file(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "CF_СВОД"
+    for row in SHEET:
+        ws.append(row)
+    path = tmp_path / "cf_svod.xlsx"
+    wb.save(path)
+    return path
+
+
+def test_unpivot_matches_row_loop(svod_file):
+    result = extract_cf_monthly_svod(svod_file)
+    expected = _reference_svod(svod_file)
+
+    assert not expected.empty
+    pd.testing.assert_frame_equal(
+        result[expected.columns].reset_index(drop=True),
+        expected,
+    )
+
+
+def test_unpivot_skips_blank_and_non_numeric_cells(svod_file):
+    result = extract_cf_monthly_svod(svod_file)
+
+    assert result["amount"].notna().all()
+    assert (result["amount"] != 0).all()
+    assert "Прочее" not in set(result["line_item"])
+    assert set(result["legal_entity"]) == {"БР", "БРЦ"}
+    assert "Аренда" in set(result["line_item"])
+
+
+FIVE_CLINICS = ("ТАГАНКА", "БАУМАНКА", "ДИНАМО", "РУБЛЕВКА", "ЗИЛАРТ")
+
+CLINICS_SHEET = [
+    # Row 0: sheet title left of the clinic columns
+    ["CF по клиникам", None, None, None, None, None, None, None],
+    # Row 1: clinic names; the last column is not a clinic
+    [None, None, "ТАГАНКА", "БАУМАНКА", "ДИНАМО", "РУБЛЕВКА", "ЗИЛАРТ", "ИТОГО"],
+    [None, "Статья", None, None, None, None, None, None],
+    # Row 3+: line items in column 1
+    ["1", "Выручка", 100.5, 200, None, 0, 999, 1299.5],
+    ["2", "  Аренда ", -50, "н/д", "75", None, 1, 26],
+    [None, None, 10, 20, 30, 40, 50, 150],
+    ["3", "   ", 1, 2, 3, 4, 5, 15],
+    ["4", "Итого расходы", -50, -10.25, 75, "-", 7, 21.75],
+    ["5", "Прочее", None, None, None, None, None, None],
+]
+
+
+def _reference_clinics(filepath: Path) -> pd.DataFrame:
+    """Row-loop implementation the vectorized extract_cf_clinics replaced."""
+    df_raw = pd.read_excel(filepath, sheet_name="CF сlinics", engine="openpyxl", header=None)
+    clinic_row = df_raw.iloc[1]
+    clinics = {}
+    for idx, val in clinic_row.items():
+        if pd.notna(val) and str(val).strip():
+            name = str(val).strip()
+            if name in FIVE_CLINICS:
+                clinics[idx] = name
+
+    records = []
+    for row_idx in range(3, len(df_raw)):
+        line_item = df_raw.iloc[row_idx, 1]
+        if pd.isna(line_item) or not str(line_item).strip():
+            continue
+        line_item = str(line_item).strip()
+
+        for col_idx, clinic_name in clinics.items():
+            val = df_raw.iloc[row_idx, col_idx]
+            if pd.notna(val):
+                try:
+                    amount = float(val)
+                except (ValueError, TypeError):
+                    continue
+                if amount == 0:
+                    continue
+                records.append({
+                    "branch": clinic_name,
+                    "line_item": line_item,
+                    "amount": amount,
+                    "source_file": filepath.name,
+                })
+    return pd.DataFrame(records)
+
+
+def _clinics_file(tmp_path, rows) -> Path:
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "CF сlinics"
+    for row in rows:
+        ws.append(row)
+    path = tmp_path / "cf_clinics.xlsx"
+    wb.save(path)
+    return path
+
+
+def test_clinics_match_row_loop(tmp_path):
+    path = _clinics_file(tmp_path, CLINICS_SHEET)
+
+    result = extract_cf_clinics(path)
+    expected = _reference_clinics(path)
+
+    assert not expected.empty
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_clinics_include_khamovniki(tmp_path):
+    rows = [list(r) for r in CLINICS_SHEET]
+    rows[1][7] = "ХАМОВНИКИ"
+    path = _clinics_file(tmp_path, rows)
+
+    result = extract_cf_clinics(path)
+
+    khamovniki = result[result["branch"] == "ХАМОВНИКИ"]
+    assert khamovniki["line_item"].tolist() == ["Выручка", "Аренда", "Итого расходы"]
+    assert khamovniki["amount"].tolist() == [1299.5, 26.0, 21.75]
+    pd.testing.assert_frame_equal(
+        result[result["branch"] != "ХАМОВНИКИ"].reset_index(drop=True),
+        _reference_clinics(path),
+    )
+
+
+def test_clinics_grouped_by_month(tmp_path):
+    rows = [
+        # Month labels over merged blocks; the first clinic column has none
+        [None, None, None, "2025-1", None, "2025-2", None],
+        [None, None, "ТАГАНКА", "ТАГАНКА", "ДИНАМО", "ТАГАНКА", "ДИНАМО"],
+        [None, "Статья", None, None, None, None, None],
+        ["1", "Выручка", 5, 10, 20, 30, None],
+        ["2", "Аренда", 6, None, -1, "x", -2],
+    ]
+    path = _clinics_file(tmp_path, rows)
+
+    result = extract_cf_clinics(path)
+
+    expected = pd.DataFrame({
+        "year_month_str": ["2025-1", "2025-1", "2025-2", "2025-1", "2025-2"],
+        "branch": ["ТАГАНКА", "ДИНАМО", "ТАГАНКА", "ДИНАМО", "ДИНАМО"],
+        "line_item": ["Выручка", "Выручка", "Выручка", "Аренда", "Аренда"],
+        "amount": [10.0, 20.0, 30.0, -1.0, -2.0],
+        "source_file": path.name,
+    })
+    pd.testing.assert_frame_equal(result, expected)
+    assert "nan" not in set(result["year_month_str"])
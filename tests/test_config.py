@@ -0,0 +1,22 @@
+"""Service classification rules."""
+
+import pytest
+
+from etl.config import classify_service
+
+
+@pytest.mark.parametrize(
+    "name, category",
+    [
+        ("КТ челюсти", "Диагностика"),
+        ("Конусно-лучевая КТ", "Диагностика"),
+        ("Практика", "Прочее"),
+        ("Эктопия зуба", "Прочее"),
+        ("Профгигиена", "Гигиена"),
+        ("3D-КТ + консультация", "Консультация"),
+        ("Лечение кариеса, КТ", "Терапия"),
+        (None, "Прочее"),
+    ],
+)
+def test_classify_service(name, category):
+    assert classify_service(name) == category
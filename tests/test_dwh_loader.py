@@ -0,0 +1,50 @@
+"""COPY loader against a real PostgreSQL (see conftest.db_engine)."""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from etl.loaders.dwh_loader import copy_dataframe
+
+
+def _rows(engine, sql):
+    with engine.connect() as conn:
+        return conn.exec_driver_sql(sql).fetchall()
+
+
+def test_copy_float_with_nan_into_int_column(db_engine, scratch_schema):
+    with db_engine.begin() as conn:
+        conn.exec_driver_sql(
+            f"CREATE TABLE {scratch_schema}.t (id INT, total BIGINT, amount NUMERIC)"
+        )
+    df = pd.DataFrame({
+        "id": [1.0, np.nan, 3.0],
+        "total": [10.0, 20.0, np.nan],
+        "amount": [1.5, np.nan, 2.25],
+    })
+
+    assert copy_dataframe(df, scratch_schema, "t") == 3
+
+    assert _rows(db_engine, f"SELECT id, total, amount::float FROM {scratch_schema}.t ORDER BY 1") == [
+        (1, 10, 1.5), (3, None, 2.25), (None, 20, None),
+    ]
+
+
+def test_truncate_keeps_ddl_and_names_dropped_columns(db_engine, scratch_schema, caplog):
+    with db_engine.begin() as conn:
+        conn.exec_driver_sql(f"CREATE TABLE {scratch_schema}.t (month_num INT, label TEXT)")
+        conn.exec_driver_sql(f"INSERT INTO {scratch_schema}.t VALUES (99, 'old')")
+    df = pd.DataFrame({
+        "month_num": [1.0, np.nan],
+        "label": ["a", "b"],
+        "source_file": ["x.xlsx", "x.xlsx"],
+    })
+
+    with caplog.at_level(logging.WARNING, logger="etl.loaders.dwh_loader"):
+        copy_dataframe(df, scratch_schema, "t", if_exists="truncate")
+
+    assert "source_file" in caplog.text
+    assert _rows(db_engine, f"SELECT month_num, label FROM {scratch_schema}.t ORDER BY 2") == [
+        (1, "a"), (None, "b"),
+    ]